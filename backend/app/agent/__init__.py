@@ -1,4 +1,4 @@
 from app.agent.engine import AgentEngine
-from app.agent.prompt_builder import build_system_prompt
+from app.agent.prompt_builder import build_system_message, build_system_prompt
 
-__all__ = ["AgentEngine", "build_system_prompt"]
+__all__ = ["AgentEngine", "build_system_message", "build_system_prompt"]
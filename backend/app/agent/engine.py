@@ -2,28 +2,42 @@
 Moteur agent utilisant le SDK OpenAI pointé vers OpenRouter.
 Boucle agent complète avec streaming SSE et appels de skills.
 
-Changer de modèle = changer LLM_MODEL dans .env
+Changer de modèle = changer LLM_MODEL dans .env (par tâche : LLM_ROUTES, app/core/llm_routing.py)
 Changer de provider = changer LLM_BASE_URL dans .env
 """
 
+import asyncio
 import json
 import logging
+import time
 from collections.abc import AsyncGenerator
 from typing import Any
 
 from openai import AsyncOpenAI
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.agent.prompt_builder import build_system_prompt
+from app.agent.history import HistoryManager
+from app.agent.metrics import RunMetrics, measure_db
+from app.agent.prompt_builder import build_system_message
+from app.agent.response_cache import response_cache
+from app.agent.tool_router import select_tools
 from app.config import settings
+from app.core.database import async_session
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Route, Task, create_routed, resolve
+from app.core.llm_scheduler import Admission, llm_scheduler
 from app.models.message import Message
+from app.skills.jobs import SkillJob, skill_jobs
 from app.skills.registry import SkillRegistry
+from app.skills.results import compact_tool_result, persisted_tool_result
 
 logger = logging.getLogger(__name__)
 
 MAX_AGENT_TURNS = 10
 
+# Ajouté à une réponse interrompue par la déconnexion du client
+PARTIAL_MARKER = "[Réponse interrompue]"
+
 
 class AgentEngine:
     """
@@ -31,18 +45,26 @@ class AgentEngine:
     exécute les skills demandés, et yield des événements SSE.
     """
 
-    def __init__(self, db: AsyncSession, skill_registry: SkillRegistry):
-        self.client = AsyncOpenAI(
-            base_url=settings.LLM_BASE_URL,
-            api_key=settings.LLM_API_KEY,
-            default_headers={
-                "HTTP-Referer": settings.APP_URL,
-                "X-Title": "ESG Mefali",
-            },
-        )
-        self.model = settings.LLM_MODEL
+    def __init__(
+        self, db: AsyncSession, skill_registry: SkillRegistry, client: AsyncOpenAI | None = None
+    ):
+        # Client LLM injectable (rejeu de traces) ; sinon le client partagé
+        self.client = client if client is not None else get_llm_client()
+        self.model = resolve(Task.CHAT).models[0]
         self.db = db
         self.registry = skill_registry
+        self.history = HistoryManager(db)
+        self._skill_semaphore = asyncio.Semaphore(max(1, settings.AGENT_SKILL_CONCURRENCY))
+        # Résultats des skills en lecture seule du run en cours, par (nom, arguments)
+        self._skill_memo: dict[str, dict[str, Any]] = {}
+        # Statistiques par tour LLM de la dernière exécution (TTFT, tokens, cache)
+        self.turn_stats: list[dict[str, Any]] = []
+        # Mesures persistées (tours LLM + temps par skill) et tour en cours
+        self.metrics = RunMetrics(None, self.model)
+        self._turn = 0
+        # Jobs d'arrière-plan lancés pendant le run (skills longs), avec leur tool_call
+        self._jobs: list[tuple[SkillJob, str]] = []
+        self._conversation_id: str | None = None
 
     async def run(
         self,
@@ -54,47 +76,119 @@ class AgentEngine:
         Boucle agent complète. Yield des événements SSE :
         - text         : fragment de texte à afficher
         - skill_start  : un skill va être exécuté
-        - skill_result : résultat d'un skill
+        - skill_result : résultat d'un skill (ou handle d'un job d'arrière-plan)
+        - skill_progress : avancement d'un job d'arrière-plan, puis skill_result final
         - done         : fin du streaming
         - error        : erreur
+
+        Si le run est annulé (client déconnecté), le stream LLM et les skills en cours
+        sont interrompus et la réponse partielle est sauvegardée.
         """
+        full_response = ""
+        tool_calls_log: list[dict] = []
+        user_saved = False
+        # Réponse finale sauvegardée : une annulation ensuite (suivi des jobs) n'ajoute rien
+        assistant_saved = False
         try:
             # 1. Charger l'historique
             history = await self._load_history(conversation_id)
 
-            # 2. Charger les skills actifs
-            tools = await self.registry.get_active_tools()
+            # Question générique déjà traitée : réponse servie depuis le cache, sans LLM.
+            # Seulement en début de conversation (une relance dépend de l'historique)
+            cache_lookup = None
+            if not history and response_cache.eligible(user_message):
+                cache_lookup = await response_cache.lookup(user_message)
+                if cache_lookup.entry is not None:
+                    await self._save_message(conversation_id, "user", user_message)
+                    user_saved = True
+                    full_response = cache_lookup.entry.answer
+                    yield {"type": "text", "content": full_response}
+                    await self._save_message(conversation_id, "assistant", full_response)
+                    assistant_saved = True
+                    self.history.schedule_refresh(conversation_id)
+                    logger.info(
+                        "Réponse servie depuis le cache conv=%s similarité=%s",
+                        conversation_id,
+                        cache_lookup.similarity,
+                    )
+                    yield {"type": "done"}
+                    return
+
+            # 2. Charger les skills actifs, restreints à ceux utiles pour ce message
+            # (liste stable d'un tour à l'autre : préfixe du cache provider préservé)
+            tools = select_tools(
+                await self.registry.get_active_tools(), user_message, history, conversation_id
+            )
+            openai_tools = self.registry.get_openai_tools(tools) or None
 
-            # 3. Construire le system prompt
-            system_prompt = build_system_prompt(entreprise, tools)
+            # 3. Construire le system prompt (préfixe fixe marqué pour le cache provider)
+            system_message = build_system_message(entreprise, tools)
 
             # 4. Assembler les messages
+            self.turn_stats = []
+            self._skill_memo = {}
+            self.metrics = RunMetrics(conversation_id, self.model)
+            self._jobs = []
+            self._conversation_id = str(conversation_id)
             messages = [
-                {"role": "system", "content": system_prompt},
+                system_message,
                 *history,
                 {"role": "user", "content": user_message},
             ]
 
             # 5. Sauvegarder le message utilisateur
             await self._save_message(conversation_id, "user", user_message)
+            user_saved = True
 
             # 6. Boucle agent
-            full_response = ""
-            tool_calls_log: list[dict] = []
+
+            entreprise_id = entreprise.get("id") if entreprise else None
+            early_dispatch = settings.AGENT_PARALLEL_SKILLS and settings.AGENT_EARLY_TOOL_DISPATCH
 
             for turn in range(MAX_AGENT_TURNS):
+                self._turn = turn
+                turn_started = time.perf_counter()
                 tool_calls_in_turn: list[dict] = []
-
-                # Stream la réponse du LLM
-                async for event in self._stream_llm(tools, messages):
-                    if event["type"] == "text_delta":
-                        full_response += event["text"]
-                        yield {"type": "text", "content": event["text"]}
-                    elif event["type"] == "tool_call":
-                        tool_calls_in_turn.append(event["tool_call"])
+                calls: list[tuple[dict, dict]] = []
+                tasks: list[asyncio.Task | None] = []
+                # Un skill d'écriture du tour bloque le lancement anticipé des suivants
+                write_seen = False
+
+                # Stream la réponse du LLM ; chaque skill en lecture seule démarre dès que
+                # ses arguments sont complets, en parallèle de la fin de la génération
+                try:
+                    async for event in self._stream_llm(openai_tools, messages):
+                        if event["type"] == "text_delta":
+                            full_response += event["text"]
+                            yield {"type": "text", "content": event["text"]}
+                        elif event["type"] == "tool_call":
+                            tc = event["tool_call"]
+                            tc_params = _parse_arguments(tc["arguments"])
+                            tool_calls_in_turn.append(tc)
+                            calls.append((tc, tc_params))
+                            yield {
+                                "type": "skill_start",
+                                "skill": tc["name"],
+                                "params": tc_params,
+                            }
+                            parallel_safe = self._is_parallel_safe(tc["name"])
+                            write_seen = write_seen or not parallel_safe
+                            tasks.append(
+                                self._start_skill_task(tc, tc_params, entreprise_id)
+                                if early_dispatch and not write_seen
+                                else None
+                            )
+                        elif event["type"] == "stats":
+                            self._record_turn_stats(conversation_id, turn, event["stats"])
+                except BaseException:
+                    for task in tasks:
+                        if task is not None:
+                            task.cancel()
+                    raise
 
                 # Pas d'appel de skill → fin de la boucle
                 if not tool_calls_in_turn:
+                    self._end_turn_stats(turn, turn_started)
                     break
 
                 # Ajouter la réponse assistant avec les tool_calls
@@ -116,27 +210,10 @@ class AgentEngine:
                     }
                 )
 
-                # Exécuter chaque skill demandé
-                for tc in tool_calls_in_turn:
-                    try:
-                        tc_params = json.loads(tc["arguments"])
-                    except json.JSONDecodeError:
-                        tc_params = {}
-
-                    yield {
-                        "type": "skill_start",
-                        "skill": tc["name"],
-                        "params": tc_params,
-                    }
-
-                    context = {
-                        "db": self.db,
-                        "entreprise_id": entreprise.get("id") if entreprise else None,
-                    }
-                    result = await self.registry.execute_skill(
-                        tc["name"], tc_params, context
-                    )
+                # Attendre / exécuter les skills (résultats dans l'ordre des appels)
+                results = await self._execute_tool_calls(calls, entreprise_id, tasks)
 
+                for (tc, tc_params), result in zip(calls, results):
                     yield {
                         "type": "skill_result",
                         "skill": tc["name"],
@@ -144,116 +221,360 @@ class AgentEngine:
                     }
 
                     # Ajouter le résultat au format OpenAI tool message
+                    tool_content = compact_tool_result(
+                        tc["name"], result, str(entreprise_id) if entreprise_id else None
+                    )
                     messages.append(
                         {
                             "role": "tool",
                             "tool_call_id": tc["id"],
-                            "content": json.dumps(result, ensure_ascii=False, default=str),
+                            "content": tool_content,
                         }
                     )
 
-                    tool_calls_log.append({"name": tc["name"], "input": tc_params})
+                    # Trace complète (appel + résultat compacté, sans handle de store),
+                    # rejouée dans l'historique
+                    tool_calls_log.append(
+                        {
+                            "name": tc["name"],
+                            "input": tc_params,
+                            "id": tc["id"],
+                            "turn": turn,
+                            "result": persisted_tool_result(tool_content),
+                        }
+                    )
 
                 # Reset pour le prochain tour
                 full_response = ""
+                self._end_turn_stats(turn, turn_started)
 
             # 7. Sauvegarder la réponse complète
-            await self._save_message(
+            saved = await self._save_message(
                 conversation_id,
                 "assistant",
                 full_response,
                 tool_calls_json=tool_calls_log if tool_calls_log else None,
             )
+            assistant_saved = True
+
+            # Mettre à jour le résumé glissant hors du chemin critique
+            self.history.schedule_refresh(conversation_id)
+
+            if (
+                cache_lookup is not None
+                and not self._jobs
+                and response_cache.cacheable_run(tool_calls_log, full_response, entreprise)
+            ):
+                response_cache.store(cache_lookup, full_response)
+
+            # 8. Relayer l'avancement des jobs d'arrière-plan ; leur résultat final
+            # remplacera le handle dans la trace du message sauvegardé
+            if self._jobs:
+                for job, tool_call_id in self._jobs:
+                    skill_jobs.link_message(job.id, saved.id, tool_call_id)
+                async for event in skill_jobs.follow(
+                    [job for job, _ in self._jobs], settings.SKILL_JOB_STREAM_TIMEOUT
+                ):
+                    yield event
 
             yield {"type": "done"}
 
+        except asyncio.CancelledError:
+            if user_saved and not assistant_saved:
+                await self._save_partial(conversation_id, full_response, tool_calls_log)
+            raise
         except Exception as e:
             logger.exception("Erreur dans la boucle agent")
             yield {"type": "error", "content": str(e)}
+        finally:
+            self.metrics.flush()
+
+    async def _save_partial(
+        self, conversation_id: str, content: str, tool_calls_log: list[dict]
+    ) -> None:
+        """Sauvegarde ce qui a été produit avant l'annulation du run."""
+        try:
+            await self.db.rollback()
+            saved = await self._save_message(
+                conversation_id,
+                "assistant",
+                (content + "\n\n" if content else "") + PARTIAL_MARKER,
+                tool_calls_json=tool_calls_log or None,
+            )
+            for job, tool_call_id in self._jobs:
+                skill_jobs.link_message(job.id, saved.id, tool_call_id)
+            logger.info("Run annulé conv=%s : réponse partielle sauvegardée", conversation_id)
+        except Exception:
+            logger.exception("Impossible de sauvegarder la réponse partielle")
+
+    def _start_skill_task(
+        self, tc: dict, tc_params: dict, entreprise_id: str | None
+    ) -> asyncio.Task:
+        """Lance un skill en tâche de fond, avec sa propre session BDD."""
+        return asyncio.create_task(self._run_isolated(tc, tc_params, entreprise_id))
+
+    async def _run_isolated(
+        self, tc: dict, tc_params: dict, entreprise_id: str | None
+    ) -> dict[str, Any]:
+        # Une AsyncSession ne supporte pas les requêtes concurrentes : une session par skill
+        async with self._skill_semaphore:
+            async with async_session() as session:
+                context = {"db": session, "entreprise_id": entreprise_id, "tool_call_id": tc["id"]}
+                return await self._execute_skill(tc["name"], tc_params, context)
+
+    async def _execute_skill(
+        self, skill_name: str, params: dict, context: dict
+    ) -> dict[str, Any]:
+        """
+        Exécute un skill avec mémoïsation par run : un skill en lecture seule rappelé
+        avec les mêmes arguments est servi depuis la mémoire. Tout skill d'écriture
+        (update_company_profile, manage_action_plan…) vide la mémoire.
+
+        Les skills longs (génération de documents) partent en job d'arrière-plan :
+        le LLM reçoit immédiatement le handle du job.
+        """
+        if skill_jobs.is_background(skill_name):
+            self._skill_memo.clear()
+            job = skill_jobs.submit(
+                self.registry,
+                skill_name,
+                params,
+                {
+                    "entreprise_id": context.get("entreprise_id"),
+                    "conversation_id": self._conversation_id,
+                },
+            )
+            self._jobs.append((job, context.get("tool_call_id", "")))
+            return job.handle()
+
+        if not settings.AGENT_SKILL_MEMO:
+            return await self._timed_execute(skill_name, params, context)
+
+        if not self.registry.is_read_only(skill_name):
+            self._skill_memo.clear()
+            try:
+                return await self._timed_execute(skill_name, params, context)
+            finally:
+                self._skill_memo.clear()
+
+        key = _memo_key(skill_name, params)
+        if key in self._skill_memo:
+            logger.debug("Skill '%s' servi depuis la mémoire du run", skill_name)
+            return self._skill_memo[key]
+
+        result = await self._timed_execute(skill_name, params, context)
+        if isinstance(result, dict) and "error" not in result:
+            self._skill_memo[key] = result
+        return result
+
+    async def _timed_execute(
+        self, skill_name: str, params: dict, context: dict
+    ) -> dict[str, Any]:
+        """Exécute un skill en mesurant son temps total et son temps SQL."""
+        started = time.perf_counter()
+        is_error = True
+        with measure_db() as db_timer:
+            try:
+                result = await self.registry.execute_skill(skill_name, params, context)
+                is_error = isinstance(result, dict) and "error" in result
+                return result
+            finally:
+                self.metrics.skill(
+                    skill_name,
+                    self._turn,
+                    (time.perf_counter() - started) * 1000,
+                    db_timer.ms,
+                    is_error,
+                )
+
+    def _is_parallel_safe(self, skill_name: str) -> bool:
+        """Skill exécutable en parallèle des autres appels du tour (lecture seule, hors job)."""
+        return self.registry.is_read_only(skill_name) and not skill_jobs.is_background(skill_name)
+
+    async def _execute_tool_calls(
+        self,
+        calls: list[tuple[dict, dict]],
+        entreprise_id: str | None,
+        tasks: list[asyncio.Task | None] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Exécute les tool_calls d'un tour et retourne les résultats dans l'ordre des appels.
+
+        `tasks` contient les skills déjà lancés pendant le stream (dispatch anticipé).
+        En mode parallèle, seuls les skills en lecture seule s'exécutent simultanément,
+        chacun avec sa propre session BDD (au plus AGENT_SKILL_CONCURRENCY) ; un skill
+        d'écriture sert de barrière : il attend les appels précédents et s'exécute seul,
+        avant les suivants, pour qu'une lecture du même tour voie ce qu'il a écrit.
+        """
+        tasks = tasks or [None] * len(calls)
+        already_started = any(t is not None for t in tasks)
+
+        if not already_started and (not settings.AGENT_PARALLEL_SKILLS or len(calls) < 2):
+            results = []
+            for tc, tc_params in calls:
+                context = {"db": self.db, "entreprise_id": entreprise_id, "tool_call_id": tc["id"]}
+                results.append(await self._execute_skill(tc["name"], tc_params, context))
+            return results
+
+        results: list[dict[str, Any]] = [{}] * len(calls)
+        running: list[tuple[int, asyncio.Task]] = []
+        for i, ((tc, tc_params), task) in enumerate(zip(calls, tasks)):
+            if self._is_parallel_safe(tc["name"]):
+                running.append((i, task or self._start_skill_task(tc, tc_params, entreprise_id)))
+                continue
+            # Barrière : lectures précédentes terminées, puis l'écriture seule
+            await self._gather_results(calls, running, results)
+            running = [(i, task or self._start_skill_task(tc, tc_params, entreprise_id))]
+            await self._gather_results(calls, running, results)
+            running = []
+        await self._gather_results(calls, running, results)
+        return results
+
+    @staticmethod
+    async def _gather_results(
+        calls: list[tuple[dict, dict]],
+        running: list[tuple[int, asyncio.Task]],
+        results: list[dict[str, Any]],
+    ) -> None:
+        """Attend les skills lancés et range leurs résultats à l'index de leur appel."""
+        raw_results = await asyncio.gather(*(task for _, task in running), return_exceptions=True)
+        for (i, _), res in zip(running, raw_results):
+            if isinstance(res, BaseException):
+                logger.error("Erreur lors de l'exécution du skill '%s': %s", calls[i][0]["name"], res)
+                res = {"error": f"Erreur d'exécution du skill: {res}"}
+            results[i] = res
 
     async def _stream_llm(
-        self, tools: list[dict], messages: list[dict]
+        self, openai_tools: list[dict] | None, messages: list[dict]
     ) -> AsyncGenerator[dict, None]:
         """
         Stream la réponse du LLM via le SDK OpenAI (compatible OpenRouter).
-        Accumule les tool_calls fragmentés et les émet à la fin du stream.
+        Accumule les tool_calls fragmentés et émet chacun dès qu'il est complet
+        (arguments JSON valides, ou début de l'appel suivant), pour que la boucle
+        agent le lance sans attendre la fin du stream ; les appels restants sont
+        émis à la fin.
         """
-        # Convertir les skills au format OpenAI tools
-        openai_tools = (
-            [
-                {
-                    "type": "function",
-                    "function": {
-                        "name": t["name"],
-                        "description": t["description"],
-                        "parameters": t["input_schema"],
-                    },
-                }
-                for t in tools
-            ]
-            if tools
-            else None
-        )
-        # Matérialiser le générateur en liste (le SDK attend une liste)
-        openai_tools = list(openai_tools) if openai_tools else None
-
-        stream = await self.client.chat.completions.create(
-            model=self.model,
-            max_tokens=4096,
+        # Créneau LLM interactif réservé pendant tout le stream (app/core/llm_scheduler.py),
+        # modèle et replis selon la route du chat (app/core/llm_routing.py)
+        route = resolve(Task.CHAT)
+        async with llm_scheduler.admit(route.priority) as admission:
+            async for event in self._stream_completion(openai_tools, messages, admission, route):
+                yield event
+
+    async def _stream_completion(
+        self,
+        openai_tools: list[dict] | None,
+        messages: list[dict],
+        admission: Admission,
+        route: Route,
+    ) -> AsyncGenerator[dict, None]:
+        started = time.perf_counter()
+        stream, model = await create_routed(
+            self.client,
+            Task.CHAT,
+            route,
+            admission,
             messages=messages,
             tools=openai_tools,
             stream=True,
+            stream_options={"include_usage": True},
         )
 
-        # Accumuler les tool_calls fragmentés
+        # Accumuler les tool_calls fragmentés ; un appel est émis dès qu'il est complet :
+        # l'index suivant a commencé, ou ses arguments forment un objet JSON valide
         tool_calls_acc: dict[int, dict] = {}
+        emitted: set[int] = set()
+        first_token_at: float | None = None
+        usage = None
 
-        async for chunk in stream:
-            if not chunk.choices:
-                continue
-            delta = chunk.choices[0].delta
-
-            # Texte
-            if delta.content:
-                yield {"type": "text_delta", "text": delta.content}
-
-            # Tool calls (arrivent en fragments dans le stream)
-            if delta.tool_calls:
-                for tc_delta in delta.tool_calls:
-                    idx = tc_delta.index
-                    if idx not in tool_calls_acc:
-                        tool_calls_acc[idx] = {
-                            "id": tc_delta.id or "",
-                            "name": "",
-                            "arguments": "",
-                        }
-                    if tc_delta.id:
-                        tool_calls_acc[idx]["id"] = tc_delta.id
-                    if tc_delta.function:
-                        if tc_delta.function.name:
-                            tool_calls_acc[idx]["name"] = tc_delta.function.name
-                        if tc_delta.function.arguments:
-                            tool_calls_acc[idx]["arguments"] += tc_delta.function.arguments
-
-        # Émettre les tool_calls complètes à la fin du stream
+        try:
+            async for chunk in stream:
+                # Le chunk d'usage (include_usage) arrive en dernier, sans choices
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if first_token_at is None and (delta.content or delta.tool_calls):
+                    first_token_at = time.perf_counter()
+
+                # Texte
+                if delta.content:
+                    yield {"type": "text_delta", "text": delta.content}
+
+                # Tool calls (arrivent en fragments dans le stream)
+                if delta.tool_calls:
+                    for tc_delta in delta.tool_calls:
+                        idx = tc_delta.index
+                        if idx not in tool_calls_acc:
+                            # Nouvel index : les appels précédents sont terminés
+                            for prev in sorted(i for i in tool_calls_acc if i not in emitted):
+                                emitted.add(prev)
+                                yield {"type": "tool_call", "tool_call": tool_calls_acc[prev]}
+                            tool_calls_acc[idx] = {
+                                "id": tc_delta.id or "",
+                                "name": "",
+                                "arguments": "",
+                            }
+                        elif idx in emitted:
+                            logger.warning("Fragment reçu après émission du tool_call %d", idx)
+                        if tc_delta.id:
+                            tool_calls_acc[idx]["id"] = tc_delta.id
+                        if tc_delta.function:
+                            if tc_delta.function.name:
+                                tool_calls_acc[idx]["name"] = tc_delta.function.name
+                            if tc_delta.function.arguments:
+                                tool_calls_acc[idx]["arguments"] += tc_delta.function.arguments
+
+                        if idx not in emitted and _is_complete_call(tool_calls_acc[idx]):
+                            emitted.add(idx)
+                            yield {"type": "tool_call", "tool_call": tool_calls_acc[idx]}
+        finally:
+            # Fermer la réponse HTTP (annulation : le provider arrête de générer)
+            close = getattr(stream, "close", None)
+            if close is not None:
+                await close()
+
+        # Émettre les tool_calls restantes à la fin du stream
         for idx in sorted(tool_calls_acc.keys()):
-            yield {"type": "tool_call", "tool_call": tool_calls_acc[idx]}
-
-    async def _load_history(self, conversation_id: str) -> list[dict]:
-        """Charge les 20 derniers messages de la conversation."""
-        result = await self.db.execute(
-            select(Message)
-            .where(Message.conversation_id == conversation_id)
-            .order_by(Message.created_at.desc())
-            .limit(20)
+            if idx not in emitted:
+                yield {"type": "tool_call", "tool_call": tool_calls_acc[idx]}
+
+        ended = time.perf_counter()
+        yield {
+            "type": "stats",
+            "stats": {
+                "ttft_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                "stream_ms": round((ended - started) * 1000, 1),
+                "model": model,
+                "degraded": admission.degraded,
+                **_usage_to_dict(usage),
+            },
+        }
+
+    def _end_turn_stats(self, turn: int, started: float) -> None:
+        """Durée totale du tour (stream LLM puis skills), ajoutée à ses statistiques."""
+        if self.turn_stats and self.turn_stats[-1]["turn"] == turn:
+            self.turn_stats[-1]["turn_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _record_turn_stats(self, conversation_id: str, turn: int, stats: dict) -> None:
+        """Enregistre les statistiques d'un tour LLM (TTFT, tokens, tokens servis du cache)."""
+        stats = {"turn": turn, "model": self.model, **stats}
+        self.turn_stats.append(stats)
+        self.metrics.llm_turn(turn, stats)
+        logger.info(
+            "LLM turn conv=%s turn=%d ttft_ms=%s prompt_tokens=%s cached_tokens=%s completion_tokens=%s",
+            conversation_id,
+            turn,
+            stats.get("ttft_ms"),
+            stats.get("prompt_tokens"),
+            stats.get("cached_tokens"),
+            stats.get("completion_tokens"),
         )
-        messages = result.scalars().all()
 
-        # Inverser pour l'ordre chronologique
-        return [
-            {"role": m.role, "content": m.content}
-            for m in reversed(messages)
-        ]
+    async def _load_history(self, conversation_id: str) -> list[dict]:
+        """Charge l'historique dans le budget de tokens (résumé des échanges plus anciens en tête)."""
+        return await self.history.load(conversation_id)
 
     async def _save_message(
         self,
@@ -271,6 +592,44 @@ class AgentEngine:
         )
         self.db.add(msg)
         await self.db.commit()
+        return msg
+
+
+def _parse_arguments(arguments: str) -> dict:
+    """Décode les arguments JSON d'un tool_call ({} si invalides)."""
+    try:
+        params = json.loads(arguments) if arguments else {}
+    except json.JSONDecodeError:
+        return {}
+    return params if isinstance(params, dict) else {}
+
+
+def _memo_key(skill_name: str, params: dict) -> str:
+    """Clé de mémoïsation : nom du skill + arguments canonicalisés."""
+    return skill_name + ":" + json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _is_complete_call(tc: dict) -> bool:
+    """Un tool_call est complet quand il a un id, un nom et un objet JSON d'arguments fermé."""
+    args = tc["arguments"].rstrip()
+    if not (tc["id"] and tc["name"] and args.endswith("}")):
+        return False
+    try:
+        return isinstance(json.loads(args), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+def _usage_to_dict(usage: Any) -> dict[str, int | None]:
+    """Extrait les compteurs de tokens du chunk d'usage (tokens en cache inclus)."""
+    if usage is None:
+        return {"prompt_tokens": None, "completion_tokens": None, "cached_tokens": None}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "cached_tokens": getattr(details, "cached_tokens", None) if details else None,
+    }
 
 
 def _truncate(text: str, max_len: int) -> str:
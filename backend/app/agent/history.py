@@ -0,0 +1,278 @@
+"""
+Historique de conversation borné en tokens, avec résumé glissant.
+
+- load() remplit un budget de tokens du message le plus récent au plus ancien ;
+  les échanges plus anciens sont remplacés par le résumé stocké sur la conversation,
+  sauf ceux pas encore résumés, repris tels quels (sans trace de skills) dans la
+  limite de AGENT_HISTORY_PENDING_TOKEN_BUDGET (les plus anciens sont abandonnés
+  si le résumé prend du retard ou échoue).
+- Les appels de skills et leurs résultats compactés (messages.tool_calls_json)
+  sont rejoués au format OpenAI, pour que le LLM ne relance pas les mêmes skills.
+- schedule_refresh() replie en tâche de fond (hors chemin critique) les messages
+  sortis de la fenêtre dans conversations.summary, de façon incrémentale.
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.database import async_session
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Task, complete
+from app.models.conversation import Conversation
+from app.models.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Surcoût approximatif par message (rôle, séparateurs) dans le format chat
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+_SUMMARY_SYSTEM_PROMPT = (
+    "Tu résumes une conversation entre une PME et ESG Mefali, un conseiller ESG. "
+    "Conserve les faits sur l'entreprise, les chiffres, les scores, les décisions, "
+    "les documents générés et les questions en suspens. Rédige en français, "
+    "sous forme de puces concises, sans formule de politesse."
+)
+
+# Tâches de résumé en cours (référence forte + dédoublonnage par conversation)
+_refresh_tasks: dict[str, asyncio.Task] = {}
+
+
+def estimate_tokens(text: str | None) -> int:
+    """Estimation rapide du nombre de tokens (~4 caractères par token)."""
+    if not text:
+        return _MESSAGE_OVERHEAD_TOKENS
+    return len(text) // 4 + _MESSAGE_OVERHEAD_TOKENS
+
+
+def _tool_trace(message: Message) -> list[dict]:
+    """Appels de skills rejouables d'un message assistant (entrées avec id et résultat)."""
+    if message.role != "assistant" or not settings.AGENT_HISTORY_REPLAY_TOOLS:
+        return []
+    entries = message.tool_calls_json
+    if not isinstance(entries, list):
+        return []
+    return [e for e in entries if isinstance(e, dict) and e.get("id") and "result" in e]
+
+
+def message_tokens(message: Message) -> int:
+    """Coût estimé d'un message, trace des skills comprise."""
+    cost = estimate_tokens(message.content)
+    for entry in _tool_trace(message):
+        cost += estimate_tokens(entry["result"])
+        cost += estimate_tokens(json.dumps(entry.get("input") or {}, ensure_ascii=False))
+    return cost
+
+
+def to_chat_messages(message: Message) -> list[dict]:
+    """
+    Convertit un message stocké au format chat OpenAI.
+    Un message assistant avec trace devient : pour chaque tour, un message assistant
+    portant les tool_calls suivi des messages `tool`, puis la réponse finale.
+    """
+    trace = _tool_trace(message)
+    if not trace:
+        return [{"role": message.role, "content": message.content}]
+
+    turns: dict[int, list[dict]] = {}
+    for entry in trace:
+        turns.setdefault(entry.get("turn", 0), []).append(entry)
+
+    chat: list[dict] = []
+    for turn in sorted(turns):
+        entries = turns[turn]
+        chat.append(
+            {
+                "role": "assistant",
+                "content": None,
+                "tool_calls": [
+                    {
+                        "id": e["id"],
+                        "type": "function",
+                        "function": {
+                            "name": e["name"],
+                            "arguments": json.dumps(e.get("input") or {}, ensure_ascii=False),
+                        },
+                    }
+                    for e in entries
+                ],
+            }
+        )
+        chat.extend(
+            {"role": "tool", "tool_call_id": e["id"], "content": e["result"]} for e in entries
+        )
+    chat.append({"role": "assistant", "content": message.content})
+    return chat
+
+
+def select_window(messages: list[Message], budget: int) -> list[Message]:
+    """
+    Sélectionne les messages les plus récents qui tiennent dans le budget.
+    `messages` est trié du plus récent au plus ancien ; le résultat aussi.
+    Le message le plus récent est toujours conservé.
+    """
+    window: list[Message] = []
+    used = 0
+    for m in messages:
+        cost = message_tokens(m)
+        if window and used + cost > budget:
+            break
+        window.append(m)
+        used += cost
+    return window
+
+
+def unsummarized(outside: list[Message], summary_upto) -> list[Message]:
+    """
+    Messages hors fenêtre (du plus récent au plus ancien) plus récents que le dernier
+    message déjà résumé, en ordre chronologique.
+    """
+    return [m for m in reversed(outside) if summary_upto is None or m.created_at > summary_upto]
+
+
+def cap_pending(pending: list[Message], budget: int) -> list[Message]:
+    """
+    Derniers messages de `pending` (ordre chronologique) qui tiennent dans le budget :
+    les plus anciens sont abandonnés.
+    """
+    kept = 0
+    used = 0
+    for m in reversed(pending):
+        cost = estimate_tokens(m.content)
+        if used + cost > budget:
+            break
+        used += cost
+        kept += 1
+    return pending[len(pending) - kept:]
+
+
+class HistoryManager:
+    """Charge l'historique d'une conversation dans un budget de tokens."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def load(self, conversation_id: str) -> list[dict]:
+        """
+        Retourne l'historique au format chat (ordre chronologique), résumé en tête si besoin.
+        Les messages sortis de la fenêtre mais pas encore résumés (moins de
+        AGENT_SUMMARY_MIN_MESSAGES, ou résumé en cours) suivent le résumé, sans leur
+        trace de skills et dans la limite de AGENT_HISTORY_PENDING_TOKEN_BUDGET : ils ne
+        disparaissent pas du contexte en attendant le résumé.
+        """
+        conv = await self.db.get(Conversation, uuid.UUID(str(conversation_id)))
+        summary = conv.summary if conv else None
+
+        budget = settings.AGENT_HISTORY_TOKEN_BUDGET
+        if summary:
+            budget = max(0, budget - estimate_tokens(summary))
+
+        recent = await _fetch_recent(self.db, conversation_id)
+        window = select_window(recent, budget)
+        pending = cap_pending(
+            unsummarized(recent[len(window):], conv.summary_upto if conv else None),
+            settings.AGENT_HISTORY_PENDING_TOKEN_BUDGET,
+        )
+
+        history = [
+            *({"role": m.role, "content": m.content} for m in pending if m.content),
+            *(chat for m in reversed(window) for chat in to_chat_messages(m)),
+        ]
+        if summary and len(window) < len(recent):
+            history.insert(
+                0,
+                {
+                    "role": "system",
+                    "content": f"Résumé des échanges précédents de cette conversation :\n{summary}",
+                },
+            )
+        return history
+
+    @staticmethod
+    def schedule_refresh(conversation_id: str) -> None:
+        """Lance la mise à jour du résumé en arrière-plan (une seule à la fois par conversation)."""
+        key = str(conversation_id)
+        task = _refresh_tasks.get(key)
+        if task and not task.done():
+            return
+        task = asyncio.create_task(_refresh_summary_task(key))
+        _refresh_tasks[key] = task
+        task.add_done_callback(lambda _t: _refresh_tasks.pop(key, None))
+
+
+async def _fetch_recent(db: AsyncSession, conversation_id: str) -> list[Message]:
+    """Derniers messages de la conversation, du plus récent au plus ancien."""
+    result = await db.execute(
+        select(Message)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc())
+        .limit(settings.AGENT_HISTORY_MAX_MESSAGES)
+    )
+    return list(result.scalars().all())
+
+
+async def _refresh_summary_task(conversation_id: str) -> None:
+    try:
+        async with async_session() as db:
+            await refresh_summary(db, conversation_id)
+    except Exception:
+        logger.exception("Échec de la mise à jour du résumé (conversation %s)", conversation_id)
+
+
+async def refresh_summary(db: AsyncSession, conversation_id: str) -> bool:
+    """
+    Replie dans le résumé les messages sortis de la fenêtre de budget et pas encore résumés.
+    Retourne True si le résumé a été mis à jour.
+    """
+    conv = await db.get(Conversation, uuid.UUID(str(conversation_id)))
+    if not conv:
+        return False
+
+    recent = await _fetch_recent(db, conversation_id)
+    budget = settings.AGENT_HISTORY_TOKEN_BUDGET
+    if conv.summary:
+        budget = max(0, budget - estimate_tokens(conv.summary))
+    window = select_window(recent, budget)
+
+    overflow = unsummarized(recent[len(window):], conv.summary_upto)
+    if len(overflow) < settings.AGENT_SUMMARY_MIN_MESSAGES:
+        return False
+
+    summary = await _summarize(conv.summary, overflow)
+    if not summary:
+        return False
+
+    conv.summary = summary
+    conv.summary_upto = overflow[-1].created_at
+    await db.commit()
+    return True
+
+
+async def _summarize(previous: str | None, messages: list[Message]) -> str:
+    """Appelle le LLM pour intégrer de nouveaux échanges au résumé existant."""
+    transcript = "\n".join(
+        f"{'Utilisateur' if m.role == 'user' else 'Assistant'} : {m.content}"
+        for m in messages
+        if m.content
+    )
+    prompt = (
+        f"Résumé actuel :\n{previous or '(aucun)'}\n\n"
+        f"Nouveaux échanges à intégrer :\n{transcript}\n\n"
+        f"Produis le résumé mis à jour (max {settings.AGENT_SUMMARY_MAX_TOKENS} tokens)."
+    )
+    client = get_llm_client()
+    response = await complete(
+        client,
+        Task.SUMMARY,
+        max_tokens=settings.AGENT_SUMMARY_MAX_TOKENS,
+        messages=[
+            {"role": "system", "content": _SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+    )
+    return (response.choices[0].message.content or "").strip()
@@ -0,0 +1,132 @@
+"""
+Instrumentation de la boucle agent.
+
+- measure_db() : temps passé en requêtes SQL dans le contexte courant (listeners
+  SQLAlchemy installés par install_db_timer() au démarrage) ;
+- RunMetrics : mesures d'un run (tours LLM et skills), persistées en fin de run
+  dans agent_metrics, en tâche de fond, hors du chemin critique du stream.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.core.database import async_session
+from app.models.agent_metric import AgentMetric
+
+logger = logging.getLogger(__name__)
+
+
+class DBTimer:
+    """Cumul du temps SQL (ms) et du nombre de requêtes."""
+
+    def __init__(self) -> None:
+        self.ms = 0.0
+        self.queries = 0
+
+
+_db_timer: ContextVar[DBTimer | None] = ContextVar("agent_db_timer", default=None)
+_installed_engines: set[int] = set()
+
+# Tâches d'écriture en cours (référence forte jusqu'à leur fin)
+_persist_tasks: set[asyncio.Task] = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("agent_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("agent_query_start")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    timer = _db_timer.get()
+    if timer is not None:
+        timer.ms += elapsed * 1000
+        timer.queries += 1
+
+
+def install_db_timer(engine: AsyncEngine | Any) -> None:
+    """Branche le chronométrage des requêtes SQL sur un moteur (idempotent)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if id(sync_engine) in _installed_engines:
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    _installed_engines.add(id(sync_engine))
+
+
+@contextmanager
+def measure_db():
+    """Mesure le temps SQL des requêtes exécutées dans le bloc (tâche courante uniquement)."""
+    timer = DBTimer()
+    token = _db_timer.set(timer)
+    try:
+        yield timer
+    finally:
+        _db_timer.reset(token)
+
+
+class RunMetrics:
+    """Mesures d'un run agent, en attente de persistance."""
+
+    def __init__(self, conversation_id: str | None, model: str):
+        self.conversation_id = conversation_id
+        self.model = model
+        self.rows: list[dict[str, Any]] = []
+
+    def llm_turn(self, turn: int, stats: dict) -> None:
+        self.rows.append(
+            {
+                "kind": "llm_turn",
+                "name": stats.get("model") or self.model,
+                "turn": turn,
+                "duration_ms": stats.get("stream_ms") or 0.0,
+                "ttft_ms": stats.get("ttft_ms"),
+                "prompt_tokens": stats.get("prompt_tokens"),
+                "completion_tokens": stats.get("completion_tokens"),
+                "cached_tokens": stats.get("cached_tokens"),
+            }
+        )
+
+    def skill(
+        self, name: str, turn: int, duration_ms: float, db_ms: float | None, is_error: bool
+    ) -> None:
+        self.rows.append(
+            {
+                "kind": "skill",
+                "name": name,
+                "turn": turn,
+                "duration_ms": round(duration_ms, 1),
+                "db_ms": round(db_ms, 1) if db_ms is not None else None,
+                "is_error": is_error,
+            }
+        )
+
+    def flush(self) -> None:
+        """Persiste les mesures en arrière-plan (sans bloquer la fin du stream)."""
+        if not self.rows or not settings.AGENT_METRICS_ENABLED:
+            return
+        rows, self.rows = self.rows, []
+        task = asyncio.create_task(_persist(self.conversation_id, rows))
+        _persist_tasks.add(task)
+        task.add_done_callback(_persist_tasks.discard)
+
+
+async def _persist(conversation_id: str | None, rows: list[dict[str, Any]]) -> None:
+    conv_id = uuid.UUID(str(conversation_id)) if conversation_id else None
+    try:
+        async with async_session() as db:
+            db.add_all(AgentMetric(conversation_id=conv_id, **row) for row in rows)
+            await db.commit()
+    except Exception:
+        logger.exception("Échec de l'enregistrement des métriques agent")
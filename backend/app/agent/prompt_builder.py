@@ -1,14 +1,16 @@
 """
 Construit le system prompt dynamique pour l'agent ESG.
 3 parties : identité/rôle fixe + contexte entreprise + liste des skills.
-"""
 
+Le préfixe fixe est une constante de module, construite une seule fois et
+octet-stable : il est envoyé avec un marqueur cache_control pour que les
+providers compatibles (OpenRouter/Anthropic) le mettent en cache côté serveur.
+"""
 
-def build_system_prompt(entreprise: dict | None, skills: list[dict]) -> str:
-    """Construit le system prompt en fonction du contexte."""
+from app.config import settings
 
-    # --- Partie fixe : identité et rôle ---
-    prompt = """Tu es ESG Mefali, un conseiller expert en finance durable et conformité ESG
+# --- Partie fixe : identité et rôle ---
+_STATIC_PROMPT = """Tu es ESG Mefali, un conseiller expert en finance durable et conformité ESG
 pour les PME africaines francophones.
 
 ## Ton rôle
@@ -159,9 +161,33 @@ RÈGLES pour Mermaid :
 - Pour lister les intermédiaires d'un fonds : utilise `get_intermediaires`
 """
 
-    # --- Partie dynamique : contexte entreprise ---
-    if entreprise:
-        prompt += f"""
+
+def build_static_prefix() -> str:
+    """Préfixe fixe (identité, mise en forme, règles), identique pour toutes les requêtes."""
+    return _STATIC_PROMPT
+
+
+_PROFIL_LABELS = {
+    "pratiques_environnementales": "Pratiques environnementales",
+    "certifications": "Certifications",
+    "objectifs_declares": "Objectifs déclarés",
+    "risques_identifies": "Risques identifiés",
+    "pratiques_sociales": "Pratiques sociales",
+    "gouvernance": "Gouvernance",
+    "energie": "Énergie",
+    "dechets": "Gestion des déchets",
+    "eau": "Gestion de l'eau",
+    "biodiversite": "Biodiversité",
+    "chaine_approvisionnement": "Chaîne d'approvisionnement",
+}
+
+
+def build_company_block(entreprise: dict | None) -> str:
+    """Bloc par entreprise : infos de base et profil enrichi."""
+    if not entreprise:
+        return ""
+
+    block = f"""
 ## Entreprise actuelle
 - ID : {entreprise.get('id', 'N/A')}
 - Nom : {entreprise.get('nom', 'N/A')}
@@ -170,38 +196,63 @@ RÈGLES pour Mermaid :
 - Effectifs : {entreprise.get('effectifs', 'N/A')}
 - CA : {entreprise.get('chiffre_affaires', 'N/A')} {entreprise.get('devise', 'XOF')}
 """
-        profil = entreprise.get("profil_json") or {}
-        if profil:
-            prompt += "\n### Profil enrichi (informations collectées)\n"
-            _profil_labels = {
-                "pratiques_environnementales": "Pratiques environnementales",
-                "certifications": "Certifications",
-                "objectifs_declares": "Objectifs déclarés",
-                "risques_identifies": "Risques identifiés",
-                "pratiques_sociales": "Pratiques sociales",
-                "gouvernance": "Gouvernance",
-                "energie": "Énergie",
-                "dechets": "Gestion des déchets",
-                "eau": "Gestion de l'eau",
-                "biodiversite": "Biodiversité",
-                "chaine_approvisionnement": "Chaîne d'approvisionnement",
-            }
-            for key, value in profil.items():
-                label = _profil_labels.get(key, key.replace("_", " ").capitalize())
-                if isinstance(value, list):
-                    prompt += f"- {label} : {', '.join(str(v) for v in value)}\n"
-                elif isinstance(value, dict):
-                    items = [f"{k}: {v}" for k, v in value.items()]
-                    prompt += f"- {label} : {'; '.join(items)}\n"
-                else:
-                    prompt += f"- {label} : {value}\n"
-
-    # --- Partie dynamique : skills disponibles ---
-    prompt += """
+    profil = entreprise.get("profil_json") or {}
+    if profil:
+        block += "\n### Profil enrichi (informations collectées)\n"
+        for key, value in profil.items():
+            label = _PROFIL_LABELS.get(key, key.replace("_", " ").capitalize())
+            if isinstance(value, list):
+                block += f"- {label} : {', '.join(str(v) for v in value)}\n"
+            elif isinstance(value, dict):
+                items = [f"{k}: {v}" for k, v in value.items()]
+                block += f"- {label} : {'; '.join(items)}\n"
+            else:
+                block += f"- {label} : {value}\n"
+    return block
+
+
+def build_turn_block(skills: list[dict]) -> str:
+    """Bloc par tour : liste des skills disponibles."""
+    block = """
 ## Tes outils (skills)
 Tu disposes des outils suivants. Utilise-les quand c'est pertinent :
 """
     for skill in skills:
-        prompt += f"- **{skill['name']}** : {skill['description']}\n"
+        block += f"- **{skill['name']}** : {skill['description']}\n"
+    return block
+
+
+def build_system_prompt(entreprise: dict | None, skills: list[dict]) -> str:
+    """Construit le system prompt en fonction du contexte."""
+    return build_static_prefix() + build_company_block(entreprise) + build_turn_block(skills)
+
+
+def build_system_message(entreprise: dict | None, skills: list[dict]) -> dict:
+    """
+    Construit le message system à envoyer au LLM.
 
-    return prompt
+    Avec LLM_PROMPT_CACHE, le contenu est découpé en parts : le préfixe fixe et le
+    bloc entreprise portent un marqueur cache_control (ignoré par les providers
+    qui ne le gèrent pas), le bloc skills reste hors cache.
+    """
+    if not settings.LLM_PROMPT_CACHE:
+        return {"role": "system", "content": build_system_prompt(entreprise, skills)}
+
+    parts = [
+        {
+            "type": "text",
+            "text": build_static_prefix(),
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+    company_block = build_company_block(entreprise)
+    if company_block:
+        parts.append(
+            {
+                "type": "text",
+                "text": company_block,
+                "cache_control": {"type": "ephemeral"},
+            }
+        )
+    parts.append({"type": "text", "text": build_turn_block(skills)})
+    return {"role": "system", "content": parts}
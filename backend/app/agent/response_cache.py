@@ -0,0 +1,173 @@
+"""
+Cache de réponses sémantique pour les questions génériques (« c'est quoi la taxonomie
+BCEAO ? », « comment postuler au GCF ? »), consulté avant la boucle agent.
+
+- clé : question normalisée (correspondance exacte, sans appel d'embedding), sinon
+  similarité cosinus de l'embedding ≥ AGENT_RESPONSE_CACHE_THRESHOLD ;
+- seules les questions sans marque personnelle (« mon », « notre », « je »…), posées
+  en début de conversation, sont concernées ; une réponse n'est mise en cache que si
+  le run n'a appelé que des skills génériques (AGENT_RESPONSE_CACHE_SKILLS, sans
+  entreprise_id ; search_knowledge_base limité à source="fonds"), sans job
+  d'arrière-plan, et si elle ne cite pas le nom de l'entreprise ;
+- TTL (AGENT_RESPONSE_CACHE_TTL) et éviction LRU (AGENT_RESPONSE_CACHE_SIZE).
+
+Cache en mémoire, propre au processus ; désactivé par défaut (AGENT_RESPONSE_CACHE).
+"""
+
+import logging
+import math
+import operator
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+
+from app.agent.tool_router import normalize
+from app.config import settings
+from app.rag.embeddings import get_embedding
+
+logger = logging.getLogger(__name__)
+
+_SPACES_RE = re.compile(r"[^\w']+")
+
+# Question qui porte sur l'utilisateur ou son entreprise (réponse non générique)
+_PERSONAL_RE = re.compile(r"\b(je|me|moi|mon|ma|mes|nous|notre|nos|on)\b|\b[jm]'")
+
+# Skills qui lisent l'entreprise dans le contexte (doc_chunks) plutôt que dans leurs arguments
+_COMPANY_SEARCH_SKILLS = frozenset({"search_knowledge_base"})
+
+
+def normalize_question(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces réduits."""
+    return _SPACES_RE.sub(" ", normalize(text)).strip()
+
+
+def _unit(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else vector
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    """Produit scalaire de deux vecteurs déjà normalisés."""
+    return sum(map(operator.mul, a, b))
+
+
+@dataclass
+class CachedAnswer:
+    key: str
+    vector: list[float] | None
+    answer: str
+    created_at: float
+    hits: int = 0
+
+
+@dataclass
+class CacheLookup:
+    """Résultat d'une consultation : réponse trouvée, ou clé/vecteur réutilisés pour store()."""
+
+    key: str
+    vector: list[float] | None
+    entry: CachedAnswer | None = None
+    similarity: float | None = None
+
+
+class ResponseCache:
+    def __init__(self, embed: Callable[[str], Awaitable[list[float]]] = get_embedding):
+        self._embed = embed
+        self._entries: OrderedDict[str, CachedAnswer] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @staticmethod
+    def eligible(message: str) -> bool:
+        if not settings.AGENT_RESPONSE_CACHE:
+            return False
+        question = normalize_question(message)
+        return (
+            len(question) >= settings.AGENT_RESPONSE_CACHE_MIN_CHARS
+            and not _PERSONAL_RE.search(question)
+        )
+
+    @staticmethod
+    def cacheable_run(tool_calls: list[dict], answer: str, entreprise: dict | None) -> bool:
+        """Réponse indépendante de l'entreprise (skills génériques uniquement, nom non cité)."""
+        if not answer.strip():
+            return False
+        generic = {
+            name.strip() for name in settings.AGENT_RESPONSE_CACHE_SKILLS.split(",") if name.strip()
+        }
+        for call in tool_calls:
+            params = call.get("input") or {}
+            if call["name"] not in generic or params.get("entreprise_id"):
+                return False
+            # Hors source « fonds », la recherche porte aussi sur les documents de l'entreprise
+            if call["name"] in _COMPANY_SEARCH_SKILLS and params.get("source", "all") != "fonds":
+                return False
+        nom = (entreprise or {}).get("nom")
+        return not (nom and normalize(nom) in normalize(answer))
+
+    async def lookup(self, message: str) -> CacheLookup:
+        """Cherche une réponse pour la question ; l'échec de l'embedding vaut un miss."""
+        self._purge()
+        key = normalize_question(message)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return self._hit(CacheLookup(key, entry.vector, entry, 1.0))
+
+        try:
+            vector = _unit(await self._embed(key))
+        except Exception as e:
+            logger.warning("Cache de réponses : embedding indisponible (%s)", e)
+            self.misses += 1
+            return CacheLookup(key, None)
+
+        best: CachedAnswer | None = None
+        best_score = 0.0
+        for candidate in self._entries.values():
+            if candidate.vector is None or len(candidate.vector) != len(vector):
+                continue
+            score = _cosine(vector, candidate.vector)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is not None and best_score >= settings.AGENT_RESPONSE_CACHE_THRESHOLD:
+            return self._hit(CacheLookup(key, vector, best, round(best_score, 4)))
+        self.misses += 1
+        return CacheLookup(key, vector)
+
+    def store(self, lookup: CacheLookup, answer: str) -> None:
+        self._entries[lookup.key] = CachedAnswer(lookup.key, lookup.vector, answer, time.monotonic())
+        self._entries.move_to_end(lookup.key)
+        self.stores += 1
+        while len(self._entries) > max(1, settings.AGENT_RESPONSE_CACHE_SIZE):
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _hit(self, lookup: CacheLookup) -> CacheLookup:
+        lookup.entry.hits += 1
+        self._entries.move_to_end(lookup.entry.key)
+        self.hits += 1
+        return lookup
+
+    def _purge(self) -> None:
+        expires_before = time.monotonic() - settings.AGENT_RESPONSE_CACHE_TTL
+        for key in [k for k, e in self._entries.items() if e.created_at < expires_before]:
+            del self._entries[key]
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.AGENT_RESPONSE_CACHE,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,192 @@
+"""
+Runs agent détachés de la connexion SSE, pour des streams reprenables.
+
+Chaque message lance un AgentRun : la boucle agent tourne dans une tâche asyncio
+(avec sa propre session BDD) et publie ses événements, numérotés, dans un tampon
+borné (AGENT_STREAM_BUFFER_SIZE). Une réponse SSE n'est qu'un lecteur du tampon :
+un client reconnecté avec Last-Event-ID reçoit les événements manqués puis suit
+le run en direct, sans relancer le LLM ni les skills.
+
+Sans aucun lecteur pendant AGENT_DISCONNECT_GRACE secondes (onglet fermé), le run est
+annulé : le stream LLM et les skills en cours s'arrêtent, la réponse partielle est
+sauvegardée par l'engine.
+
+Les runs terminés restent consultables AGENT_STREAM_TTL secondes (mémoire du processus).
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator
+from typing import Any
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AgentRun:
+    """Un run agent et le tampon de ses événements SSE."""
+
+    def __init__(self, conversation_id: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.conversation_id = conversation_id
+        self.events: deque[tuple[int, dict[str, Any]]] = deque(
+            maxlen=max(1, settings.AGENT_STREAM_BUFFER_SIZE)
+        )
+        self.last_seq = 0
+        self.done = False
+        self.finished_at: float | None = None
+        self.task: asyncio.Task | None = None
+        self.readers = 0
+        self._changed = asyncio.Event()
+        self._cancel_handle: asyncio.TimerHandle | None = None
+
+    def event_id(self, seq: int) -> str:
+        """Identifiant SSE d'un événement : `<run_id>:<seq>`."""
+        return f"{self.id}:{seq}"
+
+    def publish(self, event: dict[str, Any]) -> None:
+        self.last_seq += 1
+        self.events.append((self.last_seq, event))
+        self._wake()
+
+    def finish(self) -> None:
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._clear_cancel()
+        self._wake()
+
+    def cancel(self, reason: str = "plus aucun client connecté") -> None:
+        """Annule le run en cours (CancelledError propagé dans la boucle agent)."""
+        self._cancel_handle = None
+        if self.task is not None and not self.task.done():
+            logger.info("Run %s annulé : %s", self.id, reason)
+            self.task.cancel()
+
+    def _attach(self) -> None:
+        self.readers += 1
+        self._clear_cancel()
+
+    def _detach(self) -> None:
+        self.readers -= 1
+        if self.readers > 0 or self.done:
+            return
+        grace = settings.AGENT_DISCONNECT_GRACE
+        if grace <= 0:
+            self.cancel()
+        else:
+            self._cancel_handle = asyncio.get_running_loop().call_later(grace, self.cancel)
+
+    def _clear_cancel(self) -> None:
+        if self._cancel_handle is not None:
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+
+    def _wake(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def can_replay_from(self, after_seq: int) -> bool:
+        """Vrai si tous les événements postérieurs à after_seq sont encore dans le tampon."""
+        if after_seq > self.last_seq:
+            return False
+        first_seq = self.events[0][0] if self.events else self.last_seq + 1
+        return after_seq >= first_seq - 1
+
+    async def follow(self, after_seq: int = 0) -> AsyncGenerator[tuple[int, dict[str, Any]], None]:
+        """
+        Rejoue les événements après after_seq, puis suit le run jusqu'à sa fin.
+        Le lecteur est compté tant que le générateur est ouvert (détection de déconnexion).
+        """
+        seq = after_seq
+        self._attach()
+        try:
+            while True:
+                changed = self._changed
+                for event_seq, event in list(self.events):
+                    if event_seq > seq:
+                        seq = event_seq
+                        yield event_seq, event
+                if self.done and seq >= self.last_seq:
+                    return
+                await changed.wait()
+        finally:
+            self._detach()
+
+
+class AgentRunManager:
+    """Runs en cours et récemment terminés, par conversation."""
+
+    def __init__(self) -> None:
+        self._runs: dict[str, AgentRun] = {}
+
+    def start(self, conversation_id: str, events: AsyncIterator[dict[str, Any]]) -> AgentRun:
+        """
+        Lance la consommation de `events` en tâche de fond et retourne le run.
+        Un run encore actif sur la conversation est annulé (nouveau message de
+        l'utilisateur) ; le nouveau run attend sa fin (réponse partielle sauvegardée)
+        pour que les messages des deux runs ne s'entremêlent pas.
+        """
+        self._purge()
+        previous = self._runs.get(conversation_id)
+        if previous is not None and previous.task is not None and not previous.task.done():
+            previous.cancel("remplacé par un nouveau message")
+        else:
+            previous = None
+        run = AgentRun(conversation_id)
+        self._runs[conversation_id] = run
+        run.task = asyncio.create_task(
+            self._consume(run, events, previous.task if previous else None)
+        )
+        return run
+
+    async def _consume(
+        self,
+        run: AgentRun,
+        events: AsyncIterator[dict[str, Any]],
+        previous: asyncio.Task | None = None,
+    ) -> None:
+        try:
+            if previous is not None:
+                await asyncio.wait([previous])
+            async for event in events:
+                run.publish(event)
+        except asyncio.CancelledError:
+            run.publish({"type": "error", "content": "Réponse interrompue"})
+            raise
+        except Exception as e:
+            logger.exception("Erreur dans le run agent %s", run.id)
+            run.publish({"type": "error", "content": str(e)})
+        finally:
+            run.finish()
+
+    def get(self, conversation_id: str) -> AgentRun | None:
+        self._purge()
+        return self._runs.get(conversation_id)
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [
+            conv_id
+            for conv_id, run in self._runs.items()
+            if run.finished_at is not None and now - run.finished_at > settings.AGENT_STREAM_TTL
+        ]
+        for conv_id in expired:
+            del self._runs[conv_id]
+
+
+agent_runs = AgentRunManager()
+
+
+def parse_last_event_id(value: str | None) -> tuple[str, int] | None:
+    """Décode un Last-Event-ID `<run_id>:<seq>` (None si absent ou invalide)."""
+    if not value or ":" not in value:
+        return None
+    run_id, _, seq = value.rpartition(":")
+    try:
+        return run_id, int(seq)
+    except ValueError:
+        return None
@@ -0,0 +1,169 @@
+"""
+Pré-routage des skills : sélectionne, pour chaque message, le sous-ensemble de tools
+envoyé au LLM (définitions OpenAI + liste du system prompt).
+
+Sélection locale, sans appel réseau :
+- un socle toujours présent (AGENT_TOOL_CORE) ;
+- les catégories de skills dont un mot-clé apparaît dans le message, ou dans le
+  dernier échange (une réponse courte « oui, vas-y » suit la proposition de l'assistant) ;
+- les skills dont la description partage au moins AGENT_TOOL_MIN_OVERLAP racines
+  avec le message (index des descriptions mis en cache par version de tool) ;
+- les skills déjà appelés dans l'historique récent.
+
+Les tools précèdent le system prompt dans le préfixe mis en cache par le provider :
+au sein d'une conversation, la sélection ne fait que s'étendre (tools déjà proposés
+conservés, ordre du catalogue), pour que le préfixe ne change qu'à l'apparition d'une
+nouvelle catégorie et non à chaque tour (AGENT_TOOL_STABLE).
+"""
+
+import re
+import unicodedata
+from collections import OrderedDict
+
+from app.config import settings
+
+# Mots-clés (sans accents, en minuscules) par catégorie de skill : préfixes de mots,
+# sauf les sigles courts (≤ 3 lettres, mot exact) et les expressions (sous-chaîne)
+_CATEGORY_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "esg": (
+        "esg", "score", "conformit", "referentiel", "bceao", "ifc", "gcf", "pilier",
+        "gouvernance", "social", "environnement", "durabilit", "notation",
+    ),
+    "carbon": (
+        "carbone", "co2", "emission", "ges", "empreinte", "energie", "electricit",
+        "carburant", "diesel", "climat", "tco2",
+    ),
+    "finance": (
+        "fonds", "financ", "credit", "pret", "banque", "subvention", "candidat",
+        "postul", "intermediaire", "bailleur", "investiss", "eligib",
+    ),
+    "reporting": (
+        "rapport", "pdf", "word", "docx", "lettre", "note", "plan d'affaires",
+        "budget", "telecharg", "redige", "rediger", "genere",
+    ),
+    "document": ("document", "fichier", "upload", "pdf", "dossier", "piece", "analyse"),
+    "utils": (
+        "plan d'action", "action", "benchmark", "secteur", "compar", "moyenne",
+        "progres", "suivi",
+    ),
+    "knowledge": ("norme", "reglement", "loi", "definition", "qu'est", "explique"),
+}
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STEM_LEN = 6
+_MIN_WORD_LEN = 4
+_STOP_WORDS = frozenset(
+    "avec dans pour par sur sous entre vers chez sans plus moins tres tout tous toute "
+    "toutes cette ces son ses leur leurs notre nos votre vos mon mes ton tes "
+    "etre avoir fait faire peut doit sont etait elle elles nous vous ils quel quelle "
+    "quels quelles comme aussi donc alors mais encore deja selon type liste retourne "
+    "utilise utiliser entreprise donnees optionnel".split()
+)
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stems(text: str) -> set[str]:
+    """Racines grossières (préfixes de 6 lettres) des mots significatifs."""
+    return {
+        word[:_STEM_LEN]
+        for word in _WORD_RE.findall(normalize(text))
+        if len(word) >= _MIN_WORD_LEN and word not in _STOP_WORDS
+    }
+
+
+# Index des descriptions : (nom, description) → racines
+_description_stems: dict[tuple[str, str], frozenset[str]] = {}
+
+
+def _tool_stems(tool: dict) -> frozenset[str]:
+    key = (tool["name"], tool.get("description") or "")
+    cached = _description_stems.get(key)
+    if cached is None:
+        cached = frozenset(stems(key[0].replace("_", " ") + " " + key[1]))
+        _description_stems[key] = cached
+    return cached
+
+
+def matched_categories(text: str) -> set[str]:
+    norm = normalize(text)
+    words = set(_WORD_RE.findall(norm))
+    found = set()
+    for category, keywords in _CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            if " " in keyword or "'" in keyword:
+                hit = keyword in norm
+            elif len(keyword) <= 3:
+                hit = keyword in words
+            else:
+                hit = any(word.startswith(keyword) for word in words)
+            if hit:
+                found.add(category)
+                break
+    return found
+
+
+def _conversation_state(history: list[dict]) -> tuple[str, set[str]]:
+    """Texte du dernier échange et skills appelés dans l'historique récent."""
+    recent = history[-settings.AGENT_TOOL_STICKY_MESSAGES:] if history else []
+    used = {
+        call["function"]["name"]
+        for message in recent
+        for call in message.get("tool_calls") or []
+        if call.get("function", {}).get("name")
+    }
+    last_texts = [
+        message["content"]
+        for message in recent[-2:]
+        if message.get("role") in ("user", "assistant") and isinstance(message.get("content"), str)
+    ]
+    return " ".join(last_texts), used
+
+
+# Tools déjà proposés par conversation (LRU, mémoire du processus)
+_CONVERSATION_TOOLS_SIZE = 1000
+_conversation_tools: "OrderedDict[str, frozenset[str]]" = OrderedDict()
+
+
+def select_tools(
+    tools: list[dict],
+    message: str,
+    history: list[dict] | None = None,
+    conversation_id: str | None = None,
+) -> list[dict]:
+    """Sous-ensemble des tools pertinents pour le message (ordre du catalogue conservé).
+
+    Avec conversation_id, les tools proposés aux tours précédents restent inclus.
+    """
+    if not settings.AGENT_TOOL_ROUTING or not tools:
+        return tools
+
+    core = {name.strip() for name in settings.AGENT_TOOL_CORE.split(",") if name.strip()}
+    previous_text, used = _conversation_state(history or [])
+    categories = matched_categories(message) | matched_categories(previous_text)
+    message_stems = stems(message)
+    min_overlap = max(1, settings.AGENT_TOOL_MIN_OVERLAP)
+
+    selected = []
+    for tool in tools:
+        name = tool["name"]
+        if (
+            name in core
+            or name in used
+            or tool.get("category") in categories
+            or len(message_stems & _tool_stems(tool)) >= min_overlap
+        ):
+            selected.append(tool)
+
+    if conversation_id is None or not settings.AGENT_TOOL_STABLE:
+        return selected
+    key = str(conversation_id)
+    offered = _conversation_tools.pop(key, frozenset()) | {t["name"] for t in selected}
+    _conversation_tools[key] = offered
+    while len(_conversation_tools) > _CONVERSATION_TOOLS_SIZE:
+        _conversation_tools.popitem(last=False)
+    return [tool for tool in tools if tool["name"] in offered]
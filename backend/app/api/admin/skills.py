@@ -21,6 +21,7 @@ from app.schemas.skill import (
     SkillTestResponse,
     SkillUpdateRequest,
 )
+from app.skills.catalogue import invalidate_skill_catalogue
 
 router = APIRouter(prefix="/api/admin/skills", tags=["admin-skills"])
 
@@ -91,10 +92,12 @@ async def create_skill(
         input_schema=body.input_schema,
         handler_key=body.handler_key,
         handler_code=body.handler_code,
+        is_read_only=body.is_read_only,
         created_by=admin.id,
     )
     db.add(skill)
     await db.commit()
+    invalidate_skill_catalogue()
     await db.refresh(skill)
     return skill
 
@@ -142,6 +145,7 @@ async def update_skill(
     skill.updated_at = datetime.now(timezone.utc)
 
     await db.commit()
+    invalidate_skill_catalogue()
     await db.refresh(skill)
     return skill
 
@@ -163,6 +167,7 @@ async def delete_skill(
 
     await db.delete(skill)
     await db.commit()
+    invalidate_skill_catalogue()
     return {"detail": "Skill supprimé"}
 
 
@@ -182,6 +187,7 @@ async def toggle_skill(
     skill.updated_at = datetime.now(timezone.utc)
 
     await db.commit()
+    invalidate_skill_catalogue()
     await db.refresh(skill)
     return skill
 
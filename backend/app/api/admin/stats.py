@@ -2,12 +2,19 @@
 Router /api/admin/stats — Dashboard statistiques admin.
 """
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, func
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import Integer, select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.agent.response_cache import response_cache
 from app.core.database import get_db
 from app.core.dependencies import require_admin
+from app.core.llm import get_llm_pool_stats
+from app.rag.embedding_cache import embedding_cache
+from app.rag.embeddings import embedding_coalescer
+from app.rag.ingestion import document_ingestion
 from app.models.user import User
 from app.models.entreprise import Entreprise
 from app.models.conversation import Conversation
@@ -15,6 +22,7 @@ from app.models.esg_score import ESGScore
 from app.models.skill import Skill
 from app.models.referentiel_esg import ReferentielESG
 from app.models.fonds_vert import FondsVert
+from app.models.agent_metric import AgentMetric
 
 router = APIRouter(prefix="/api/admin/stats", tags=["admin-stats"])
 
@@ -45,3 +53,107 @@ async def get_dashboard_stats(
         "referentiels": referentiels_count,
         "fonds_verts": fonds_count,
     }
+
+
+@router.get("/llm-pool")
+async def get_llm_pool(admin: User = Depends(require_admin)):
+    """Métriques du pool de connexions du client LLM partagé."""
+    return get_llm_pool_stats()
+
+
+@router.get("/response-cache")
+async def get_response_cache(admin: User = Depends(require_admin)):
+    """Taux de succès du cache de réponses de l'agent (questions génériques)."""
+    return response_cache.stats()
+
+
+@router.get("/embeddings")
+async def get_embeddings_stats(admin: User = Depends(require_admin)):
+    """Cache d'embeddings (mémoire et table) et remplissage des batches regroupés."""
+    return {"cache": embedding_cache.stats(), "coalescer": embedding_coalescer.stats()}
+
+
+@router.get("/ingestion")
+async def get_ingestion_stats(admin: User = Depends(require_admin)):
+    """File d'ingestion des documents uploadés (workers, en attente, en cours, échecs)."""
+    return document_ingestion.stats()
+
+
+def _p(fraction: float, column):
+    return func.percentile_cont(fraction).within_group(column)
+
+
+def _ms(value) -> float | None:
+    return round(float(value), 1) if value is not None else None
+
+
+@router.get("/agent-latency")
+async def get_agent_latency(
+    days: int = Query(7, ge=1, le=90, description="Fenêtre d'analyse en jours"),
+    admin: User = Depends(require_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Latences p50/p95 de la boucle agent : par skill et par modèle LLM."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    in_window = AgentMetric.created_at >= since
+
+    skill_rows = (await db.execute(
+        select(
+            AgentMetric.name,
+            func.count(),
+            func.sum(func.cast(AgentMetric.is_error, Integer)),
+            _p(0.5, AgentMetric.duration_ms),
+            _p(0.95, AgentMetric.duration_ms),
+            _p(0.5, AgentMetric.db_ms),
+            _p(0.95, AgentMetric.db_ms),
+        )
+        .where(AgentMetric.kind == "skill", in_window)
+        .group_by(AgentMetric.name)
+        .order_by(_p(0.95, AgentMetric.duration_ms).desc())
+    )).all()
+
+    model_rows = (await db.execute(
+        select(
+            AgentMetric.name,
+            func.count(),
+            _p(0.5, AgentMetric.ttft_ms),
+            _p(0.95, AgentMetric.ttft_ms),
+            _p(0.5, AgentMetric.duration_ms),
+            _p(0.95, AgentMetric.duration_ms),
+            func.avg(AgentMetric.prompt_tokens),
+            func.avg(AgentMetric.completion_tokens),
+            func.avg(AgentMetric.cached_tokens),
+        )
+        .where(AgentMetric.kind == "llm_turn", in_window)
+        .group_by(AgentMetric.name)
+    )).all()
+
+    return {
+        "days": days,
+        "skills": [
+            {
+                "skill": name,
+                "count": count,
+                "errors": errors or 0,
+                "p50_ms": _ms(p50),
+                "p95_ms": _ms(p95),
+                "db_p50_ms": _ms(db50),
+                "db_p95_ms": _ms(db95),
+            }
+            for name, count, errors, p50, p95, db50, db95 in skill_rows
+        ],
+        "models": [
+            {
+                "model": name,
+                "turns": count,
+                "ttft_p50_ms": _ms(t50),
+                "ttft_p95_ms": _ms(t95),
+                "stream_p50_ms": _ms(s50),
+                "stream_p95_ms": _ms(s95),
+                "avg_prompt_tokens": _ms(prompt),
+                "avg_completion_tokens": _ms(completion),
+                "avg_cached_tokens": _ms(cached),
+            }
+            for name, count, t50, t95, s50, s95, prompt, completion, cached in model_rows
+        ],
+    }
@@ -6,14 +6,16 @@ Endpoints : CRUD conversations + envoi de message avec streaming SSE.
 import json
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, Header, HTTPException, UploadFile, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sse_starlette.sse import EventSourceResponse
 
 from app.agent.engine import AgentEngine
-from app.core.database import get_db
+from app.agent.runs import AgentRun, agent_runs, parse_last_event_id
+from app.core.database import async_session, get_db
 from app.core.dependencies import get_current_user
+from app.core.llm_scheduler import llm_user
 from app.core.stt import STTService, get_stt_service
 from app.models.conversation import Conversation
 from app.models.entreprise import Entreprise
@@ -26,6 +28,7 @@ from app.schemas.chat import (
     MessageResponse,
     SendMessageRequest,
 )
+from app.skills.jobs import skill_jobs
 from app.skills.registry import SkillRegistry
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
@@ -79,6 +82,42 @@ async def _verify_conversation_access(
     return conv
 
 
+async def _agent_events(
+    conversation_id: uuid.UUID,
+    user_message: str,
+    entreprise: dict,
+    user_id: uuid.UUID,
+    prelude: tuple[dict, ...] = (),
+):
+    """Événements de la boucle agent, avec une session BDD propre : le run survit à la connexion SSE."""
+    # Appels LLM du run (et des skills / jobs lancés) comptés pour cet utilisateur
+    llm_user.set(str(user_id))
+    for event in prelude:
+        yield event
+    async with async_session() as db:
+        engine = AgentEngine(db, SkillRegistry(db))
+        async for event in engine.run(
+            conversation_id=str(conversation_id),
+            user_message=user_message,
+            entreprise=entreprise,
+        ):
+            yield event
+
+
+def _sse_response(run: AgentRun, after_seq: int = 0) -> EventSourceResponse:
+    """Stream SSE d'un run : chaque événement porte l'id `<run_id>:<seq>` (reprise via Last-Event-ID)."""
+
+    async def event_generator():
+        async for seq, event in run.follow(after_seq):
+            yield {
+                "id": run.event_id(seq),
+                "event": event["type"],
+                "data": json.dumps(event, ensure_ascii=False, default=str),
+            }
+
+    return EventSourceResponse(event_generator())
+
+
 # ---- Endpoints ----
 
 
@@ -165,36 +204,52 @@ async def send_message(
     - event: text         -> Texte de la réponse (streaming mot par mot)
     - event: skill_start  -> Un skill commence (nom + params)
     - event: skill_result -> Un skill a fini (résumé du résultat)
+    - event: skill_progress -> Avancement d'un job d'arrière-plan (documents longs)
     - event: done         -> Fin de la réponse
     - event: error        -> Erreur
+
+    Le run continue si la connexion tombe : GET /conversations/{id}/stream avec
+    Last-Event-ID rejoue les événements manqués puis suit le run.
     """
     conv = await _verify_conversation_access(conversation_id, user, db)
 
     # Charger le contexte entreprise
     entreprise_dict = await _get_entreprise_dict(conv.entreprise_id, db)
 
-    # Instancier le registry et l'engine
-    registry = SkillRegistry(db)
-    engine = AgentEngine(db, registry)
+    run = agent_runs.start(
+        str(conversation_id),
+        _agent_events(conversation_id, body.message, entreprise_dict, user.id),
+    )
+    return _sse_response(run)
 
-    async def event_generator():
-        try:
-            async for event in engine.run(
-                conversation_id=str(conversation_id),
-                user_message=body.message,
-                entreprise=entreprise_dict,
-            ):
-                yield {
-                    "event": event["type"],
-                    "data": json.dumps(event, ensure_ascii=False, default=str),
-                }
-        except Exception as e:
-            yield {
-                "event": "error",
-                "data": json.dumps({"type": "error", "content": str(e)}),
-            }
 
-    return EventSourceResponse(event_generator())
+@router.get("/conversations/{conversation_id}/stream")
+async def resume_stream(
+    conversation_id: uuid.UUID,
+    last_event_id: str | None = Header(default=None),
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Reprend le stream SSE du dernier run de la conversation : rejoue les événements
+    postérieurs à Last-Event-ID (tous si absent), puis suit le run en direct.
+    """
+    await _verify_conversation_access(conversation_id, user, db)
+
+    run = agent_runs.get(str(conversation_id))
+    if run is None:
+        raise HTTPException(status_code=404, detail="Aucun stream à reprendre")
+
+    after_seq = 0
+    parsed = parse_last_event_id(last_event_id)
+    if parsed:
+        run_id, after_seq = parsed
+        if run_id != run.id:
+            raise HTTPException(status_code=404, detail="Stream expiré")
+    if not run.can_replay_from(after_seq):
+        raise HTTPException(status_code=409, detail="Événements manquants hors du tampon")
+
+    return _sse_response(run, after_seq)
 
 
 ALLOWED_AUDIO_TYPES = {
@@ -251,34 +306,18 @@ async def send_audio_message(
     # Charger le contexte entreprise
     entreprise_dict = await _get_entreprise_dict(conv.entreprise_id, db)
 
-    # Instancier le registry et l'engine
-    registry = SkillRegistry(db)
-    engine = AgentEngine(db, registry)
-
-    async def event_generator():
-        # Envoyer d'abord la transcription au frontend
-        yield {
-            "event": "transcript",
-            "data": json.dumps({"type": "transcript", "text": transcript}, ensure_ascii=False),
-        }
-        # Puis lancer l'agent normalement avec le texte transcrit
-        try:
-            async for event in engine.run(
-                conversation_id=str(conversation_id),
-                user_message=transcript,
-                entreprise=entreprise_dict,
-            ):
-                yield {
-                    "event": event["type"],
-                    "data": json.dumps(event, ensure_ascii=False, default=str),
-                }
-        except Exception as e:
-            yield {
-                "event": "error",
-                "data": json.dumps({"type": "error", "content": str(e)}),
-            }
-
-    return EventSourceResponse(event_generator())
+    # Envoyer d'abord la transcription au frontend, puis lancer l'agent normalement
+    run = agent_runs.start(
+        str(conversation_id),
+        _agent_events(
+            conversation_id,
+            transcript,
+            entreprise_dict,
+            user.id,
+            prelude=({"type": "transcript", "text": transcript},),
+        ),
+    )
+    return _sse_response(run)
 
 
 @router.delete("/conversations/{conversation_id}", status_code=204)
@@ -291,3 +330,17 @@ async def delete_conversation(
     conv = await _verify_conversation_access(conversation_id, user, db)
     await db.delete(conv)
     await db.commit()
+
+
+@router.get("/jobs/{job_id}")
+async def get_skill_job(
+    job_id: str,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """État d'un job d'arrière-plan (génération de documents) : avancement et résultat."""
+    job = skill_jobs.get(job_id)
+    if job is None or job.conversation_id is None:
+        raise HTTPException(status_code=404, detail="Job introuvable ou expiré")
+    await _verify_conversation_access(uuid.UUID(job.conversation_id), user, db)
+    return job.to_dict()
@@ -1,4 +1,4 @@
-"""API endpoints pour la gestion des documents (upload, liste, détail, suppression)."""
+"""API endpoints pour la gestion des documents (upload, liste, détail, relance, suppression)."""
 
 import os
 import uuid
@@ -14,9 +14,7 @@ from app.core.dependencies import get_current_user
 from app.models.document import DocChunk, Document
 from app.models.entreprise import Entreprise
 from app.models.user import User
-from app.rag.chunker import chunk_text
-from app.rag.embeddings import get_embeddings_batch
-from app.rag.text_extractor import extract_text_from_file
+from app.rag.ingestion import FAILED, PENDING, document_ingestion
 from app.schemas.document import DocumentDetailResponse, DocumentResponse
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
@@ -72,7 +70,8 @@ async def upload_document(
 ):
     """
     Upload un document (PDF, image, Word, Excel).
-    Extrait le texte, crée les chunks et embeddings pour le RAG.
+    Le fichier est enregistré et le document retourné en statut « pending » ;
+    extraction, chunks et embeddings sont faits en arrière-plan (app/rag/ingestion.py).
     """
     # Vérifier l'accès à l'entreprise
     await _verify_entreprise_access(entreprise_id, user, db)
@@ -97,29 +96,21 @@ async def upload_document(
     content = await file.read()
     file_path.write_bytes(content)
 
-    # Extraire le texte
-    try:
-        texte = await extract_text_from_file(str(file_path), file.content_type)
-    except Exception:
-        texte = None
-
-    # Créer le document en BDD
+    # Créer le document en BDD, puis le confier aux workers d'ingestion
     doc = Document(
         entreprise_id=entreprise_id,
         nom_fichier=file.filename or "document",
         type_mime=file.content_type,
         chemin_stockage=str(file_path),
         taille=len(content),
-        texte_extrait=texte,
+        status=PENDING,
+        progress=0,
     )
     db.add(doc)
     await db.commit()
     await db.refresh(doc)
 
-    # Créer les chunks + embeddings (synchrone pour le MVP)
-    if texte and texte.strip():
-        await _create_chunks(doc.id, texte, db)
-
+    document_ingestion.submit(doc.id)
     return doc
 
 
@@ -163,11 +154,40 @@ async def get_document(
         taille=doc.taille,
         metadata_json=doc.metadata_json,
         created_at=doc.created_at,
+        status=doc.status,
+        progress=doc.progress,
+        error=doc.error,
         texte_extrait=doc.texte_extrait,
         chunk_count=chunk_count,
     )
 
 
+@router.post("/{document_id}/retry", response_model=DocumentResponse, status_code=202)
+async def retry_document(
+    document_id: uuid.UUID,
+    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Relance l'ingestion d'un document en échec, sans nouvel upload.
+    Reprend à l'étape en échec (texte extrait et chunks déjà insérés conservés).
+    """
+    doc = await _verify_document_access(document_id, user, db)
+    if doc.status != FAILED:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Seul un document en échec peut être relancé (statut : {doc.status})",
+        )
+
+    doc.status = PENDING
+    doc.error = None
+    await db.commit()
+    await db.refresh(doc)
+
+    document_ingestion.submit(doc.id)
+    return doc
+
+
 @router.delete("/{document_id}", status_code=204)
 async def delete_document(
     document_id: uuid.UUID,
@@ -186,26 +206,3 @@ async def delete_document(
     await db.delete(doc)
     await db.commit()
 
-
-async def _create_chunks(document_id: uuid.UUID, texte: str, db: AsyncSession):
-    """Crée les chunks + embeddings pour un document."""
-    chunks = chunk_text(texte, chunk_size=800, overlap=200)
-    if not chunks:
-        return
-
-    # Générer les embeddings en batch
-    texts = [c["text"] for c in chunks]
-    embeddings = await get_embeddings_batch(texts)
-
-    # Insérer les chunks
-    for chunk, embedding in zip(chunks, embeddings):
-        doc_chunk = DocChunk(
-            document_id=document_id,
-            contenu=chunk["text"],
-            embedding=embedding,
-            page_number=chunk.get("page"),
-            chunk_index=chunk["index"],
-        )
-        db.add(doc_chunk)
-
-    await db.commit()
@@ -7,6 +7,8 @@ from sqlalchemy import select
 
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Task, complete
 from app.core.notifications import create_notification
 from app.models.user import User
 from app.models.entreprise import Entreprise
@@ -227,13 +229,7 @@ async def suggest_field(
     if not entreprise:
         raise HTTPException(404, "Aucune entreprise trouvee")
 
-    from app.config import settings
-    from openai import AsyncOpenAI
-
-    client = AsyncOpenAI(
-        base_url=settings.LLM_BASE_URL,
-        api_key=settings.LLM_API_KEY,
-    )
+    client = get_llm_client()
 
     prompt = f"""Tu es un assistant specialise dans les candidatures aux fonds verts africains.
 
@@ -250,10 +246,11 @@ Genere une reponse appropriee pour ce champ de formulaire.
 La reponse doit etre professionnelle, concise et adaptee au contexte ESG/fonds vert.
 Reponds uniquement avec le texte a inserer dans le champ, sans explication."""
 
-    response = await client.chat.completions.create(
-        model=settings.LLM_MODEL,
+    response = await complete(
+        client,
+        Task.FIELD_SUGGEST,
+        user=str(user.id),
         messages=[{"role": "user", "content": prompt}],
-        max_tokens=500,
     )
 
     return {"suggestion": response.choices[0].message.content}
@@ -13,6 +13,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Task, complete
+from app.core.llm_scheduler import llm_user
 from app.models.user import User
 from app.models.entreprise import Entreprise
 from app.reports.generator import generate_report, UPLOADS_DIR
@@ -58,16 +61,10 @@ async def _verify_ownership(
 # ── LLM callback ─────────────────────────────────────────
 
 async def _llm_callback(prompt: str) -> str:
-    from openai import AsyncOpenAI
-    from app.config import settings
-
-    client = AsyncOpenAI(
-        base_url=settings.LLM_BASE_URL,
-        api_key=settings.LLM_API_KEY,
-    )
-    response = await client.chat.completions.create(
-        model=settings.LLM_MODEL,
-        max_tokens=1500,
+    client = get_llm_client()
+    response = await complete(
+        client,
+        Task.REPORT_SECTION,
         messages=[
             {
                 "role": "system",
@@ -93,6 +90,8 @@ async def generate_report_endpoint(
 ):
     """Génère un rapport PDF pour une entreprise."""
     await _verify_ownership(body.entreprise_id, user, db)
+    # File d'attente LLM équitable par utilisateur (app/core/llm_scheduler.py)
+    llm_user.set(str(user.id))
 
     valid_templates = ["esg_full", "carbon", "funding_application"]
     if body.template_name not in valid_templates:
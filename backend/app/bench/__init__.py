@@ -0,0 +1 @@
+"""Benchmarks hors réseau de la boucle agent (LLM simulé, BDD réelle)."""
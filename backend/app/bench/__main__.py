@@ -0,0 +1,51 @@
+"""
+Benchmark de la boucle agent — exécutable avec : python -m app.bench
+
+Exemples :
+  python -m app.bench --conversations 20
+  python -m app.bench --mode http --ttft-ms 500 --tokens-per-s 30
+  python -m app.bench --script scenario.json
+"""
+
+import argparse
+import asyncio
+import json
+
+from app.bench.agent_loop import run_benchmark
+from app.core.database import engine
+
+
+async def main(args: argparse.Namespace) -> None:
+    modes = ("engine", "http") if args.mode == "both" else (args.mode,)
+    try:
+        summaries = await run_benchmark(
+            conversations=args.conversations,
+            modes=modes,
+            ttft_ms=args.ttft_ms,
+            tokens_per_s=args.tokens_per_s,
+            script_path=args.script,
+        )
+    finally:
+        await engine.dispose()
+
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    print("=== Benchmark boucle agent (LLM simulé) ===\n")
+    for s in summaries:
+        print(f"[{s['mode']}] {s['runs']} conversations, {s['errors']} erreur(s), {s['wall_s']}s")
+        print(f"  débit        : {s['throughput_runs_per_s']} runs/s")
+        print(f"  TTFT         : p50={s['ttft_p50_ms']}ms p95={s['ttft_p95_ms']}ms")
+        print(f"  durée        : p50={s['duration_p50_ms']}ms p95={s['duration_p95_ms']}ms")
+        print(f"  requêtes SQL : {s['db_queries_per_run']}/run ({s['db_ms_per_run']}ms/run)\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la boucle agent hors réseau")
+    parser.add_argument("--conversations", type=int, default=10, help="Conversations concurrentes")
+    parser.add_argument("--mode", choices=["engine", "http", "both"], default="both")
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--tokens-per-s", type=float, default=50.0)
+    parser.add_argument("--script", default="", help="Script JSON du LLM simulé")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    asyncio.run(main(parser.parse_args()))
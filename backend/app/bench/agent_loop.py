@@ -0,0 +1,221 @@
+"""
+Benchmark de la boucle agent avec le LLM local simulé (app/core/fake_llm.py).
+
+Deux modes, sur N conversations concurrentes :
+- engine : AgentEngine.run() directement (une session BDD par conversation) ;
+- http   : POST /api/chat/conversations/{id}/message via l'app ASGI (SSE complet).
+
+Mesures par run : TTFT (premier événement text), durée totale, nombre et temps des
+requêtes SQL, tokens de prompt (mode engine, tools compris). Nécessite la BDD
+(utilisateur, entreprise et conversations temporaires, supprimés en fin de
+benchmark) ; aucun accès réseau au LLM.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import delete
+
+from app.agent.engine import AgentEngine
+from app.agent.metrics import install_db_timer, measure_db
+from app.config import settings
+from app.core.database import async_session, engine as db_engine
+from app.core.llm import close_llm_client, init_llm_client
+from app.core.security import hash_password
+from app.models.agent_metric import AgentMetric
+from app.models.conversation import Conversation
+from app.models.entreprise import Entreprise
+from app.models.user import User
+from app.skills.registry import SkillRegistry
+
+# Scénario par défaut : un appel de skill (get_company_profile) puis une réponse texte
+DEFAULT_SCRIPT_PATH = str(Path(__file__).with_name("scenario_profile.json"))
+
+BENCH_MESSAGE = "Peux-tu me rappeler le profil de mon entreprise ?"
+
+
+@dataclass
+class RunResult:
+    ttft_ms: float | None
+    duration_ms: float
+    db_queries: int
+    db_ms: float
+    error: str | None = None
+    prompt_tokens: int | None = None
+
+
+@dataclass
+class Fixture:
+    user_id: uuid.UUID
+    email: str
+    password: str
+    entreprise: dict
+    conversation_ids: list[uuid.UUID] = field(default_factory=list)
+
+
+def percentile(values: list[float], fraction: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 1)
+
+
+async def _create_fixture(conversations: int) -> Fixture:
+    password = uuid.uuid4().hex
+    email = f"bench_{uuid.uuid4().hex[:12]}@bench.local"
+    async with async_session() as db:
+        user = User(email=email, password_hash=hash_password(password), nom_complet="Benchmark")
+        db.add(user)
+        await db.flush()
+        entreprise = Entreprise(
+            user_id=user.id,
+            nom="BenchCorp",
+            secteur="agriculture",
+            pays="Côte d'Ivoire",
+            ville="Abidjan",
+            effectifs=25,
+            profil_json={},
+        )
+        db.add(entreprise)
+        await db.flush()
+        convs = [Conversation(entreprise_id=entreprise.id, titre="Benchmark") for _ in range(conversations)]
+        db.add_all(convs)
+        await db.commit()
+        return Fixture(
+            user_id=user.id,
+            email=email,
+            password=password,
+            entreprise={"id": str(entreprise.id), "nom": entreprise.nom, "secteur": "agriculture",
+                        "pays": entreprise.pays, "ville": entreprise.ville, "effectifs": 25,
+                        "profil_json": {}},
+            conversation_ids=[c.id for c in convs],
+        )
+
+
+async def _drop_fixture(fixture: Fixture) -> None:
+    async with async_session() as db:
+        await db.execute(delete(AgentMetric).where(AgentMetric.conversation_id.in_(fixture.conversation_ids)))
+        await db.execute(delete(Conversation).where(Conversation.id.in_(fixture.conversation_ids)))
+        await db.execute(delete(Entreprise).where(Entreprise.user_id == fixture.user_id))
+        await db.execute(delete(User).where(User.id == fixture.user_id))
+        await db.commit()
+
+
+async def _run_engine(conversation_id: uuid.UUID, entreprise: dict) -> RunResult:
+    started = time.perf_counter()
+    ttft = None
+    error = None
+    with measure_db() as timer:
+        async with async_session() as db:
+            agent = AgentEngine(db, SkillRegistry(db))
+            async for event in agent.run(str(conversation_id), BENCH_MESSAGE, entreprise):
+                if event["type"] == "text" and ttft is None:
+                    ttft = (time.perf_counter() - started) * 1000
+                elif event["type"] == "error":
+                    error = event.get("content")
+    prompt_tokens = sum(s.get("prompt_tokens") or 0 for s in agent.turn_stats)
+    return RunResult(
+        ttft, (time.perf_counter() - started) * 1000, timer.queries, timer.ms, error, prompt_tokens
+    )
+
+
+async def _run_http(client, headers: dict, conversation_id: uuid.UUID) -> RunResult:
+    started = time.perf_counter()
+    ttft = None
+    error = None
+    with measure_db() as timer:
+        async with client.stream(
+            "POST",
+            f"/api/chat/conversations/{conversation_id}/message",
+            json={"message": BENCH_MESSAGE},
+            headers=headers,
+        ) as response:
+            event_type = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event_type = line.split(":", 1)[1].strip()
+                elif line.startswith("data:") and event_type == "text" and ttft is None:
+                    ttft = (time.perf_counter() - started) * 1000
+                elif line.startswith("data:") and event_type == "error":
+                    error = json.loads(line.split(":", 1)[1]).get("content")
+    return RunResult(ttft, (time.perf_counter() - started) * 1000, timer.queries, timer.ms, error)
+
+
+async def _bench_mode(mode: str, fixture: Fixture) -> list[RunResult]:
+    if mode == "engine":
+        return await asyncio.gather(
+            *(_run_engine(cid, fixture.entreprise) for cid in fixture.conversation_ids)
+        )
+
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import app
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        login = await client.post(
+            "/api/auth/login", json={"email": fixture.email, "password": fixture.password}
+        )
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        return await asyncio.gather(
+            *(_run_http(client, headers, cid) for cid in fixture.conversation_ids)
+        )
+
+
+def summarize(mode: str, results: list[RunResult], wall_s: float) -> dict[str, Any]:
+    ok = [r for r in results if r.error is None]
+    ttfts = [r.ttft_ms for r in ok if r.ttft_ms is not None]
+    durations = [r.duration_ms for r in ok]
+    tokens = [r.prompt_tokens for r in ok if r.prompt_tokens is not None]
+    return {
+        "mode": mode,
+        "runs": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": round(wall_s, 2),
+        "throughput_runs_per_s": round(len(ok) / wall_s, 2) if wall_s else None,
+        "ttft_p50_ms": percentile(ttfts, 0.5),
+        "ttft_p95_ms": percentile(ttfts, 0.95),
+        "duration_p50_ms": percentile(durations, 0.5),
+        "duration_p95_ms": percentile(durations, 0.95),
+        "db_queries_per_run": round(sum(r.db_queries for r in ok) / len(ok), 1) if ok else None,
+        "db_ms_per_run": round(sum(r.db_ms for r in ok) / len(ok), 1) if ok else None,
+        "prompt_tokens_per_run": round(sum(tokens) / len(tokens), 1) if tokens else None,
+    }
+
+
+async def run_benchmark(
+    conversations: int = 10,
+    modes: tuple[str, ...] = ("engine", "http"),
+    ttft_ms: float = 300.0,
+    tokens_per_s: float = 50.0,
+    script_path: str = "",
+) -> list[dict[str, Any]]:
+    """Lance le benchmark et retourne un résumé par mode."""
+    settings.LLM_FAKE = True
+    settings.LLM_FAKE_TTFT_MS = ttft_ms
+    settings.LLM_FAKE_TOKENS_PER_S = tokens_per_s
+    settings.LLM_FAKE_SCRIPT = script_path or DEFAULT_SCRIPT_PATH
+
+    await close_llm_client()
+    init_llm_client()
+    install_db_timer(db_engine)
+
+    summaries = []
+    for mode in modes:
+        fixture = await _create_fixture(conversations)
+        try:
+            started = time.perf_counter()
+            results = await _bench_mode(mode, fixture)
+            summaries.append(summarize(mode, results, time.perf_counter() - started))
+            # Laisser finir les tâches de fond (résumé, métriques) avant le nettoyage
+            await asyncio.sleep(0.5)
+        finally:
+            await _drop_fixture(fixture)
+
+    await close_llm_client()
+    return summaries
@@ -0,0 +1,136 @@
+"""
+Benchmark des providers d'embeddings (app/rag/providers.py), hors BDD.
+
+Pour chaque provider : débit d'ingestion (chunks/s, via get_embeddings_batch, cache
+désactivé) et débit / latence des requêtes unitaires concurrentes (get_embedding,
+regroupées par le coalescer). Les providers indisponibles (clé absente, dépendance
+optionnelle manquante) sont signalés et ignorés.
+
+Exécutable avec : python -m app.bench.embeddings --providers hashing,local,voyage
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any
+
+from app.bench.agent_loop import percentile
+from app.config import settings
+from app.rag import providers
+from app.rag.embeddings import get_embedding, get_embeddings_batch
+
+_WORDS = (
+    "taxonomie verte BCEAO financement climat entreprise agricole émissions carbone "
+    "énergie solaire irrigation coopérative Côte d'Ivoire Sénégal fonds GCF SUNREF "
+    "gouvernance sociale environnementale critères éligibilité dossier candidature "
+    "banque intermédiaire prêt subvention adaptation atténuation biodiversité eau "
+    "déchets recyclage transport diesel électricité plan d'action indicateurs"
+).split()
+
+
+def build_corpus(chunks: int, chunk_chars: int = 800, seed: int = 42) -> list[str]:
+    """Chunks pseudo-aléatoires de la taille de ceux du chunker (800 caractères)."""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(chunks):
+        words: list[str] = [f"Section {i}."]
+        while sum(len(w) + 1 for w in words) < chunk_chars:
+            words.append(rng.choice(_WORDS))
+        corpus.append(" ".join(words)[:chunk_chars])
+    return corpus
+
+
+async def _bench_provider(
+    name: str, corpus: list[str], queries: list[str], concurrency: int
+) -> dict[str, Any]:
+    settings.EMBEDDING_PROVIDER = name
+    started = time.perf_counter()
+    vectors = await get_embeddings_batch(corpus)
+    ingest_s = time.perf_counter() - started
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    latencies: list[float] = []
+
+    async def query(text: str) -> None:
+        async with semaphore:
+            t0 = time.perf_counter()
+            await get_embedding(text)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(query(q) for q in queries))
+    query_s = time.perf_counter() - started
+
+    return {
+        "provider": name,
+        "model": providers.get_provider(name).model_id,
+        "dim": len(vectors[0]) if vectors else None,
+        "ingest_chunks": len(corpus),
+        "ingest_s": round(ingest_s, 3),
+        "ingest_chunks_per_s": round(len(corpus) / ingest_s, 1) if ingest_s else None,
+        "queries": len(queries),
+        "queries_per_s": round(len(queries) / query_s, 1) if query_s else None,
+        "query_p50_ms": percentile(latencies, 0.5),
+        "query_p95_ms": percentile(latencies, 0.95),
+    }
+
+
+async def run_embedding_benchmark(
+    names: list[str], chunks: int = 200, queries: int = 100, concurrency: int = 16
+) -> list[dict[str, Any]]:
+    """Compare les providers ; une entrée {"provider", "error"} par provider indisponible."""
+    corpus = build_corpus(chunks)
+    query_texts = [
+        f"Question {i} : {' '.join(random.Random(i).sample(_WORDS, 6))}" for i in range(queries)
+    ]
+    previous = settings.EMBEDDING_PROVIDER, settings.EMBEDDING_CACHE
+    settings.EMBEDDING_CACHE = False  # mesurer le provider, pas le cache
+    results = []
+    try:
+        for name in names:
+            try:
+                results.append(await _bench_provider(name, corpus, query_texts, concurrency))
+            except Exception as e:
+                results.append({"provider": name, "error": str(e)})
+    finally:
+        settings.EMBEDDING_PROVIDER, settings.EMBEDDING_CACHE = previous
+        await providers.close_providers()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit d'ingestion et de requête par provider d'embeddings")
+    parser.add_argument("--providers", default="hashing,local,voyage", help="Providers à comparer")
+    parser.add_argument("--chunks", type=int, default=200, help="Chunks à ingérer")
+    parser.add_argument("--queries", type=int, default=100, help="Requêtes unitaires")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requêtes simultanées")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(
+        run_embedding_benchmark(
+            [p.strip() for p in args.providers.split(",") if p.strip()],
+            args.chunks,
+            args.queries,
+            args.concurrency,
+        )
+    )
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print(f"=== Benchmark embeddings (dim={settings.EMBEDDING_DIM}) ===\n")
+        for r in results:
+            if "error" in r:
+                print(f"[{r['provider']}] indisponible : {r['error']}\n")
+                continue
+            print(f"[{r['provider']}] {r['model']}")
+            print(
+                f"  ingestion : {r['ingest_chunks']} chunks en {r['ingest_s']}s "
+                f"({r['ingest_chunks_per_s']} chunks/s)"
+            )
+            print(
+                f"  requêtes  : {r['queries_per_s']} req/s, "
+                f"p50={r['query_p50_ms']}ms p95={r['query_p95_ms']}ms\n"
+            )
@@ -0,0 +1,344 @@
+"""
+Enregistrement et rejeu de conversations réelles.
+
+  python -m app.bench.replay export -o traces.json [--conversation ID ...] [--days 7] [--limit 50]
+  python -m app.bench.replay run traces.json [--ttft-ms 0] [--tokens-per-s 0] [--json]
+
+export : reconstruit depuis messages (dont tool_calls_json) les échanges de chaque
+conversation — message utilisateur, appels de skills par tour LLM, réponse finale,
+durée observée — avec un instantané de l'entreprise.
+
+run : sur la BDD pointée par DATABASE_URL (base fraîche seedée), recrée pour chaque
+conversation une entreprise temporaire, puis rejoue chaque échange dans AgentEngine.run
+avec le LLM simulé à partir de la trace (mêmes skills, mêmes arguments). Rapport :
+latences par skill, durée de chaque tour LLM (stream puis skills) et par échange,
+comparées aux durées enregistrées.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import httpx
+from openai import AsyncOpenAI
+from sqlalchemy import delete, select
+
+from app.agent.engine import AgentEngine
+from app.agent.metrics import install_db_timer, measure_db
+from app.bench.agent_loop import percentile
+from app.config import settings
+from app.core.database import async_session, engine as db_engine
+from app.core.fake_llm import FakeLLMTransport
+from app.core.llm import close_llm_client, init_llm_client
+from app.core.security import hash_password
+from app.models.agent_metric import AgentMetric
+from app.models.conversation import Conversation
+from app.models.entreprise import Entreprise
+from app.models.message import Message
+from app.models.user import User
+from app.skills.registry import SkillRegistry
+
+TRACE_VERSION = 1
+
+_ENTREPRISE_FIELDS = (
+    "nom", "secteur", "sous_secteur", "pays", "ville", "effectifs",
+    "chiffre_affaires", "devise", "description", "profil_json",
+)
+
+
+# ── Export ────────────────────────────────────────────────
+
+
+def build_exchanges(messages: list[Message]) -> list[dict[str, Any]]:
+    """Regroupe les messages (ordre chronologique) en échanges utilisateur → assistant."""
+    exchanges: list[dict[str, Any]] = []
+    current: dict[str, Any] | None = None
+    for m in messages:
+        if m.role == "user":
+            current = {"user": m.content, "user_at": m.created_at.isoformat(), "tool_calls": []}
+            exchanges.append(current)
+        elif m.role == "assistant" and current is not None and "assistant" not in current:
+            current["assistant"] = m.content
+            current["recorded_ms"] = round(
+                (m.created_at - datetime.fromisoformat(current["user_at"])).total_seconds() * 1000, 1
+            )
+            current["tool_calls"] = [
+                {"name": e["name"], "input": e.get("input") or {}, "turn": e.get("turn", 0)}
+                for e in (m.tool_calls_json or [])
+                if isinstance(e, dict) and e.get("name")
+            ]
+    return [e for e in exchanges if "assistant" in e]
+
+
+async def export_traces(
+    conversation_ids: list[str] | None = None, days: int = 7, limit: int = 50
+) -> dict[str, Any]:
+    """Exporte les traces des conversations demandées (ou des plus récentes)."""
+    async with async_session() as db:
+        query = select(Conversation)
+        if conversation_ids:
+            query = query.where(Conversation.id.in_([uuid.UUID(c) for c in conversation_ids]))
+        else:
+            since = datetime.now(timezone.utc) - timedelta(days=days)
+            query = (
+                query.where(Conversation.updated_at >= since)
+                .order_by(Conversation.updated_at.desc())
+                .limit(limit)
+            )
+        conversations = (await db.execute(query)).scalars().all()
+
+        traces = []
+        for conv in conversations:
+            entreprise = await db.get(Entreprise, conv.entreprise_id)
+            messages = (await db.execute(
+                select(Message)
+                .where(Message.conversation_id == conv.id)
+                .order_by(Message.created_at.asc())
+            )).scalars().all()
+            exchanges = build_exchanges(list(messages))
+            if not exchanges or entreprise is None:
+                continue
+            snapshot = {f: getattr(entreprise, f) for f in _ENTREPRISE_FIELDS}
+            if snapshot["chiffre_affaires"] is not None:
+                snapshot["chiffre_affaires"] = float(snapshot["chiffre_affaires"])
+            traces.append({
+                "conversation_id": str(conv.id),
+                "entreprise_id": str(entreprise.id),
+                "entreprise": snapshot,
+                "exchanges": exchanges,
+            })
+
+    return {
+        "version": TRACE_VERSION,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "conversations": traces,
+    }
+
+
+# ── Rejeu ─────────────────────────────────────────────────
+
+
+def _remap_ids(value: Any, old_id: str, new_id: str) -> Any:
+    """Remplace l'ID de l'entreprise d'origine par celui de l'entreprise de rejeu."""
+    if isinstance(value, dict):
+        return {k: _remap_ids(v, old_id, new_id) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_remap_ids(v, old_id, new_id) for v in value]
+    return new_id if value == old_id else value
+
+
+def script_for_exchange(exchange: dict[str, Any], old_id: str, new_id: str) -> dict[str, Any]:
+    """Script du LLM simulé : un tour par tour LLM enregistré, puis la réponse finale."""
+    turns: dict[int, list[dict]] = {}
+    for call in exchange["tool_calls"]:
+        turns.setdefault(call.get("turn", 0), []).append(
+            {"name": call["name"], "arguments": _remap_ids(call["input"], old_id, new_id)}
+        )
+    script_turns: list[dict[str, Any]] = [{"tool_calls": turns[t]} for t in sorted(turns)]
+    script_turns.append({"text": exchange["assistant"] or "(réponse vide)"})
+    return {"turns": script_turns}
+
+
+async def _create_replay_entreprise(snapshot: dict[str, Any]) -> tuple[uuid.UUID, dict]:
+    async with async_session() as db:
+        user = User(
+            email=f"replay_{uuid.uuid4().hex[:12]}@bench.local",
+            password_hash=hash_password(uuid.uuid4().hex),
+            nom_complet="Replay",
+        )
+        db.add(user)
+        await db.flush()
+        entreprise = Entreprise(user_id=user.id, **snapshot)
+        db.add(entreprise)
+        await db.commit()
+        entreprise_dict = {"id": str(entreprise.id), **snapshot}
+        return user.id, entreprise_dict
+
+
+async def _drop_replay_user(user_id: uuid.UUID, conversation_ids: list[uuid.UUID]) -> None:
+    async with async_session() as db:
+        await db.execute(delete(AgentMetric).where(AgentMetric.conversation_id.in_(conversation_ids)))
+        await db.execute(delete(User).where(User.id == user_id))
+        await db.commit()
+
+
+async def _replay_conversation(trace: dict[str, Any], ttft_ms: float, tokens_per_s: float) -> list[dict]:
+    user_id, entreprise = await _create_replay_entreprise(trace["entreprise"])
+    conversation_ids: list[uuid.UUID] = []
+    results = []
+    try:
+        async with async_session() as db:
+            conv = Conversation(entreprise_id=uuid.UUID(entreprise["id"]), titre="Replay")
+            db.add(conv)
+            await db.commit()
+            conversation_ids.append(conv.id)
+
+            for exchange in trace["exchanges"]:
+                script = script_for_exchange(exchange, trace["entreprise_id"], entreprise["id"])
+                http_client = httpx.AsyncClient(
+                    transport=FakeLLMTransport(script, ttft_ms=ttft_ms, tokens_per_s=tokens_per_s)
+                )
+                client = AsyncOpenAI(
+                    base_url="http://replay/v1", api_key="replay", http_client=http_client
+                )
+                agent = AgentEngine(db, SkillRegistry(db), client=client)
+
+                started = time.perf_counter()
+                errors = []
+                with measure_db() as timer:
+                    async for event in agent.run(str(conv.id), exchange["user"], entreprise):
+                        if event["type"] == "error":
+                            errors.append(event.get("content"))
+                await http_client.aclose()
+
+                results.append({
+                    "replay_ms": round((time.perf_counter() - started) * 1000, 1),
+                    "recorded_ms": exchange.get("recorded_ms"),
+                    "db_queries": timer.queries,
+                    "db_ms": round(timer.ms, 1),
+                    "skills": [r for r in agent.metrics.rows if r["kind"] == "skill"],
+                    "turns": agent.turn_stats,
+                    "errors": errors,
+                })
+    finally:
+        await _drop_replay_user(user_id, conversation_ids)
+    return results
+
+
+def build_report(exchanges: list[dict[str, Any]]) -> dict[str, Any]:
+    """Agrège les mesures de rejeu : par skill, par tour LLM et par échange."""
+    by_skill: dict[str, list[dict]] = {}
+    skills_by_turn: dict[int, int] = {}
+    by_turn: dict[int, list[dict]] = {}
+    for ex in exchanges:
+        for row in ex["skills"]:
+            by_skill.setdefault(row["name"], []).append(row)
+            skills_by_turn[row["turn"]] = skills_by_turn.get(row["turn"], 0) + 1
+        for stats in ex.get("turns") or []:
+            by_turn.setdefault(stats["turn"], []).append(stats)
+
+    replay = [ex["replay_ms"] for ex in exchanges]
+    recorded = [ex["recorded_ms"] for ex in exchanges if ex.get("recorded_ms") is not None]
+    return {
+        "exchanges": len(exchanges),
+        "errors": sum(1 for ex in exchanges if ex["errors"]),
+        "exchange_ms": {
+            "replay_p50": percentile(replay, 0.5),
+            "replay_p95": percentile(replay, 0.95),
+            "recorded_p50": percentile(recorded, 0.5),
+            "recorded_p95": percentile(recorded, 0.95),
+        },
+        "db_queries_per_exchange": (
+            round(sum(ex["db_queries"] for ex in exchanges) / len(exchanges), 1) if exchanges else None
+        ),
+        "skills": [
+            {
+                "skill": name,
+                "count": len(rows),
+                "errors": sum(1 for r in rows if r["is_error"]),
+                "p50_ms": percentile([r["duration_ms"] for r in rows], 0.5),
+                "p95_ms": percentile([r["duration_ms"] for r in rows], 0.95),
+                "db_p50_ms": percentile([r["db_ms"] or 0.0 for r in rows], 0.5),
+            }
+            for name, rows in sorted(by_skill.items())
+        ],
+        # Durée de chaque tour : stream LLM puis exécution de ses skills
+        "turns": [
+            {
+                "turn": turn,
+                "count": len(rows),
+                "skills": skills_by_turn.get(turn, 0),
+                "llm_p50_ms": percentile([r.get("stream_ms") or 0.0 for r in rows], 0.5),
+                "p50_ms": percentile([r.get("turn_ms") or 0.0 for r in rows], 0.5),
+                "p95_ms": percentile([r.get("turn_ms") or 0.0 for r in rows], 0.95),
+            }
+            for turn, rows in sorted(by_turn.items())
+        ],
+    }
+
+
+async def replay_traces(
+    traces: dict[str, Any], ttft_ms: float = 0.0, tokens_per_s: float = 0.0
+) -> dict[str, Any]:
+    """Rejoue toutes les conversations d'un export (séquentiellement) et retourne le rapport."""
+    if traces.get("version") != TRACE_VERSION:
+        raise ValueError(f"Version de trace non supportée : {traces.get('version')}")
+    # Les mesures du rejeu ne doivent pas polluer agent_metrics
+    settings.AGENT_METRICS_ENABLED = False
+    install_db_timer(db_engine)
+    # Appels LLM hors trace (résumé glissant) : LLM simulé, aucune clé API requise
+    settings.LLM_FAKE = True
+    await close_llm_client()
+    init_llm_client()
+
+    exchanges: list[dict] = []
+    for trace in traces["conversations"]:
+        exchanges.extend(await _replay_conversation(trace, ttft_ms, tokens_per_s))
+    return build_report(exchanges)
+
+
+# ── CLI ───────────────────────────────────────────────────
+
+
+def _print_report(report: dict[str, Any]) -> None:
+    ex = report["exchange_ms"]
+    print("=== Rejeu de conversations ===\n")
+    print(f"Échanges : {report['exchanges']} ({report['errors']} en erreur)")
+    print(f"Durée rejeu : p50={ex['replay_p50']}ms p95={ex['replay_p95']}ms")
+    print(f"Durée enregistrée : p50={ex['recorded_p50']}ms p95={ex['recorded_p95']}ms")
+    print(f"Requêtes SQL / échange : {report['db_queries_per_exchange']}\n")
+    print("Par skill :")
+    for s in report["skills"]:
+        print(
+            f"  {s['skill']:<32} n={s['count']:<4} p50={s['p50_ms']}ms p95={s['p95_ms']}ms "
+            f"sql_p50={s['db_p50_ms']}ms erreurs={s['errors']}"
+        )
+    print("\nPar tour LLM (stream + skills) :")
+    for t in report["turns"]:
+        print(
+            f"  tour {t['turn']} : n={t['count']:<4} p50={t['p50_ms']}ms p95={t['p95_ms']}ms "
+            f"(LLM p50={t['llm_p50_ms']}ms, {t['skills']} skill(s))"
+        )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    try:
+        if args.command == "export":
+            traces = await export_traces(args.conversation, args.days, args.limit)
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(traces, f, ensure_ascii=False, indent=2, default=str)
+            n = sum(len(t["exchanges"]) for t in traces["conversations"])
+            print(f"{len(traces['conversations'])} conversation(s), {n} échange(s) → {args.output}")
+        else:
+            with open(args.traces, encoding="utf-8") as f:
+                traces = json.load(f)
+            report = await replay_traces(traces, args.ttft_ms, args.tokens_per_s)
+            if args.json:
+                print(json.dumps(report, indent=2))
+            else:
+                _print_report(report)
+    finally:
+        await db_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enregistrement / rejeu de conversations")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="Exporter des traces depuis la BDD")
+    exp.add_argument("-o", "--output", required=True)
+    exp.add_argument("--conversation", action="append", help="ID de conversation (répétable)")
+    exp.add_argument("--days", type=int, default=7)
+    exp.add_argument("--limit", type=int, default=50)
+
+    run = sub.add_parser("run", help="Rejouer un export sur la BDD courante")
+    run.add_argument("traces")
+    run.add_argument("--ttft-ms", type=float, default=0.0)
+    run.add_argument("--tokens-per-s", type=float, default=0.0)
+    run.add_argument("--json", action="store_true")
+
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""
+Mesure hors BDD du pré-routage des skills (app/agent/tool_router.py).
+
+Pour un jeu de messages types, compare les tokens de tools envoyés au LLM
+(définitions OpenAI + liste du system prompt) sans et avec pré-routage, sur les
+skills du seed. Les messages sont aussi joués comme une seule conversation pour
+compter les tours dont la liste de tools change (préfixe du cache provider invalidé),
+avec une sélection recalculée à chaque tour puis stable (AGENT_TOOL_STABLE).
+Exécutable avec : python -m app.bench.tool_routing [--json]
+"""
+
+import argparse
+import json
+import uuid
+from typing import Any
+
+from app.agent import tool_router
+from app.agent.prompt_builder import build_turn_block
+from app.agent.tool_router import select_tools
+from app.config import settings
+from app.seed.seed_skills import BUILTIN_SKILLS
+from app.skills.catalogue import to_openai_tool
+
+SAMPLE_MESSAGES = [
+    "Bonjour !",
+    "Peux-tu me rappeler le profil de mon entreprise ?",
+    "Calcule mon empreinte carbone, on consomme 2000 litres de diesel par an",
+    "Quel est mon score ESG selon le référentiel BCEAO ?",
+    "Quels fonds verts pour mon entreprise agricole ?",
+    "Génère-moi un rapport PDF complet",
+    "Où en est mon plan d'action ?",
+    "Aide-moi à postuler au fonds SUNREF",
+    "Merci beaucoup",
+]
+
+
+def _seed_tools() -> list[dict]:
+    return [
+        {
+            "name": skill["nom"],
+            "description": skill["description"],
+            "input_schema": skill["input_schema"],
+            "category": skill.get("category"),
+        }
+        for skill in BUILTIN_SKILLS
+    ]
+
+
+def tool_tokens(tools: list[dict]) -> int:
+    """Tokens estimés (4 caractères/token) des tools : définitions + liste du prompt."""
+    definitions = json.dumps([to_openai_tool(t) for t in tools], ensure_ascii=False)
+    return (len(definitions) + len(build_turn_block(tools))) // 4
+
+
+def _prefix_changes(names: list[list[str]]) -> int:
+    """Tours (après le premier) dont la liste de tools diffère du tour précédent."""
+    return sum(1 for previous, current in zip(names, names[1:]) if previous != current)
+
+
+def measure_tool_routing(messages: list[str] | None = None) -> dict[str, Any]:
+    """Tokens de tools par tour, sans et avec pré-routage, et stabilité du préfixe."""
+    tools = _seed_tools()
+    full = tool_tokens(tools)
+    messages = messages or SAMPLE_MESSAGES
+    routing_enabled, stable_enabled = settings.AGENT_TOOL_ROUTING, settings.AGENT_TOOL_STABLE
+    conversation_id = f"bench-{uuid.uuid4()}"
+    settings.AGENT_TOOL_ROUTING = True
+    try:
+        turns = []
+        for message in messages:
+            selected = select_tools(tools, message)
+            turns.append(
+                {
+                    "message": message,
+                    "tools": len(selected),
+                    "tokens": tool_tokens(selected),
+                    "skills": [t["name"] for t in selected],
+                }
+            )
+        settings.AGENT_TOOL_STABLE = True
+        stable = [select_tools(tools, message, conversation_id=conversation_id) for message in messages]
+    finally:
+        settings.AGENT_TOOL_ROUTING, settings.AGENT_TOOL_STABLE = routing_enabled, stable_enabled
+        tool_router._conversation_tools.pop(conversation_id, None)
+
+    routed = sum(t["tokens"] for t in turns) / len(turns)
+    stable_avg = sum(tool_tokens(selected) for selected in stable) / len(stable)
+    return {
+        "tools_total": len(tools),
+        "tokens_full": full,
+        "tokens_routed_avg": round(routed, 1),
+        "reduction_pct": round(100 * (1 - routed / full), 1) if full else 0.0,
+        "tokens_stable_avg": round(stable_avg, 1),
+        "stable_reduction_pct": round(100 * (1 - stable_avg / full), 1) if full else 0.0,
+        "prefix_changes_routed": _prefix_changes([t["skills"] for t in turns]),
+        "prefix_changes_stable": _prefix_changes([[t["name"] for t in selected] for selected in stable]),
+        "turns": turns,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tokens de tools par tour, avec et sans pré-routage")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    report = measure_tool_routing()
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print("=== Pré-routage des skills ===\n")
+        print(f"Sans pré-routage : {report['tools_total']} tools, {report['tokens_full']} tokens/tour")
+        print(
+            f"Avec pré-routage : {report['tokens_routed_avg']} tokens/tour en moyenne "
+            f"(-{report['reduction_pct']}%)"
+        )
+        print(
+            f"Liste stable par conversation : {report['tokens_stable_avg']} tokens/tour "
+            f"(-{report['stable_reduction_pct']}%)"
+        )
+        print(
+            f"Changements du préfixe de tools sur {len(report['turns'])} tours : "
+            f"{report['prefix_changes_routed']} recalculée, {report['prefix_changes_stable']} stable\n"
+        )
+        for turn in report["turns"]:
+            print(f"  {turn['tools']:>2} tools {turn['tokens']:>5} tokens  {turn['message']}")
@@ -1,3 +1,5 @@
+from typing import Any
+
 from pydantic_settings import BaseSettings
 
 
@@ -11,10 +13,145 @@ class Settings(BaseSettings):
     LLM_API_KEY: str = ""
     LLM_MODEL: str = "anthropic/claude-sonnet-4-5-20250514"
 
+    # Pool de connexions du client LLM partagé (app/core/llm.py)
+    LLM_MAX_CONNECTIONS: int = 50
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 60.0
+    LLM_TIMEOUT: float = 120.0
+    LLM_CONNECT_TIMEOUT: float = 10.0
+    LLM_MAX_RETRIES: int = 2
+
+    # Contrôle d'admission des appels LLM (app/core/llm_scheduler.py) : appels simultanés
+    # (0 = illimité), attente max, et délestage au-delà de LLM_SHED_QUEUE_DEPTH en attente
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_QUEUE_TIMEOUT: float = 120.0
+    LLM_SHED_QUEUE_DEPTH: int = 8
+    LLM_SHED_MAX_TOKENS: int = 1024
+    LLM_SHED_MODEL: str = ""
+
+    # Routage des modèles par tâche (app/core/llm_routing.py) : modèle rapide pour les
+    # appels courts (résumés, suggestions de champs ; vide = LLM_MODEL), modèles de repli
+    # (séparés par des virgules) et surcharges par tâche en JSON
+    # ({"field_suggest": {"model": "...", "max_tokens": 300, "fallbacks": []}})
+    LLM_FAST_MODEL: str = ""
+    LLM_FALLBACK_MODELS: str = ""
+    LLM_ROUTES: dict[str, dict[str, Any]] = {}
+
+    # Cache de prompt côté provider (marqueurs cache_control sur le préfixe fixe)
+    LLM_PROMPT_CACHE: bool = True
+
+    # LLM local simulé (tests / benchmarks hors réseau, voir app/core/fake_llm.py)
+    LLM_FAKE: bool = False
+    LLM_FAKE_SCRIPT: str = ""
+    LLM_FAKE_TTFT_MS: float = 300.0
+    LLM_FAKE_TOKENS_PER_S: float = 50.0
+
     APP_URL: str = "http://localhost:3000"
 
-    # Embeddings (Voyage AI)
+    # Agent : exécution concurrente des skills en lecture seule d'un même tour (les skills
+    # d'écriture s'exécutent seuls, dans l'ordre des appels)
+    AGENT_PARALLEL_SKILLS: bool = True
+    AGENT_SKILL_CONCURRENCY: int = 4
+    # Lancer chaque skill en lecture seule dès que ses arguments ont fini de streamer
+    AGENT_EARLY_TOOL_DISPATCH: bool = True
+    # Réutiliser dans un même run le résultat des skills en lecture seule (mêmes arguments)
+    AGENT_SKILL_MEMO: bool = True
+    # Persister les mesures de chaque run (TTFT, tokens, temps par skill) dans agent_metrics
+    AGENT_METRICS_ENABLED: bool = True
+
+    # Pré-routage des skills (app/agent/tool_router.py) : seuls les tools pertinents pour
+    # le message sont envoyés au LLM, en plus du socle AGENT_TOOL_CORE
+    AGENT_TOOL_ROUTING: bool = True
+    AGENT_TOOL_CORE: str = "get_company_profile,update_company_profile,search_knowledge_base,get_skill_result"
+    AGENT_TOOL_MIN_OVERLAP: int = 2
+    AGENT_TOOL_STICKY_MESSAGES: int = 6
+    # Liste de tools stable dans une conversation (ne fait que s'étendre) : préserve le
+    # préfixe mis en cache par le provider, au prix de tools parfois superflus
+    AGENT_TOOL_STABLE: bool = True
+
+    # Agent : historique borné en tokens + résumé glissant (app/agent/history.py)
+    AGENT_HISTORY_TOKEN_BUDGET: int = 6000
+    AGENT_HISTORY_MAX_MESSAGES: int = 200
+    # Messages sortis de la fenêtre pas encore résumés, repris en plus de la fenêtre
+    # (les plus anciens sont abandonnés au-delà, si le résumé est en retard ou échoue)
+    AGENT_HISTORY_PENDING_TOKEN_BUDGET: int = 1500
+    AGENT_SUMMARY_MIN_MESSAGES: int = 6
+    AGENT_SUMMARY_MAX_TOKENS: int = 600
+    # Rejouer les appels de skills (et résultats compactés) des messages précédents
+    AGENT_HISTORY_REPLAY_TOOLS: bool = True
+
+    # Cache de réponses sémantique (app/agent/response_cache.py), désactivé par défaut :
+    # questions génériques resservies sans appel LLM si la similarité des embeddings
+    # dépasse le seuil ; seuls les runs limités aux skills listés (sans entreprise_id) sont cachés
+    AGENT_RESPONSE_CACHE: bool = False
+    AGENT_RESPONSE_CACHE_THRESHOLD: float = 0.93
+    AGENT_RESPONSE_CACHE_TTL: float = 86400.0
+    AGENT_RESPONSE_CACHE_SIZE: int = 500
+    AGENT_RESPONSE_CACHE_MIN_CHARS: int = 15
+    AGENT_RESPONSE_CACHE_SKILLS: str = "search_knowledge_base,list_referentiels"
+
+    # Streams SSE reprenables (app/agent/runs.py) : événements gardés par run
+    # et durée de conservation d'un run terminé
+    AGENT_STREAM_BUFFER_SIZE: int = 5000
+    AGENT_STREAM_TTL: float = 300.0
+    # Délai sans client connecté avant d'annuler un run (le temps d'une reconnexion)
+    AGENT_DISCONNECT_GRACE: float = 15.0
+
+    # Catalogue de skills en mémoire : TTL de sécurité (multi-workers, seed)
+    SKILL_CATALOGUE_TTL: float = 300.0
+
+    # Sandbox des skills custom : "inline" (boucle asyncio) ou "process" (pool isolé)
+    SKILL_SANDBOX_MODE: str = "inline"
+    SKILL_SANDBOX_WORKERS: int = 2
+    SKILL_SANDBOX_TIMEOUT: float = 10.0
+    SKILL_SANDBOX_MEMORY_MB: int = 512
+
+    # Résultats de skills renvoyés au LLM : au-delà de la taille max, version abrégée
+    # + identifiant du résultat complet (consultable via le skill get_skill_result)
+    SKILL_RESULT_MAX_CHARS: int = 4000
+    SKILL_RESULT_LIST_LIMIT: int = 5
+    SKILL_RESULT_STORE_SIZE: int = 500
+    SKILL_RESULT_STORE_TTL: float = 3600.0
+
+    # Skills longs (PDF, Word, dossier) exécutés en job d'arrière-plan (app/skills/jobs.py) ;
+    # le stream relaie leur avancement au plus SKILL_JOB_STREAM_TIMEOUT secondes
+    SKILL_BACKGROUND_JOBS: bool = True
+    SKILL_JOB_STREAM_TIMEOUT: float = 600.0
+    SKILL_JOB_TTL: float = 3600.0
+
+    # Embeddings (app/rag/providers.py) : "voyage" (API), "local" (sentence-transformers
+    # sur CPU) ou "hashing" (déterministe, hors ligne). Changer de dimension impose de
+    # migrer les colonnes vector de doc_chunks / fonds_chunks et de re-vectoriser
+    EMBEDDING_PROVIDER: str = "voyage"
+    EMBEDDING_DIM: int = 1024
+    EMBEDDING_LOCAL_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    EMBEDDING_LOCAL_BACKEND: str = "onnx"
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32
     VOYAGE_API_KEY: str = ""
+    # Sous-batches parallèles (taille bornée en tokens estimés) et retries 429/5xx
+    # avec backoff exponentiel (Retry-After respecté, plafonné à EMBEDDING_RETRY_MAX_DELAY)
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_BATCH_TOKENS: int = 100_000
+    EMBEDDING_TIMEOUT: float = 60.0
+    EMBEDDING_MAX_RETRIES: int = 4
+    EMBEDDING_RETRY_BASE_DELAY: float = 1.0
+    EMBEDDING_RETRY_MAX_DELAY: float = 60.0
+    # Cache d'embeddings adressé par contenu (app/rag/embedding_cache.py) : LRU en mémoire
+    # (vecteurs) devant la table embedding_cache
+    EMBEDDING_CACHE: bool = True
+    EMBEDDING_CACHE_DB: bool = True
+    EMBEDDING_CACHE_SIZE: int = 5000
+    # Regroupement des get_embedding() concurrents en un seul batch (app/rag/coalescer.py)
+    EMBEDDING_COALESCE: bool = True
+    EMBEDDING_COALESCE_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_COALESCE_MAX_BATCH: int = 64
+
+    # Ingestion des documents uploadés en arrière-plan (app/rag/ingestion.py) : workers
+    # simultanés, chunks vectorisés et insérés par étape (avancement, reprise), et délai
+    # sans mise à jour au-delà duquel un traitement interrompu est repris au démarrage
+    DOCUMENT_INGESTION_WORKERS: int = 2
+    DOCUMENT_INGESTION_BATCH: int = 64
+    DOCUMENT_INGESTION_STALE_AFTER: float = 900.0
 
     # Speech-to-Text (Whisper via Replicate)
     REPLICATE_API_TOKEN: str = ""
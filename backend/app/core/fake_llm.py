@@ -0,0 +1,262 @@
+"""
+LLM local compatible OpenAI (chat.completions), pour les tests et benchmarks hors réseau.
+
+Rejoue un script de réponses (texte et/ou tool_calls) en streaming SSE, avec une
+latence de premier token et un débit de tokens configurables :
+- en process : FakeLLMTransport, branché dans le client partagé quand LLM_FAKE=true ;
+- en serveur : `python -m app.core.fake_llm --port 8100`, puis LLM_BASE_URL=http://localhost:8100/v1.
+
+Script (JSON, LLM_FAKE_SCRIPT) : {"turns": [{"tool_calls": [{"name": ..., "arguments": {...}}]},
+{"text": "..."}]}. Le tour rejoué est le nombre de réponses assistant à tool_calls
+depuis le dernier message utilisateur ; le dernier tour du script est répété au-delà.
+Sans appel d'outil possible (requête sans `tools`), seul le texte est rejoué.
+"""
+
+import asyncio
+import json
+import re
+import time
+import uuid
+from collections.abc import AsyncIterator
+from typing import Any
+
+import httpx
+
+from app.config import settings
+
+DEFAULT_SCRIPT: dict[str, Any] = {
+    "turns": [
+        {
+            "text": (
+                "Bonjour ! Je suis ESG Mefali, votre conseiller ESG. Ceci est une réponse "
+                "simulée par le LLM local, utilisée pour les tests et les benchmarks."
+            )
+        }
+    ]
+}
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+_ARGS_CHUNK_CHARS = 12
+
+
+def load_script(path: str | None = None) -> dict[str, Any]:
+    """Charge un script JSON, ou le script par défaut."""
+    path = path if path is not None else settings.LLM_FAKE_SCRIPT
+    if not path:
+        return DEFAULT_SCRIPT
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def select_turn(script: dict[str, Any], body: dict[str, Any]) -> dict[str, Any]:
+    """Choisit le tour du script à rejouer d'après les messages de la requête."""
+    turns = script.get("turns") or DEFAULT_SCRIPT["turns"]
+    index = 0
+    for message in reversed(body.get("messages", [])):
+        if message.get("role") == "user":
+            break
+        if message.get("role") == "assistant" and message.get("tool_calls"):
+            index += 1
+    turn = turns[min(index, len(turns) - 1)]
+    if not body.get("tools"):
+        return {"text": turn.get("text") or DEFAULT_SCRIPT["turns"][0]["text"]}
+    return turn
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason: str | None = None) -> dict:
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _usage(body: dict[str, Any], completion_tokens: int) -> dict[str, int]:
+    # Comme chez les providers, les définitions de tools comptent dans le prompt
+    prompt_chars = len(json.dumps(body.get("messages", []), ensure_ascii=False))
+    prompt_chars += len(json.dumps(body.get("tools") or [], ensure_ascii=False))
+    prompt_tokens = prompt_chars // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def iter_chunks(turn: dict[str, Any], body: dict[str, Any]) -> list[dict]:
+    """Découpe un tour en chunks de stream OpenAI (un token ≈ un mot ou 12 caractères d'arguments)."""
+    completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+    model = body.get("model") or "fake-llm"
+    chunks: list[dict] = [_chunk(completion_id, model, {"role": "assistant", "content": ""})]
+
+    for token in _TOKEN_RE.findall(turn.get("text") or ""):
+        chunks.append(_chunk(completion_id, model, {"content": token}))
+
+    tool_calls = turn.get("tool_calls") or []
+    for index, call in enumerate(tool_calls):
+        arguments = call.get("arguments", {})
+        if not isinstance(arguments, str):
+            arguments = json.dumps(arguments, ensure_ascii=False)
+        chunks.append(
+            _chunk(
+                completion_id,
+                model,
+                {
+                    "tool_calls": [
+                        {
+                            "index": index,
+                            "id": f"call_{uuid.uuid4().hex[:16]}",
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": ""},
+                        }
+                    ]
+                },
+            )
+        )
+        for start in range(0, len(arguments), _ARGS_CHUNK_CHARS):
+            piece = arguments[start:start + _ARGS_CHUNK_CHARS]
+            chunks.append(
+                _chunk(
+                    completion_id,
+                    model,
+                    {"tool_calls": [{"index": index, "function": {"arguments": piece}}]},
+                )
+            )
+
+    finish = "tool_calls" if tool_calls else "stop"
+    chunks.append(_chunk(completion_id, model, {}, finish))
+    if body.get("stream_options", {}).get("include_usage"):
+        usage_chunk = _chunk(completion_id, model, {})
+        usage_chunk["choices"] = []
+        usage_chunk["usage"] = _usage(body, len(chunks) - 2)
+        chunks.append(usage_chunk)
+    return chunks
+
+
+def completion(turn: dict[str, Any], body: dict[str, Any]) -> dict:
+    """Réponse non streamée (résumés, rapports, documents)."""
+    text = turn.get("text") or ""
+    tool_calls = [
+        {
+            "id": f"call_{uuid.uuid4().hex[:16]}",
+            "type": "function",
+            "function": {
+                "name": call["name"],
+                "arguments": json.dumps(call.get("arguments", {}), ensure_ascii=False),
+            },
+        }
+        for call in turn.get("tool_calls") or []
+    ]
+    message: dict[str, Any] = {"role": "assistant", "content": text or None}
+    if tool_calls:
+        message["tool_calls"] = tool_calls
+    return {
+        "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model") or "fake-llm",
+        "choices": [
+            {
+                "index": 0,
+                "message": message,
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+            }
+        ],
+        "usage": _usage(body, len(_TOKEN_RE.findall(text))),
+    }
+
+
+async def stream_sse(
+    chunks: list[dict], ttft_ms: float, tokens_per_s: float
+) -> AsyncIterator[bytes]:
+    """Émet les chunks au format SSE avec la latence et le débit configurés."""
+    await asyncio.sleep(ttft_ms / 1000)
+    interval = 1 / tokens_per_s if tokens_per_s > 0 else 0
+    for i, chunk in enumerate(chunks):
+        if i and interval:
+            await asyncio.sleep(interval)
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode()
+    yield b"data: [DONE]\n\n"
+
+
+class _SSEStream(httpx.AsyncByteStream):
+    def __init__(self, iterator: AsyncIterator[bytes]):
+        self._iterator = iterator
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for part in self._iterator:
+            yield part
+
+    async def aclose(self) -> None:
+        await self._iterator.aclose()
+
+
+class FakeLLMTransport(httpx.AsyncBaseTransport):
+    """Transport httpx qui répond aux appels chat.completions sans réseau."""
+
+    def __init__(
+        self,
+        script: dict[str, Any] | None = None,
+        ttft_ms: float | None = None,
+        tokens_per_s: float | None = None,
+    ):
+        self.script = script or load_script()
+        self.ttft_ms = settings.LLM_FAKE_TTFT_MS if ttft_ms is None else ttft_ms
+        self.tokens_per_s = settings.LLM_FAKE_TOKENS_PER_S if tokens_per_s is None else tokens_per_s
+        self.requests_total = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/chat/completions"):
+            return httpx.Response(404, json={"error": {"message": "Endpoint non simulé"}})
+        self.requests_total += 1
+        body = json.loads(await request.aread() or b"{}")
+        turn = select_turn(self.script, body)
+
+        if not body.get("stream"):
+            await asyncio.sleep(self.ttft_ms / 1000)
+            return httpx.Response(200, json=completion(turn, body))
+
+        chunks = iter_chunks(turn, body)
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            stream=_SSEStream(stream_sse(chunks, self.ttft_ms, self.tokens_per_s)),
+        )
+
+
+def create_app(script: dict[str, Any] | None = None):
+    """Application ASGI exposant POST /v1/chat/completions (mode serveur)."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Fake LLM")
+    transport = FakeLLMTransport(script)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        turn = select_turn(transport.script, body)
+        if not body.get("stream"):
+            await asyncio.sleep(transport.ttft_ms / 1000)
+            return JSONResponse(completion(turn, body))
+        return StreamingResponse(
+            stream_sse(iter_chunks(turn, body), transport.ttft_ms, transport.tokens_per_s),
+            media_type="text/event-stream",
+        )
+
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="LLM local compatible OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--script", default=None, help="Chemin d'un script JSON")
+    args = parser.parse_args()
+    uvicorn.run(create_app(load_script(args.script)), host=args.host, port=args.port)
@@ -0,0 +1,171 @@
+"""
+Client LLM partagé (SDK OpenAI pointé vers OpenRouter) pour tout le processus.
+
+Un seul AsyncOpenAI adossé à un httpx.AsyncClient à pool de connexions :
+les appels du chat, des rapports, des documents Word et de l'extension
+réutilisent les connexions TLS au lieu d'en ouvrir une par requête.
+
+Cycle de vie : init_llm_client() / close_llm_client() dans main.lifespan.
+Hors lifespan (seed, scripts, tests), get_llm_client() crée le client à la demande.
+Avec LLM_FAKE=true, le client répond via le LLM local simulé (app/core/fake_llm.py).
+"""
+
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.config import settings
+from app.core.llm_routing import routing_stats
+from app.core.llm_scheduler import llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Enveloppe le flux de réponse pour savoir quand la requête libère sa connexion."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for part in self._stream:
+            yield part
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class _MeteredTransport(httpx.AsyncHTTPTransport):
+    """Transport httpx qui compte les requêtes pour dimensionner le pool."""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests_total += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            self.in_flight -= 1
+            self.errors_total += 1
+            raise
+        response.stream = _TrackedStream(response.stream, self._release)
+        return response
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    def connection_stats(self) -> dict[str, int]:
+        connections = list(getattr(self._pool, "connections", []))
+        idle = sum(1 for c in connections if c.is_idle())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+_client: AsyncOpenAI | None = None
+_transport: _MeteredTransport | None = None
+_created_at: float | None = None
+
+
+def _build_client() -> tuple[AsyncOpenAI, _MeteredTransport | None]:
+    transport: httpx.AsyncBaseTransport
+    if settings.LLM_FAKE:
+        from app.core.fake_llm import FakeLLMTransport
+
+        transport, metered = FakeLLMTransport(), None
+    else:
+        limits = httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+        )
+        transport = metered = _MeteredTransport(limits=limits)
+    http_client = httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+    )
+    client = AsyncOpenAI(
+        base_url=settings.LLM_BASE_URL,
+        api_key=settings.LLM_API_KEY or ("fake" if settings.LLM_FAKE else ""),
+        max_retries=settings.LLM_MAX_RETRIES,
+        http_client=http_client,
+        default_headers={
+            "HTTP-Referer": settings.APP_URL,
+            "X-Title": "ESG Mefali",
+        },
+    )
+    return client, metered
+
+
+def init_llm_client() -> AsyncOpenAI:
+    """Crée le client partagé (idempotent). Appelé au démarrage de l'application."""
+    global _client, _transport, _created_at
+    if _client is None:
+        _client, _transport = _build_client()
+        _created_at = time.time()
+        logger.info(
+            "Client LLM initialisé (max_connections=%d, keepalive=%d%s)",
+            settings.LLM_MAX_CONNECTIONS,
+            settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            ", LLM simulé" if settings.LLM_FAKE else "",
+        )
+    return _client
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """Retourne le client LLM partagé, créé à la demande si besoin."""
+    return _client if _client is not None else init_llm_client()
+
+
+async def close_llm_client() -> None:
+    """Ferme le pool de connexions. Appelé à l'arrêt de l'application."""
+    global _client, _transport, _created_at
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _transport = None
+    _created_at = None
+
+
+def get_llm_pool_stats() -> dict[str, Any]:
+    """Métriques du pool de connexions LLM, du contrôle d'admission et du routage (admin / dimensionnement)."""
+    stats: dict[str, Any] = {
+        "initialized": _client is not None,
+        "fake": settings.LLM_FAKE,
+        "limits": {
+            "max_connections": settings.LLM_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry_s": settings.LLM_KEEPALIVE_EXPIRY,
+            "timeout_s": settings.LLM_TIMEOUT,
+        },
+        "scheduler": llm_scheduler.stats(),
+        "routing": routing_stats(),
+    }
+    if _transport is not None:
+        stats.update(
+            {
+                "uptime_s": round(time.time() - (_created_at or time.time()), 1),
+                "requests_total": _transport.requests_total,
+                "errors_total": _transport.errors_total,
+                "in_flight": _transport.in_flight,
+                "max_in_flight": _transport.max_in_flight,
+                "connections": _transport.connection_stats(),
+            }
+        )
+    return stats
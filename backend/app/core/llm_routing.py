@@ -0,0 +1,141 @@
+"""
+Routage des appels LLM par tâche : modèle, max_tokens et classe de priorité.
+
+- tâches longues (chat, rapports, documents, dossiers) → LLM_MODEL ;
+- tâches courtes (résumés d'historique, suggestions de champs) → LLM_FAST_MODEL
+  (vide = LLM_MODEL) ;
+- chaîne de repli : si un modèle est indisponible (404, 429, 5xx, réseau) après les
+  retries du SDK, l'appel passe au modèle suivant (LLM_FALLBACK_MODELS, puis LLM_MODEL).
+
+Surcharges par tâche via LLM_ROUTES (JSON), ex. :
+{"field_suggest": {"model": "openai/gpt-4o-mini", "max_tokens": 300, "fallbacks": []}}
+"""
+
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
+
+from app.config import settings
+from app.core.llm_scheduler import Admission, Priority, llm_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Task(str, Enum):
+    CHAT = "chat"
+    SUMMARY = "summary"
+    REPORT_SECTION = "report_section"
+    DOCUMENT = "document"
+    DOSSIER_SECTION = "dossier_section"
+    FIELD_SUGGEST = "field_suggest"
+
+
+@dataclass(frozen=True)
+class Route:
+    models: tuple[str, ...]  # modèle principal puis replis
+    max_tokens: int
+    priority: Priority
+
+
+# Tâche → (gamme de modèle, max_tokens, priorité)
+_DEFAULT_ROUTES: dict[Task, tuple[str, int, Priority]] = {
+    Task.CHAT: ("strong", 4096, Priority.INTERACTIVE),
+    Task.SUMMARY: ("fast", 600, Priority.BACKGROUND),
+    Task.REPORT_SECTION: ("strong", 1500, Priority.BATCH),
+    Task.DOCUMENT: ("strong", 2000, Priority.BATCH),
+    Task.DOSSIER_SECTION: ("strong", 2000, Priority.BATCH),
+    Task.FIELD_SUGGEST: ("fast", 500, Priority.INTERACTIVE),
+}
+
+# Appels servis par un modèle de repli, par (tâche, modèle)
+fallbacks_total: Counter[tuple[str, str]] = Counter()
+
+
+def _split(models: str) -> list[str]:
+    return [m.strip() for m in models.split(",") if m.strip()]
+
+
+def resolve(task: Task, max_tokens: int | None = None) -> Route:
+    """
+    Route effective de la tâche (réglages lus à chaque appel). max_tokens : valeur
+    propre à l'appelant, prioritaire sur la table mais pas sur LLM_ROUTES.
+    """
+    tier, default_max_tokens, priority = _DEFAULT_ROUTES[task]
+    model = settings.LLM_FAST_MODEL if tier == "fast" else ""
+    fallbacks = _split(settings.LLM_FALLBACK_MODELS)
+
+    override = settings.LLM_ROUTES.get(task.value) or {}
+    model = override.get("model") or model or settings.LLM_MODEL
+    max_tokens = int(override.get("max_tokens") or max_tokens or default_max_tokens)
+    if "fallbacks" in override:
+        fallbacks = list(override["fallbacks"] or [])
+
+    models: list[str] = []
+    for candidate in (model, *fallbacks, settings.LLM_MODEL):
+        if candidate and candidate not in models:
+            models.append(candidate)
+    return Route(tuple(models), max_tokens, priority)
+
+
+def should_fall_back(exc: BaseException) -> bool:
+    """Erreur propre au modèle ou au provider (le modèle suivant peut réussir)."""
+    if isinstance(exc, APIConnectionError):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in (404, 408, 429) or exc.status_code >= 500
+    return False
+
+
+async def create_routed(
+    client: AsyncOpenAI, task: Task, route: Route, admission: Admission, **kwargs: Any
+) -> tuple[Any, str]:
+    """
+    chat.completions.create() sur la chaîne de modèles de la route (stream ou non).
+    Retourne la réponse et le modèle qui l'a servie. Pour un stream, le repli ne
+    couvre que l'ouverture (aucun token n'a encore été émis).
+    """
+    kwargs["max_tokens"] = route.max_tokens
+    tried: list[str] = []
+    last_error: BaseException | None = None
+    for model in route.models:
+        params = admission.apply({**kwargs, "model": model})
+        if params["model"] in tried:
+            continue
+        if tried:
+            logger.warning(
+                "Repli LLM %s : %s → %s (%s)", task.value, tried[-1], params["model"], last_error
+            )
+        tried.append(params["model"])
+        try:
+            response = await client.chat.completions.create(**params)
+        except Exception as exc:
+            if not should_fall_back(exc):
+                raise
+            last_error = exc
+            continue
+        if len(tried) > 1:
+            fallbacks_total[(task.value, params["model"])] += 1
+        return response, params["model"]
+    assert last_error is not None
+    raise last_error
+
+
+async def complete(
+    client: AsyncOpenAI, task: Task, user: str | None = None, **kwargs: Any
+):
+    """Appel non streamé routé, soumis au contrôle d'admission (app/core/llm_scheduler.py)."""
+    route = resolve(task, kwargs.pop("max_tokens", None))
+    async with llm_scheduler.admit(route.priority, user) as admission:
+        response, _ = await create_routed(client, task, route, admission, **kwargs)
+        return response
+
+
+def routing_stats() -> dict[str, Any]:
+    return {
+        "routes": {task.value: list(resolve(task).models) for task in Task},
+        "fallbacks_total": {f"{task}:{model}": n for (task, model), n in fallbacks_total.items()},
+    }
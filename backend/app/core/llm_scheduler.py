@@ -0,0 +1,168 @@
+"""
+Contrôle d'admission des appels LLM, partagé par le chat, les rapports, les documents
+Word et l'extension.
+
+- limite globale d'appels simultanés (LLM_MAX_CONCURRENCY, 0 = illimité) ;
+- file d'attente par classe de priorité (chat interactif avant résumés, puis
+  génération de documents), tourniquet entre utilisateurs dans une même classe ;
+- délestage : au-delà de LLM_SHED_QUEUE_DEPTH appels en attente, les appels admis
+  sont dégradés (max_tokens plafonné à LLM_SHED_MAX_TOKENS, modèle LLM_SHED_MODEL).
+
+L'utilisateur courant est lu dans la ContextVar llm_user (positionnée par les
+endpoints, héritée par les tâches des skills et des jobs).
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+llm_user: ContextVar[str | None] = ContextVar("llm_user", default=None)
+
+
+class Priority(IntEnum):
+    """Classes de priorité (valeur faible = servie en premier)."""
+
+    INTERACTIVE = 0  # chat, suggestions de l'extension
+    BACKGROUND = 1  # résumés d'historique
+    BATCH = 2  # rapports PDF, documents Word, dossiers
+
+
+class LLMBusyError(RuntimeError):
+    """Attente d'admission au-delà de LLM_QUEUE_TIMEOUT."""
+
+
+@dataclass
+class Admission:
+    priority: Priority
+    degraded: bool = False
+
+    def apply(self, kwargs: dict[str, Any]) -> dict[str, Any]:
+        """Paramètres de l'appel, dégradés si l'admission a eu lieu en surcharge."""
+        if not self.degraded:
+            return kwargs
+        kwargs = dict(kwargs)
+        cap = settings.LLM_SHED_MAX_TOKENS
+        kwargs["max_tokens"] = min(kwargs.get("max_tokens") or cap, cap)
+        if settings.LLM_SHED_MODEL:
+            kwargs["model"] = settings.LLM_SHED_MODEL
+        return kwargs
+
+
+class LLMScheduler:
+    """Sémaphore équitable à priorités pour les appels LLM."""
+
+    def __init__(self, max_concurrency: int | None = None):
+        self._max_concurrency = max_concurrency
+        self.active = 0
+        self.waiting = 0
+        self.admitted_total = 0
+        self.degraded_total = 0
+        self.timeouts_total = 0
+        # priorité → utilisateur → appels en attente (ordre d'arrivée)
+        self._queues: dict[Priority, OrderedDict[str, deque[asyncio.Future]]] = {
+            p: OrderedDict() for p in Priority
+        }
+
+    @property
+    def max_concurrency(self) -> int:
+        if self._max_concurrency is not None:
+            return self._max_concurrency
+        return settings.LLM_MAX_CONCURRENCY
+
+    @asynccontextmanager
+    async def admit(
+        self, priority: Priority = Priority.INTERACTIVE, user: str | None = None
+    ) -> AsyncIterator[Admission]:
+        """Réserve un créneau d'appel LLM pour la durée du bloc (stream compris)."""
+        user_key = user or llm_user.get() or "anonyme"
+        shed_depth = settings.LLM_SHED_QUEUE_DEPTH
+        degraded = shed_depth > 0 and self.waiting >= shed_depth
+
+        if 0 < self.max_concurrency <= self.active:
+            await self._wait(priority, user_key)
+        else:
+            self.active += 1
+
+        self.admitted_total += 1
+        if degraded:
+            self.degraded_total += 1
+            logger.info("Appel LLM dégradé (file d'attente : %d)", self.waiting)
+        try:
+            yield Admission(priority, degraded)
+        finally:
+            self._release()
+
+    async def _wait(self, priority: Priority, user_key: str) -> None:
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(user_key, deque()).append(future)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(future, timeout=settings.LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._discard(priority, user_key, future)
+            self.timeouts_total += 1
+            raise LLMBusyError("Service LLM saturé, réessayez dans un instant") from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Créneau accordé juste avant l'annulation : le rendre
+                self._release()
+            else:
+                self._discard(priority, user_key, future)
+            raise
+
+    def _discard(self, priority: Priority, user_key: str, future: asyncio.Future) -> None:
+        queue = self._queues[priority].get(user_key)
+        if queue is not None and future in queue:
+            queue.remove(future)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[priority][user_key]
+
+    def _release(self) -> None:
+        """Libère un créneau, ou le transfère au prochain appel en attente."""
+        future = self._next_waiter()
+        if future is None:
+            self.active -= 1
+        else:
+            future.set_result(None)
+
+    def _next_waiter(self) -> asyncio.Future | None:
+        for priority in Priority:
+            users = self._queues[priority]
+            while users:
+                user_key, queue = next(iter(users.items()))
+                future = queue.popleft()
+                self.waiting -= 1
+                if queue:
+                    users.move_to_end(user_key)  # tourniquet entre utilisateurs
+                else:
+                    del users[user_key]
+                if not future.done():
+                    return future
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "waiting_by_priority": {
+                p.name.lower(): sum(len(q) for q in self._queues[p].values()) for p in Priority
+            },
+            "admitted_total": self.admitted_total,
+            "degraded_total": self.degraded_total,
+            "timeouts_total": self.timeouts_total,
+        }
+
+
+llm_scheduler = LLMScheduler()
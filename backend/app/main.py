@@ -1,3 +1,4 @@
+import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -21,7 +22,14 @@ from app.api.intermediaires import router as intermediaires_router
 from app.api.extension import router as extension_router
 from app.api.candidatures import router as candidatures_router
 from app.config import settings
+from app.agent.metrics import install_db_timer
 from app.core.database import engine
+from app.core.llm import close_llm_client, init_llm_client
+from app.rag.embeddings import close_embedding_client
+from app.rag.ingestion import document_ingestion
+from app.skills.sandbox import shutdown_sandbox_pool
+
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -29,8 +37,22 @@ async def lifespan(app: FastAPI):
     # Startup: vérifier la connexion BDD
     async with engine.begin() as conn:
         await conn.execute(text("SELECT 1"))
+    # Startup: chronométrage des requêtes SQL (métriques agent)
+    install_db_timer(engine)
+    # Startup: client LLM partagé (pool de connexions keep-alive). Sans clé API, l'API
+    # démarre quand même : seuls les appels LLM échoueront (client recréé à la demande)
+    try:
+        init_llm_client()
+    except Exception as e:
+        logger.warning("Client LLM non initialisé au démarrage : %s", e)
+    # Startup: reprendre l'ingestion des documents en attente ou interrompus
+    await document_ingestion.start()
     yield
-    # Shutdown: fermer le pool
+    # Shutdown: arrêter les workers d'ingestion, fermer les pools
+    await document_ingestion.stop()
+    await close_llm_client()
+    await close_embedding_client()
+    shutdown_sandbox_pool()
     await engine.dispose()
 
 
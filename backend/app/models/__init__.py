@@ -16,6 +16,8 @@ from app.models.report_template import ReportTemplate
 from app.models.fund_application import FundApplication, FundSiteConfig
 from app.models.intermediaire import Intermediaire
 from app.models.dossier_candidature import DossierCandidature
+from app.models.agent_metric import AgentMetric
+from app.models.embedding_cache import EmbeddingCacheEntry
 
 __all__ = [
     "User",
@@ -40,4 +42,6 @@ __all__ = [
     "FundSiteConfig",
     "Intermediaire",
     "DossierCandidature",
+    "AgentMetric",
+    "EmbeddingCacheEntry",
 ]
@@ -0,0 +1,33 @@
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import Boolean, DateTime, Float, Index, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class AgentMetric(Base):
+    """Mesure d'un tour LLM (kind="llm_turn") ou d'une exécution de skill (kind="skill")."""
+
+    __tablename__ = "agent_metrics"
+    __table_args__ = (
+        Index("idx_agent_metrics_kind_name", "kind", "name", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
+    conversation_id: Mapped[uuid.UUID | None] = mapped_column(nullable=True)
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    # Nom du modèle (llm_turn) ou du skill (skill)
+    name: Mapped[str] = mapped_column(String(150), nullable=False)
+    turn: Mapped[int] = mapped_column(Integer, default=0)
+    duration_ms: Mapped[float] = mapped_column(Float, nullable=False)
+    ttft_ms: Mapped[float | None] = mapped_column(Float)
+    db_ms: Mapped[float | None] = mapped_column(Float)
+    prompt_tokens: Mapped[int | None] = mapped_column(Integer)
+    completion_tokens: Mapped[int | None] = mapped_column(Integer)
+    cached_tokens: Mapped[int | None] = mapped_column(Integer)
+    is_error: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
@@ -6,11 +6,13 @@ from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
+from app.config import settings
 from app.core.database import Base
 
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (Index("idx_documents_status", "status"),)
 
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     entreprise_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("entreprises.id", ondelete="CASCADE"), nullable=False)
@@ -20,9 +22,19 @@ class Document(Base):
     taille: Mapped[int | None] = mapped_column(Integer)
     texte_extrait: Mapped[str | None] = mapped_column(Text)
     metadata_json: Mapped[dict | None] = mapped_column(JSONB)
+    # Ingestion en arrière-plan (app/rag/ingestion.py) :
+    # pending → extracting → embedding → ready | failed ; progress en %
+    status: Mapped[str] = mapped_column(String(20), default="pending", server_default="ready")
+    progress: Mapped[int] = mapped_column(Integer, default=0, server_default="100")
+    error: Mapped[str | None] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
 
 class DocChunk(Base):
@@ -40,7 +52,7 @@ class DocChunk(Base):
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     document_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
     contenu: Mapped[str] = mapped_column(Text, nullable=False)
-    embedding = mapped_column(Vector(1024))
+    embedding = mapped_column(Vector(settings.EMBEDDING_DIM))
     page_number: Mapped[int | None] = mapped_column(Integer)
     chunk_index: Mapped[int | None] = mapped_column(Integer)
     created_at: Mapped[datetime] = mapped_column(
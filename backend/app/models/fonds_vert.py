@@ -6,6 +6,7 @@ from sqlalchemy import Boolean, Date, DateTime, ForeignKey, Index, Numeric, Stri
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column
 
+from app.config import settings
 from app.core.database import Base
 
 
@@ -47,7 +48,7 @@ class FondsChunk(Base):
     id: Mapped[uuid.UUID] = mapped_column(primary_key=True, default=uuid.uuid4)
     fonds_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("fonds_verts.id", ondelete="CASCADE"), nullable=False)
     contenu: Mapped[str] = mapped_column(Text, nullable=False)
-    embedding = mapped_column(Vector(1024))
+    embedding = mapped_column(Vector(settings.EMBEDDING_DIM))
     type_info: Mapped[str | None] = mapped_column(String(50))
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
@@ -19,6 +19,8 @@ class Skill(Base):
     handler_key: Mapped[str] = mapped_column(String(100), nullable=False)
     handler_code: Mapped[str | None] = mapped_column(Text)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Skill sans effet de bord : ses résultats peuvent être réutilisés dans un même run agent
+    is_read_only: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false")
     version: Mapped[int] = mapped_column(Integer, default=1)
     created_by: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("users.id"))
     created_at: Mapped[datetime] = mapped_column(
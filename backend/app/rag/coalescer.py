@@ -0,0 +1,97 @@
+"""
+Regroupement (micro-batching) des demandes d'embedding unitaires, à la manière
+d'un dataloader : les appels arrivés pendant EMBEDDING_COALESCE_MAX_WAIT_MS sont
+envoyés ensemble en un seul batch (au plus EMBEDDING_COALESCE_MAX_BATCH textes),
+puis chaque appelant reçoit son vecteur.
+
+Sous charge (recherches sémantiques concurrentes du chat), des dizaines de requêtes
+d'un seul texte deviennent quelques requêtes pleines ; un appel isolé n'attend que
+le délai de regroupement. Une erreur du batch est remontée à tous ses appelants.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+BatchFn = Callable[[list[str]], Awaitable[list[list[float]]]]
+
+
+class EmbeddingCoalescer:
+    def __init__(self, batch_fn: BatchFn):
+        self._batch_fn = batch_fn
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.requests_total = 0
+        self.batches_total = 0
+        self.texts_total = 0
+        self.max_batch_seen = 0
+
+    @property
+    def max_batch(self) -> int:
+        return max(1, settings.EMBEDDING_COALESCE_MAX_BATCH)
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text, future))
+        self.requests_total += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(
+                max(0.0, settings.EMBEDDING_COALESCE_MAX_WAIT_MS) / 1000, self._flush
+            )
+        return await future
+
+    def _flush(self) -> None:
+        """Démarre l'envoi des demandes en attente (par paquets de max_batch)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch]
+            self._pending = self._pending[self.max_batch :]
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        # Demandes annulées entre-temps (client déconnecté) : inutile de les calculer
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        self.batches_total += 1
+        self.texts_total += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        try:
+            vectors = await self._batch_fn([text for text, _ in batch])
+        except Exception as e:
+            logger.warning("Batch d'embeddings regroupé en échec (%d textes) : %s", len(batch), e)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> dict[str, Any]:
+        avg = self.texts_total / self.batches_total if self.batches_total else None
+        return {
+            "enabled": settings.EMBEDDING_COALESCE,
+            "max_wait_ms": settings.EMBEDDING_COALESCE_MAX_WAIT_MS,
+            "max_batch": self.max_batch,
+            "requests_total": self.requests_total,
+            "batches_total": self.batches_total,
+            "pending": len(self._pending),
+            "avg_batch_size": round(avg, 2) if avg is not None else None,
+            "fill_ratio": round(avg / self.max_batch, 3) if avg is not None else None,
+            "max_batch_seen": self.max_batch_seen,
+        }
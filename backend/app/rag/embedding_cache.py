@@ -0,0 +1,137 @@
+"""
+Cache d'embeddings adressé par contenu : sha256(modèle + texte normalisé).
+
+Deux niveaux, consultés par get_embeddings_batch avant l'appel au provider :
+- LRU en mémoire (EMBEDDING_CACHE_SIZE vecteurs, stockés en float32) ;
+- table embedding_cache (partagée entre workers et entre ré-ingestions).
+
+Un document ré-uploadé, un seed relancé ou un même PDF réglementaire chargé par
+deux entreprises ne repassent donc plus par l'API. Les erreurs de la table sont
+journalisées sans interrompre l'ingestion.
+"""
+
+import hashlib
+import logging
+import re
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import settings
+from app.core.database import async_session
+from app.models.embedding_cache import EmbeddingCacheEntry
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# Taille des requêtes IN / INSERT sur la table
+_DB_CHUNK = 500
+
+
+def normalize_text(text: str) -> str:
+    """Forme Unicode NFC, espaces consécutifs réduits (la casse est conservée)."""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def content_hash(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode()).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self) -> None:
+        self._lru: OrderedDict[str, array] = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get_many(self, hashes: list[str]) -> dict[str, list[float]]:
+        """Embeddings connus parmi les hashes demandés (LRU, puis table)."""
+        unique = list(dict.fromkeys(hashes))
+        found: dict[str, list[float]] = {}
+        missing: list[str] = []
+        for key in unique:
+            vector = self._lru.get(key)
+            if vector is None:
+                missing.append(key)
+            else:
+                self._lru.move_to_end(key)
+                found[key] = vector.tolist()
+        self.memory_hits += len(found)
+
+        if missing and settings.EMBEDDING_CACHE_DB:
+            try:
+                stored = await self._load(missing)
+            except Exception as e:
+                logger.warning("Cache d'embeddings : lecture de la table impossible (%s)", e)
+                stored = {}
+            self.db_hits += len(stored)
+            for key, vector in stored.items():
+                self._remember(key, vector)
+                found[key] = vector
+        self.misses += len(unique) - len(found)
+        return found
+
+    async def put_many(self, model: str, vectors: dict[str, list[float]]) -> None:
+        """Enregistre des embeddings calculés (LRU + table, doublons ignorés)."""
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+        if not vectors or not settings.EMBEDDING_CACHE_DB:
+            return
+        try:
+            await self._store(model, vectors)
+        except Exception as e:
+            logger.warning("Cache d'embeddings : écriture dans la table impossible (%s)", e)
+
+    def clear(self) -> None:
+        self._lru.clear()
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._lru[key] = array("f", vector)
+        self._lru.move_to_end(key)
+        while len(self._lru) > max(0, settings.EMBEDDING_CACHE_SIZE):
+            self._lru.popitem(last=False)
+
+    @staticmethod
+    async def _load(hashes: list[str]) -> dict[str, list[float]]:
+        found: dict[str, list[float]] = {}
+        async with async_session() as db:
+            for i in range(0, len(hashes), _DB_CHUNK):
+                rows = await db.execute(
+                    select(EmbeddingCacheEntry.content_hash, EmbeddingCacheEntry.embedding).where(
+                        EmbeddingCacheEntry.content_hash.in_(hashes[i : i + _DB_CHUNK])
+                    )
+                )
+                for key, embedding in rows:
+                    found[key] = [float(v) for v in embedding]
+        return found
+
+    @staticmethod
+    async def _store(model: str, vectors: dict[str, list[float]]) -> None:
+        items = list(vectors.items())
+        async with async_session() as db:
+            for i in range(0, len(items), _DB_CHUNK):
+                stmt = insert(EmbeddingCacheEntry).values(
+                    [
+                        {"content_hash": key, "model": model, "embedding": vector}
+                        for key, vector in items[i : i + _DB_CHUNK]
+                    ]
+                )
+                await db.execute(stmt.on_conflict_do_nothing(index_elements=["content_hash"]))
+            await db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_size": len(self._lru),
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 3) if lookups else None,
+        }
+
+
+embedding_cache = EmbeddingCache()
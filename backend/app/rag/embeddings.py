@@ -1,83 +1,60 @@
 """
-Génération d'embeddings via Voyage AI (voyage-3-large, 1024 dimensions).
-Configurable via .env : VOYAGE_API_KEY.
+Génération d'embeddings pour le RAG (doc_chunks, fonds_chunks, recherche).
+Provider configurable via .env : EMBEDDING_PROVIDER (voyage, local, hashing) et
+EMBEDDING_DIM, voir app/rag/providers.py.
+
+Les textes déjà vectorisés sont servis par le cache adressé par contenu
+(app/rag/embedding_cache.py) ; seuls les textes inconnus sont envoyés au provider.
+Les appels unitaires concurrents (get_embedding) sont regroupés en batches
+(app/rag/coalescer.py).
 """
 
-import logging
-from typing import Optional
-
-import httpx
-
 from app.config import settings
-
-logger = logging.getLogger(__name__)
-
-VOYAGE_API_URL = "https://api.voyageai.com/v1/embeddings"
-VOYAGE_MODEL = "voyage-3-large"
-EMBEDDING_DIM = 1024
-MAX_BATCH_SIZE = 128  # Voyage AI limite à 128 textes par requête
+from app.rag.coalescer import EmbeddingCoalescer
+from app.rag.embedding_cache import content_hash, embedding_cache
+from app.rag.providers import MAX_TEXT_CHARS, close_providers, get_provider
 
 
 async def get_embedding(text: str) -> list[float]:
     """
     Génère un embedding pour un texte unique.
-    Retourne un vecteur de 1024 dimensions.
+    Retourne un vecteur de EMBEDDING_DIM dimensions.
     """
     if not text or not text.strip():
-        return [0.0] * EMBEDDING_DIM
+        return [0.0] * settings.EMBEDDING_DIM
 
+    if settings.EMBEDDING_COALESCE:
+        return await embedding_coalescer.embed(text)
     results = await get_embeddings_batch([text])
     return results[0]
 
 
 async def get_embeddings_batch(texts: list[str]) -> list[list[float]]:
     """
-    Génère des embeddings pour un batch de textes.
-    Gère automatiquement le découpage en sous-batches si nécessaire.
+    Génère des embeddings pour un batch de textes (ordre conservé).
+    Les textes déjà en cache (ou en double dans le batch) ne sont calculés qu'une fois.
     """
-    api_key = settings.VOYAGE_API_KEY
-    if not api_key:
-        raise ValueError(
-            "VOYAGE_API_KEY non configuré. Ajoutez-le dans le fichier .env."
-        )
-
-    all_embeddings: list[list[float]] = []
-
-    for i in range(0, len(texts), MAX_BATCH_SIZE):
-        batch = texts[i : i + MAX_BATCH_SIZE]
-        embeddings = await _call_voyage_api(batch, api_key)
-        all_embeddings.extend(embeddings)
+    if not texts:
+        return []
 
-    return all_embeddings
+    provider = get_provider()
+    truncated = [t[:MAX_TEXT_CHARS] for t in texts]
+    if not (settings.EMBEDDING_CACHE and provider.cacheable):
+        return await provider.embed(truncated)
 
+    hashes = [content_hash(provider.model_id, t) for t in truncated]
+    known = await embedding_cache.get_many(hashes)
+    todo = {h: t for h, t in zip(hashes, truncated) if h not in known}
+    if todo:
+        fresh = dict(zip(todo, await provider.embed(list(todo.values()))))
+        await embedding_cache.put_many(provider.model_id, fresh)
+        known.update(fresh)
+    return [known[h] for h in hashes]
 
-async def _call_voyage_api(texts: list[str], api_key: str) -> list[list[float]]:
-    """Appel à l'API Voyage AI pour un batch de textes."""
-    # Tronquer les textes trop longs (Voyage limite à ~32k tokens)
-    truncated = [t[:16000] for t in texts]
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        response = await client.post(
-            VOYAGE_API_URL,
-            json={
-                "input": truncated,
-                "model": VOYAGE_MODEL,
-            },
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-        )
+async def close_embedding_client() -> None:
+    """Ferme les clients des providers. Appelé à l'arrêt de l'application."""
+    await close_providers()
 
-        if response.status_code != 200:
-            logger.error(
-                "Erreur API Voyage (%d) : %s", response.status_code, response.text
-            )
-            raise RuntimeError(
-                f"Erreur API Voyage AI ({response.status_code}): {response.text}"
-            )
 
-        data = response.json()
-        # Trier par index pour garantir l'ordre
-        sorted_data = sorted(data["data"], key=lambda x: x["index"])
-        return [item["embedding"] for item in sorted_data]
+embedding_coalescer = EmbeddingCoalescer(get_embeddings_batch)
@@ -0,0 +1,239 @@
+"""
+Ingestion des documents uploadés en arrière-plan : extraction du texte, découpage
+en chunks, embeddings et insertion dans doc_chunks.
+
+L'upload enregistre le fichier et crée le document en statut « pending », puis le
+confie à un pool de workers asyncio (DOCUMENT_INGESTION_WORKERS) :
+
+    pending → extracting → embedding → ready
+                       ↘         ↘
+                         failed  (erreur conservée dans documents.error)
+
+- chaque worker « réclame » le document par un UPDATE conditionnel sur le statut
+  pending : un même document n'est traité qu'une fois, même avec plusieurs processus ;
+- les chunks sont vectorisés et insérés par étapes de DOCUMENT_INGESTION_BATCH, avec
+  mise à jour de progress (%) dans la même transaction ;
+- une relance (POST /api/documents/{id}/retry) reprend à l'étape en échec : le texte
+  déjà extrait est conservé, les chunks déjà insérés ne sont pas recalculés ;
+- au démarrage, les documents pending (et ceux interrompus depuis plus de
+  DOCUMENT_INGESTION_STALE_AFTER secondes) sont remis en file.
+"""
+
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import case, func, select, update
+
+from app.config import settings
+from app.core.database import async_session
+from app.models.document import DocChunk, Document
+from app.rag.chunker import chunk_text
+from app.rag.embeddings import get_embeddings_batch
+from app.rag.text_extractor import extract_text_from_file
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+EXTRACTING = "extracting"
+EMBEDDING = "embedding"
+READY = "ready"
+FAILED = "failed"
+IN_PROGRESS = (PENDING, EXTRACTING, EMBEDDING)
+
+# Part de l'avancement attribuée à l'extraction (le reste suit les chunks insérés)
+EXTRACTION_SHARE = 20
+
+
+@dataclass
+class ClaimedDocument:
+    id: uuid.UUID
+    chemin_stockage: str
+    type_mime: str | None
+    texte_extrait: str | None
+
+
+class DocumentIngestion:
+    """File d'attente et workers d'ingestion du processus."""
+
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+        self._queued: set[uuid.UUID] = set()
+        self._active: set[uuid.UUID] = set()
+        self.processed_total = 0
+        self.failed_total = 0
+
+    def submit(self, document_id: uuid.UUID) -> None:
+        """Met le document en file ; les workers sont démarrés au besoin."""
+        if document_id in self._queued:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < max(1, settings.DOCUMENT_INGESTION_WORKERS):
+            self._workers.append(asyncio.create_task(self._worker()))
+        self._queued.add(document_id)
+        self._queue.put_nowait(document_id)
+
+    async def join(self) -> None:
+        """Attend que la file soit vide et les documents en cours traités."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def start(self) -> int:
+        """Remet en file les documents en attente ou interrompus. Appelé au démarrage."""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.DOCUMENT_INGESTION_STALE_AFTER)
+        async with async_session() as db:
+            await db.execute(
+                update(Document)
+                .where(
+                    Document.status.in_((EXTRACTING, EMBEDDING)),
+                    Document.updated_at < cutoff,
+                )
+                .values(status=PENDING)
+            )
+            rows = await db.execute(
+                select(Document.id).where(Document.status == PENDING).order_by(Document.created_at)
+            )
+            document_ids = list(rows.scalars())
+            await db.commit()
+        for document_id in document_ids:
+            self.submit(document_id)
+        if document_ids:
+            logger.info("Ingestion : %d document(s) remis en file", len(document_ids))
+        return len(document_ids)
+
+    async def stop(self) -> None:
+        """Arrête les workers ; les documents en cours repassent en pending. Appelé à l'arrêt."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._queue = None
+        self._queued.clear()
+        interrupted, self._active = list(self._active), set()
+        for document_id in interrupted:
+            try:
+                await self._save(document_id, status=PENDING)
+            except Exception as e:
+                logger.warning("Ingestion : document %s non remis en file (%s)", document_id, e)
+
+    async def _worker(self) -> None:
+        while True:
+            document_id = await self._queue.get()
+            self._queued.discard(document_id)
+            self._active.add(document_id)
+            try:
+                await self.process(document_id)
+            except Exception:
+                logger.exception("Ingestion : erreur inattendue sur le document %s", document_id)
+            finally:
+                self._active.discard(document_id)
+                self._queue.task_done()
+
+    async def process(self, document_id: uuid.UUID) -> None:
+        """Traite un document pending, à partir de la première étape non terminée."""
+        doc = await self._claim(document_id)
+        if doc is None:
+            # Supprimé, déjà traité, ou réclamé par un autre worker
+            return
+
+        stage = EXTRACTING
+        try:
+            texte = doc.texte_extrait
+            if texte is None:
+                texte = await extract_text_from_file(doc.chemin_stockage, doc.type_mime)
+                await self._save(
+                    document_id, texte_extrait=texte, status=EMBEDDING, progress=EXTRACTION_SHARE
+                )
+            stage = EMBEDDING
+            await self._embed(document_id, texte)
+            await self._save(document_id, status=READY, progress=100, error=None)
+        except Exception as e:
+            logger.warning("Ingestion du document %s en échec (%s) : %s", document_id, stage, e)
+            self.failed_total += 1
+            await self._save(document_id, status=FAILED, error=f"{stage} : {e}"[:1000])
+            return
+        self.processed_total += 1
+
+    async def _embed(self, document_id: uuid.UUID, texte: str) -> None:
+        chunks = chunk_text(texte, chunk_size=800, overlap=200)
+        # Reprise : les chunks déjà insérés (dans l'ordre) ne sont pas recalculés
+        start = await self._chunk_count(document_id)
+        batch = max(1, settings.DOCUMENT_INGESTION_BATCH)
+        for i in range(start, len(chunks), batch):
+            part = chunks[i : i + batch]
+            embeddings = await get_embeddings_batch([c["text"] for c in part])
+            done = i + len(part)
+            progress = EXTRACTION_SHARE + (100 - EXTRACTION_SHARE) * done // len(chunks)
+            await self._insert_chunks(document_id, part, embeddings, min(progress, 99))
+
+    # ── Accès BDD (une session courte par étape) ──────────
+
+    @staticmethod
+    async def _claim(document_id: uuid.UUID) -> ClaimedDocument | None:
+        async with async_session() as db:
+            result = await db.execute(
+                update(Document)
+                .where(Document.id == document_id, Document.status == PENDING)
+                .values(
+                    status=case((Document.texte_extrait.is_(None), EXTRACTING), else_=EMBEDDING),
+                    error=None,
+                )
+                .returning(
+                    Document.id, Document.chemin_stockage, Document.type_mime, Document.texte_extrait
+                )
+            )
+            row = result.one_or_none()
+            await db.commit()
+        return ClaimedDocument(*row) if row is not None else None
+
+    @staticmethod
+    async def _save(document_id: uuid.UUID, **values: Any) -> None:
+        async with async_session() as db:
+            await db.execute(update(Document).where(Document.id == document_id).values(**values))
+            await db.commit()
+
+    @staticmethod
+    async def _chunk_count(document_id: uuid.UUID) -> int:
+        async with async_session() as db:
+            result = await db.execute(
+                select(func.count()).select_from(DocChunk).where(DocChunk.document_id == document_id)
+            )
+            return result.scalar() or 0
+
+    @staticmethod
+    async def _insert_chunks(
+        document_id: uuid.UUID, chunks: list[dict], embeddings: list[list[float]], progress: int
+    ) -> None:
+        async with async_session() as db:
+            db.add_all(
+                DocChunk(
+                    document_id=document_id,
+                    contenu=chunk["text"],
+                    embedding=embedding,
+                    page_number=chunk.get("page"),
+                    chunk_index=chunk["index"],
+                )
+                for chunk, embedding in zip(chunks, embeddings)
+            )
+            await db.execute(
+                update(Document).where(Document.id == document_id).values(progress=progress)
+            )
+            await db.commit()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": len([w for w in self._workers if not w.done()]),
+            "queued": len(self._queued),
+            "active": len(self._active),
+            "processed_total": self.processed_total,
+            "failed_total": self.failed_total,
+        }
+
+
+document_ingestion = DocumentIngestion()
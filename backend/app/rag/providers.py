@@ -0,0 +1,337 @@
+"""
+Providers d'embeddings, choisis par EMBEDDING_PROVIDER :
+
+- "voyage"  : API Voyage AI (voyage-3-large), réseau ; dimension via output_dimension ;
+- "local"   : modèle sentence-transformers (ONNX ou PyTorch) exécuté sur CPU,
+              dépendance optionnelle (pip install sentence-transformers) ;
+- "hashing" : vectoriseur déterministe par hachage (mots + trigrammes de caractères),
+              sans dépendance ni réseau — tests, démos hors ligne.
+
+Tous produisent des vecteurs de EMBEDDING_DIM dimensions, stockés tels quels dans
+doc_chunks / fonds_chunks. Changer de provider (ou de dimension) impose de
+re-vectoriser les chunks existants ; changer de dimension impose aussi de migrer
+les colonnes vector.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import re
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_TEXT_CHARS = 16000  # Tronquer les textes trop longs (Voyage limite à ~32k tokens)
+
+
+class EmbeddingProvider(ABC):
+    name: str
+    # Vecteurs à conserver dans le cache d'embeddings (inutile s'ils coûtent moins qu'une lecture)
+    cacheable = True
+
+    @property
+    def dim(self) -> int:
+        return settings.EMBEDDING_DIM
+
+    @property
+    @abstractmethod
+    def model_id(self) -> str:
+        """Identifiant du modèle (clé du cache d'embeddings)."""
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Un vecteur par texte, dans l'ordre."""
+
+    async def close(self) -> None:
+        pass
+
+
+# ── Voyage AI ────────────────────────────────────────────
+
+VOYAGE_API_URL = "https://api.voyageai.com/v1/embeddings"
+VOYAGE_MODEL = "voyage-3-large"
+VOYAGE_NATIVE_DIM = 1024
+MAX_BATCH_SIZE = 128  # Voyage AI limite à 128 textes par requête
+
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation prudente (≈ 3 caractères/token pour du français)."""
+    return len(text) // 3 + 1
+
+
+def plan_batches(texts: list[str]) -> list[tuple[int, int]]:
+    """Découpe en sous-batches contigus (début, fin) bornés en textes et en tokens."""
+    budget = max(1, settings.EMBEDDING_BATCH_TOKENS)
+    batches: list[tuple[int, int]] = []
+    start, tokens = 0, 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if i > start and (i - start >= MAX_BATCH_SIZE or tokens + cost > budget):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += cost
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """Délai avant la tentative suivante : Retry-After si fourni, sinon backoff exponentiel."""
+    cap = settings.EMBEDDING_RETRY_MAX_DELAY
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(max(0.0, float(retry_after)), cap)
+        except ValueError:
+            try:
+                at = parsedate_to_datetime(retry_after)
+                return min(max(0.0, (at - datetime.now(timezone.utc)).total_seconds()), cap)
+            except (TypeError, ValueError):
+                pass
+    delay = settings.EMBEDDING_RETRY_BASE_DELAY * (2 ** attempt)
+    return min(delay * random.uniform(0.8, 1.2), cap)
+
+
+class VoyageProvider(EmbeddingProvider):
+    """
+    API Voyage AI. Client HTTP partagé (pool keep-alive) ; sous-batches dimensionnés
+    en tokens estimés (≤ 128 textes, ≤ EMBEDDING_BATCH_TOKENS) envoyés en parallèle
+    (EMBEDDING_CONCURRENCY) ; erreurs transitoires (429, 5xx, réseau) retentées avec
+    backoff exponentiel, en respectant l'en-tête Retry-After.
+    """
+
+    name = "voyage"
+
+    def __init__(self) -> None:
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def model_id(self) -> str:
+        if self.dim == VOYAGE_NATIVE_DIM:
+            return VOYAGE_MODEL
+        return f"{VOYAGE_MODEL}@{self.dim}"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.EMBEDDING_TIMEOUT, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=max(1, settings.EMBEDDING_CONCURRENCY) * 2,
+                    max_keepalive_connections=max(1, settings.EMBEDDING_CONCURRENCY),
+                ),
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        api_key = settings.VOYAGE_API_KEY
+        if not api_key:
+            raise ValueError(
+                "VOYAGE_API_KEY non configuré. Ajoutez-le dans le fichier .env."
+            )
+
+        batches = plan_batches(texts)
+        if len(batches) == 1:
+            return await self._call_api(texts, api_key)
+
+        semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_CONCURRENCY))
+
+        async def embed_batch(start: int, end: int) -> list[list[float]]:
+            async with semaphore:
+                return await self._call_api(texts[start:end], api_key)
+
+        tasks = [asyncio.create_task(embed_batch(start, end)) for start, end in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # Un sous-batch a échoué : inutile de poursuivre les autres
+            for task in tasks:
+                task.cancel()
+            raise
+
+        return [embedding for batch in results for embedding in batch]
+
+    async def _call_api(self, texts: list[str], api_key: str) -> list[list[float]]:
+        """Appel à l'API Voyage AI pour un batch de textes, avec retries sur erreurs transitoires."""
+        max_retries = max(0, settings.EMBEDDING_MAX_RETRIES)
+        payload: dict[str, Any] = {"input": texts, "model": VOYAGE_MODEL}
+        if self.dim != VOYAGE_NATIVE_DIM:
+            payload["output_dimension"] = self.dim
+
+        for attempt in range(max_retries + 1):
+            response: Optional[httpx.Response] = None
+            try:
+                response = await self.client.post(
+                    VOYAGE_API_URL,
+                    json=payload,
+                    headers={
+                        "Authorization": f"Bearer {api_key}",
+                        "Content-Type": "application/json",
+                    },
+                )
+            except httpx.TransportError as e:
+                if attempt == max_retries:
+                    raise RuntimeError(f"Erreur réseau API Voyage AI : {e}") from e
+                reason = type(e).__name__
+            else:
+                if response.status_code == 200:
+                    data = response.json()
+                    # Trier par index pour garantir l'ordre
+                    sorted_data = sorted(data["data"], key=lambda x: x["index"])
+                    return [item["embedding"] for item in sorted_data]
+
+                if response.status_code not in RETRYABLE_STATUS or attempt == max_retries:
+                    logger.error(
+                        "Erreur API Voyage (%d) : %s", response.status_code, response.text
+                    )
+                    raise RuntimeError(
+                        f"Erreur API Voyage AI ({response.status_code}): {response.text}"
+                    )
+                reason = str(response.status_code)
+
+            delay = _retry_delay(attempt, response)
+            logger.warning(
+                "API Voyage indisponible (%s), tentative %d/%d dans %.1fs",
+                reason, attempt + 1, max_retries, delay,
+            )
+            await asyncio.sleep(delay)
+
+
+# ── Vectoriseur par hachage ──────────────────────────────
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingProvider(EmbeddingProvider):
+    """
+    Hachage signé des mots et des trigrammes de caractères (blake2b, stable entre
+    processus), normalisé L2. Capte le recouvrement lexical, pas la sémantique.
+    """
+
+    name = "hashing"
+    cacheable = False
+
+    @property
+    def model_id(self) -> str:
+        return f"hashing@{self.dim}"
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(lambda: [self.vectorize(t) for t in texts])
+
+    def vectorize(self, text: str) -> list[float]:
+        dim = self.dim
+        vector = [0.0] * dim
+        for word in _TOKEN_RE.findall(text.lower()):
+            self._add(vector, dim, "w:" + word, 1.0)
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                self._add(vector, dim, padded[i : i + 3], 0.5)
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector] if norm else vector
+
+    @staticmethod
+    def _add(vector: list[float], dim: int, feature: str, weight: float) -> None:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+        vector[h % dim] += weight if h >> 63 else -weight
+
+
+# ── Modèle local (sentence-transformers) ─────────────────
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """
+    Modèle sentence-transformers exécuté sur CPU (EMBEDDING_LOCAL_MODEL, backend
+    EMBEDDING_LOCAL_BACKEND : "onnx" ou "torch"), chargé au premier appel.
+    EMBEDDING_DIM doit correspondre à la dimension du modèle.
+    """
+
+    name = "local"
+
+    def __init__(self) -> None:
+        self._model: Any = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return f"st:{settings.EMBEDDING_LOCAL_MODEL}"
+
+    def _load(self) -> Any:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_PROVIDER=local nécessite sentence-transformers "
+                "(pip install sentence-transformers[onnx])"
+            ) from e
+
+        model = SentenceTransformer(
+            settings.EMBEDDING_LOCAL_MODEL, device="cpu", backend=settings.EMBEDDING_LOCAL_BACKEND
+        )
+        native_dim = model.get_sentence_embedding_dimension()
+        if native_dim != self.dim:
+            raise RuntimeError(
+                f"Le modèle {settings.EMBEDDING_LOCAL_MODEL} produit des vecteurs de "
+                f"{native_dim} dimensions, EMBEDDING_DIM={self.dim}"
+            )
+        logger.info("Modèle d'embeddings local chargé : %s", settings.EMBEDDING_LOCAL_MODEL)
+        return model
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        if self._model is None:
+            async with self._lock:
+                if self._model is None:
+                    self._model = await asyncio.to_thread(self._load)
+        vectors = await asyncio.to_thread(
+            self._model.encode,
+            texts,
+            batch_size=settings.EMBEDDING_LOCAL_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        )
+        return vectors.tolist()
+
+
+# ── Sélection ────────────────────────────────────────────
+
+PROVIDERS: dict[str, type[EmbeddingProvider]] = {
+    "voyage": VoyageProvider,
+    "local": SentenceTransformerProvider,
+    "hashing": HashingProvider,
+}
+
+_providers: dict[str, EmbeddingProvider] = {}
+
+
+def get_provider(name: str | None = None) -> EmbeddingProvider:
+    """Provider configuré (EMBEDDING_PROVIDER), instancié une fois par processus."""
+    name = (name or settings.EMBEDDING_PROVIDER).lower()
+    if name not in PROVIDERS:
+        raise ValueError(
+            f"EMBEDDING_PROVIDER inconnu : {name}. Valeurs : {', '.join(PROVIDERS)}"
+        )
+    provider = _providers.get(name)
+    if provider is None:
+        provider = _providers[name] = PROVIDERS[name]()
+    return provider
+
+
+async def close_providers() -> None:
+    """Ferme les clients des providers. Appelé à l'arrêt de l'application."""
+    for provider in list(_providers.values()):
+        await provider.close()
+    _providers.clear()
@@ -3,6 +3,7 @@ Extraction de texte depuis différents formats de fichiers.
 Supporte : PDF, Word (.docx), Excel (.xlsx), images (OCR via pytesseract).
 """
 
+import asyncio
 import logging
 from pathlib import Path
 
@@ -13,11 +14,15 @@ async def extract_text_from_file(file_path: str, mime_type: str | None = None) -
     """
     Extrait le texte brut d'un fichier selon son type MIME ou son extension.
     Retourne le texte extrait ou une chaîne vide en cas d'échec.
+    Le parsing (et l'OCR) s'exécute dans un thread pour ne pas bloquer la boucle.
     """
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(f"Fichier introuvable : {file_path}")
+    return await asyncio.to_thread(_extract, path, mime_type)
 
+
+def _extract(path: Path, mime_type: str | None) -> str:
     # Déterminer le type à partir du mime ou de l'extension
     mime = (mime_type or "").lower()
     suffix = path.suffix.lower()
@@ -17,6 +17,10 @@ class DocumentResponse(BaseModel):
     taille: int | None
     metadata_json: dict | None
     created_at: datetime
+    # Ingestion : pending | extracting | embedding | ready | failed, avancement en %
+    status: str = "ready"
+    progress: int = 100
+    error: str | None = None
 
     model_config = {"from_attributes": True}
 
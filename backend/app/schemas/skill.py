@@ -16,6 +16,7 @@ class SkillCreateRequest(BaseModel):
     input_schema: dict
     handler_key: str = Field(..., max_length=100)
     handler_code: str | None = None
+    is_read_only: bool = False
 
 
 class SkillUpdateRequest(BaseModel):
@@ -24,6 +25,7 @@ class SkillUpdateRequest(BaseModel):
     input_schema: dict | None = None
     handler_code: str | None = None
     is_active: bool | None = None
+    is_read_only: bool | None = None
 
 
 class SkillTestRequest(BaseModel):
@@ -42,6 +44,7 @@ class SkillResponse(BaseModel):
     handler_key: str
     handler_code: str | None
     is_active: bool
+    is_read_only: bool
     version: int
     created_by: uuid.UUID | None
     created_at: datetime
@@ -6,7 +6,7 @@ Exécute tous les seeds dans l'ordre :
   2. Référentiels ESG
   3. Fonds verts
   4. Benchmarks sectoriels
-  5. Fonds chunks (RAG) — nécessite VOYAGE_API_KEY
+  5. Fonds chunks (RAG) — nécessite un provider d'embeddings (EMBEDDING_PROVIDER)
   6. Report templates
   7. Données de démo (admin + entreprise + scores)
 """
@@ -430,7 +430,7 @@ FONDS_DESCRIPTIONS: dict[str, list[dict[str, str]]] = {
 async def seed_fonds_chunks(db: AsyncSession) -> int:
     """
     Peuple la table fonds_chunks avec les descriptions détaillées des fonds.
-    Génère les embeddings via Voyage AI.
+    Génère les embeddings via le provider configuré (EMBEDDING_PROVIDER).
     """
     # Vérifier si déjà peuplé
     result = await db.execute(select(func.count(FondsChunk.id)))
@@ -58,6 +58,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "esg",
         "handler_key": "builtin.list_referentiels",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -83,6 +84,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "finance",
         "handler_key": "builtin.search_green_funds",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -150,6 +152,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "finance",
         "handler_key": "builtin.simulate_funding",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -201,6 +204,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "utils",
         "handler_key": "builtin.get_sector_benchmark",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -324,6 +328,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "knowledge",
         "handler_key": "builtin.search_knowledge_base",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -352,6 +357,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "utils",
         "handler_key": "builtin.get_action_plans",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -365,6 +371,32 @@ BUILTIN_SKILLS = [
             "required": ["entreprise_id"],
         },
     },
+    {
+        "nom": "get_skill_result",
+        "description": (
+            "Relit le détail d'un résultat de skill abrégé. Quand un résultat contient "
+            "\"abrege\": true et un result_id, utilise ce skill pour consulter le résultat "
+            "complet ou une partie (chemin pointé, ex. 'fonds.2' ou 'plans.0.items'). "
+            "Une partie trop volumineuse est paginée ou remplacée par ses clés : précise alors le chemin. "
+            "Ne l'utilise que si la version abrégée ne suffit pas à répondre."
+        ),
+        "category": "utils",
+        "handler_key": "builtin.get_skill_result",
+        "is_read_only": True,
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "result_id": {"type": "string", "description": "Identifiant du résultat abrégé"},
+                "chemin": {
+                    "type": "string",
+                    "description": "Chemin pointé dans le résultat (ex. 'fonds.2'). Vide = tout le résultat",
+                },
+                "offset": {"type": "integer", "default": 0, "description": "Début de page : élément d'une liste, ou caractère d'un texte long (champ 'suivant' de la réponse)"},
+                "limit": {"type": "integer", "default": 10, "description": "Taille de page si le chemin est une liste"},
+            },
+            "required": ["result_id"],
+        },
+    },
     {
         "nom": "get_company_profile",
         "description": (
@@ -373,6 +405,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "profile",
         "handler_key": "builtin.get_company_profile",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -471,6 +504,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "finance",
         "handler_key": "builtin.get_intermediaires",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -498,6 +532,7 @@ BUILTIN_SKILLS = [
         ),
         "category": "finance",
         "handler_key": "builtin.guide_candidature",
+        "is_read_only": True,
         "input_schema": {
             "type": "object",
             "properties": {
@@ -590,5 +625,6 @@ async def seed_skills(db: AsyncSession) -> int:
             # Update description and input_schema for builtin skills
             existing.description = skill_data["description"]
             existing.input_schema = skill_data["input_schema"]
+            existing.is_read_only = skill_data.get("is_read_only", False)
     await db.commit()
     return count
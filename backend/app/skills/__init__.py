@@ -1,4 +1,10 @@
+from app.skills.catalogue import invalidate_skill_catalogue, skill_catalogue
 from app.skills.registry import SkillRegistry
 from app.skills.validator import validate_skill_code
 
-__all__ = ["SkillRegistry", "validate_skill_code"]
+__all__ = [
+    "SkillRegistry",
+    "invalidate_skill_catalogue",
+    "skill_catalogue",
+    "validate_skill_code",
+]
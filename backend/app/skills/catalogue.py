@@ -0,0 +1,143 @@
+"""
+Catalogue en mémoire des skills actifs, partagé par tout le processus.
+
+Les skills sont indexés par nom avec leur définition au format OpenAI tools
+précalculée. Le catalogue est rechargé depuis la BDD uniquement quand :
+- la version a été incrémentée (invalidate_skill_catalogue(), appelé par les
+  endpoints admin create/update/toggle/delete) ;
+- ou le TTL SKILL_CATALOGUE_TTL est écoulé (filet de sécurité pour les
+  modifications faites par un autre worker ou par le seed).
+
+En régime établi, la boucle agent n'émet donc aucune requête sur la table skills.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.skill import Skill
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SkillEntry:
+    """Définition figée d'un skill actif."""
+
+    name: str
+    description: str
+    category: str | None
+    input_schema: dict
+    handler_key: str
+    handler_code: str | None
+    version: int
+    is_read_only: bool
+    tool: dict = field(repr=False)
+    openai_tool: dict = field(repr=False)
+
+
+def _to_entry(skill: Skill) -> SkillEntry:
+    tool = {
+        "name": skill.nom,
+        "description": skill.description,
+        "input_schema": skill.input_schema,
+        "category": skill.category,
+    }
+    return SkillEntry(
+        name=skill.nom,
+        description=skill.description,
+        category=skill.category,
+        input_schema=skill.input_schema,
+        handler_key=skill.handler_key,
+        handler_code=skill.handler_code,
+        version=skill.version,
+        is_read_only=bool(skill.is_read_only),
+        tool=tool,
+        openai_tool=to_openai_tool(tool),
+    )
+
+
+def to_openai_tool(tool: dict) -> dict:
+    """Convertit un tool {name, description, input_schema} au format OpenAI tools."""
+    return {
+        "type": "function",
+        "function": {
+            "name": tool["name"],
+            "description": tool["description"],
+            "parameters": tool["input_schema"],
+        },
+    }
+
+
+class SkillCatalogue:
+    """Index des skills actifs, rechargé sur changement de version ou expiration du TTL."""
+
+    def __init__(self) -> None:
+        self.version = 0
+        self._loaded_version = -1
+        self._loaded_at = 0.0
+        self._entries: dict[str, SkillEntry] = {}
+        self._ordered: list[SkillEntry] = []
+        self._lock = asyncio.Lock()
+
+    def invalidate(self) -> None:
+        self.version += 1
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._loaded_version == self.version
+            and time.monotonic() - self._loaded_at < settings.SKILL_CATALOGUE_TTL
+        )
+
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            version = self.version
+            result = await db.execute(
+                select(Skill)
+                .where(Skill.is_active.is_(True))
+                .order_by(Skill.category, Skill.nom)
+            )
+            ordered = [_to_entry(s) for s in result.scalars().all()]
+            self._ordered = ordered
+            self._entries = {e.name: e for e in ordered}
+            self._loaded_version = version
+            self._loaded_at = time.monotonic()
+            logger.debug("Catalogue de skills rechargé (%d skills, v%d)", len(ordered), version)
+
+    async def get(self, db: AsyncSession, name: str) -> SkillEntry | None:
+        await self.ensure_loaded(db)
+        return self._entries.get(name)
+
+    def peek(self, name: str) -> SkillEntry | None:
+        """Lecture sans rechargement (le catalogue a déjà été chargé par le run en cours)."""
+        return self._entries.get(name)
+
+    async def active_tools(self, db: AsyncSession) -> list[dict]:
+        await self.ensure_loaded(db)
+        return [e.tool for e in self._ordered]
+
+    def openai_tools(self, tools: list[dict]) -> list[dict]:
+        """Retourne les définitions OpenAI précalculées pour une liste de tools."""
+        result: list[dict[str, Any]] = []
+        for t in tools:
+            entry = self._entries.get(t["name"])
+            result.append(entry.openai_tool if entry and entry.tool is t else to_openai_tool(t))
+        return result
+
+
+skill_catalogue = SkillCatalogue()
+
+
+def invalidate_skill_catalogue() -> None:
+    """Force le rechargement du catalogue au prochain accès (après une modification admin)."""
+    skill_catalogue.invalidate()
@@ -13,6 +13,7 @@ from app.skills.handlers.get_action_plans import get_action_plans
 from app.skills.handlers.get_company_profile import get_company_profile
 from app.skills.handlers.manage_action_plan import manage_action_plan
 from app.skills.handlers.get_sector_benchmark import get_sector_benchmark
+from app.skills.handlers.get_skill_result import get_skill_result
 from app.skills.handlers.list_referentiels import list_referentiels
 from app.skills.handlers.search_green_funds import search_green_funds
 from app.skills.handlers.search_knowledge_base import search_knowledge_base
@@ -34,6 +35,7 @@ __all__ = [
     "get_action_plans",
     "get_company_profile",
     "get_sector_benchmark",
+    "get_skill_result",
     "manage_action_plan",
     "update_company_profile",
     "list_referentiels",
@@ -9,6 +9,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.document import DocChunk, Document
 from app.rag.chunker import chunk_text
 from app.rag.embeddings import get_embedding, get_embeddings_batch
+from app.rag.ingestion import FAILED, IN_PROGRESS
 from app.rag.search import semantic_search
 
 logger = logging.getLogger(__name__)
@@ -62,6 +63,20 @@ async def analyze_document(params: dict, context: dict) -> dict:
     if not doc:
         return {"error": f"Document introuvable (id: {document_id})"}
 
+    if doc.status in IN_PROGRESS:
+        return {
+            "status": doc.status,
+            "message": (
+                f"Le document « {doc.nom_fichier} » est en cours de traitement "
+                f"({doc.progress} %). Réessayez dans quelques instants."
+            ),
+        }
+    if doc.status == FAILED:
+        return {
+            "error": f"Le traitement du document a échoué ({doc.error}). "
+            "Relancez-le depuis la page Documents."
+        }
+
     # 2. Vérifier / créer les chunks
     count_result = await db.execute(
         select(func.count()).select_from(DocChunk).where(DocChunk.document_id == doc_uuid)
@@ -6,10 +6,10 @@ Orchestre le générateur de rapports.
 
 import logging
 
-from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import settings
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Task, complete
 from app.reports.generator import generate_report
 
 logger = logging.getLogger(__name__)
@@ -17,13 +17,10 @@ logger = logging.getLogger(__name__)
 
 async def _llm_generate(prompt: str) -> str:
     """Helper to call the LLM for report sections."""
-    client = AsyncOpenAI(
-        base_url=settings.LLM_BASE_URL,
-        api_key=settings.LLM_API_KEY,
-    )
-    response = await client.chat.completions.create(
-        model=settings.LLM_MODEL,
-        max_tokens=1500,
+    client = get_llm_client()
+    response = await complete(
+        client,
+        Task.REPORT_SECTION,
         messages=[
             {
                 "role": "system",
@@ -61,6 +58,10 @@ async def assemble_pdf(params: dict, context: dict) -> dict:
             "error": f"Template inconnu: '{template_name}'. Valeurs possibles: {', '.join(valid_templates)}"
         }
 
+    progress = context.get("progress")
+    if progress:
+        progress(0, 1, "Rédaction du rapport PDF")
+
     try:
         pdf_bytes, filename = await generate_report(
             entreprise_id=entreprise_id,
@@ -5,10 +5,10 @@ Génère des documents Word (.docx) professionnels pour les dossiers de candidat
 
 import logging
 
-from openai import AsyncOpenAI
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import settings
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Task, complete
 from app.documents.word_generator import (
     TYPE_LABELS,
     VALID_TYPES,
@@ -20,13 +20,10 @@ logger = logging.getLogger(__name__)
 
 async def _llm_generate(prompt: str) -> str:
     """Appelle le LLM pour générer du contenu textuel."""
-    client = AsyncOpenAI(
-        base_url=settings.LLM_BASE_URL,
-        api_key=settings.LLM_API_KEY,
-    )
-    response = await client.chat.completions.create(
-        model=settings.LLM_MODEL,
-        max_tokens=2000,
+    client = get_llm_client()
+    response = await complete(
+        client,
+        Task.DOCUMENT,
         messages=[
             {
                 "role": "system",
@@ -74,6 +71,10 @@ async def generate_document(params: dict, context: dict) -> dict:
             )
         }
 
+    progress = context.get("progress")
+    if progress:
+        progress(0, 1, "Rédaction du document Word")
+
     try:
         docx_bytes, filename = await generate_word_document(
             entreprise_id=entreprise_id,
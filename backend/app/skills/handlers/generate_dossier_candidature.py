@@ -11,11 +11,11 @@ import re
 import uuid
 from datetime import datetime, timezone
 
-from openai import AsyncOpenAI
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import settings
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Task, complete
 from app.documents.dossier_assembler import DossierAssembler
 from app.documents.word_generator import generate_word_document
 from app.models.dossier_candidature import DossierCandidature
@@ -90,13 +90,10 @@ _DOC_ORDER = {
 
 async def _llm_generate(prompt: str) -> str:
     """Appelle le LLM pour générer du contenu textuel."""
-    client = AsyncOpenAI(
-        base_url=settings.LLM_BASE_URL,
-        api_key=settings.LLM_API_KEY,
-    )
-    response = await client.chat.completions.create(
-        model=settings.LLM_MODEL,
-        max_tokens=2000,
+    client = get_llm_client()
+    response = await complete(
+        client,
+        Task.DOSSIER_SECTION,
         messages=[
             {
                 "role": "system",
@@ -214,7 +211,13 @@ async def generate_dossier_candidature(params: dict, context: dict) -> dict:
     # Construire le statut des documents pour la checklist
     documents_status = []
 
-    for doc_type in doc_list:
+    # Avancement publié quand le skill tourne en job d'arrière-plan (app/skills/jobs.py)
+    progress = context.get("progress")
+    total_steps = len(doc_list) + 1
+
+    for step, doc_type in enumerate(doc_list):
+        if progress:
+            progress(step, total_steps, f"Génération : {_DOC_LABELS.get(doc_type, doc_type)}")
 
         # Documents Word
         if doc_type in _WORD_DOCS:
@@ -300,6 +303,8 @@ async def generate_dossier_candidature(params: dict, context: dict) -> dict:
 
     zip_url = None
     zip_filename = None
+    if progress:
+        progress(len(doc_list), total_steps, "Assemblage du dossier ZIP")
     if documents_generes:
         assembler = DossierAssembler(
             entreprise_nom=entreprise.nom,
@@ -6,11 +6,11 @@ Génère le texte d'une section de rapport via le LLM.
 import logging
 import uuid
 
-from openai import AsyncOpenAI
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import settings
+from app.core.llm import get_llm_client
+from app.core.llm_routing import Task, complete
 from app.models.report_template import ReportTemplate
 
 logger = logging.getLogger(__name__)
@@ -70,15 +70,12 @@ async def generate_report_section(params: dict, context: dict) -> dict:
         prompt = prompt.replace(f"{{{key}}}", str(val))
 
     # Call LLM
-    client = AsyncOpenAI(
-        base_url=settings.LLM_BASE_URL,
-        api_key=settings.LLM_API_KEY,
-    )
+    client = get_llm_client()
 
     try:
-        response = await client.chat.completions.create(
-            model=settings.LLM_MODEL,
-            max_tokens=1500,
+        response = await complete(
+            client,
+            Task.REPORT_SECTION,
             messages=[
                 {
                     "role": "system",
@@ -0,0 +1,88 @@
+"""Handler builtin : relit le résultat complet d'un skill abrégé pour le LLM."""
+
+import json
+from typing import Any
+
+from app.config import settings
+from app.skills.results import skill_result_store
+
+_ENVELOPE_CHARS = 150  # result_id, chemin, pagination
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str))
+
+
+async def get_skill_result(params: dict, context: dict) -> dict:
+    """
+    Retourne tout ou partie d'un résultat de skill stocké (voir app/skills/results.py).
+    `chemin` est un chemin pointé dans le résultat, ex. "fonds.2" ou "plans.0.items".
+    `offset` / `limit` paginent une liste (ou un texte, en caractères).
+
+    La sortie n'est pas recompactée : elle tient dans SKILL_RESULT_MAX_CHARS. Une page
+    trop grosse est réduite ; un objet trop gros est remplacé par ses clés (taille de
+    chacune) pour que le LLM précise le chemin ; un texte trop long est découpé.
+    """
+    result_id = params.get("result_id")
+    if not result_id:
+        return {"error": "result_id est requis"}
+
+    entreprise_id = context.get("entreprise_id")
+    value: Any = skill_result_store.get(
+        result_id, str(entreprise_id) if entreprise_id else None
+    )
+    if value is None:
+        return {"error": f"Résultat '{result_id}' introuvable ou expiré, relance le skill d'origine"}
+
+    chemin = params.get("chemin") or ""
+    for part in filter(None, chemin.split(".")):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return {"error": f"Chemin '{chemin}' introuvable dans le résultat"}
+
+    budget = max(settings.SKILL_RESULT_MAX_CHARS - _ENVELOPE_CHARS, 200)
+    offset = max(int(params.get("offset", 0)), 0)
+    response: dict[str, Any] = {"result_id": result_id, "chemin": chemin}
+
+    if isinstance(value, list):
+        limit = max(int(params.get("limit", 10)), 1)
+        elements = value[offset:offset + limit]
+        while len(elements) > 1 and _size(elements) > budget:
+            elements = elements[: (len(elements) + 1) // 2]
+        if elements and _size(elements) > budget:
+            return {**response, "total": len(value), **_outline(value[offset], f"{chemin}.{offset}")}
+        response.update(total=len(value), offset=offset, elements=elements)
+        if offset + len(elements) < len(value):
+            response["suivant"] = offset + len(elements)
+        return response
+
+    if isinstance(value, str) and len(value) > budget:
+        response.update(
+            total_caracteres=len(value), offset=offset, valeur=value[offset:offset + budget]
+        )
+        if offset + budget < len(value):
+            response["suivant"] = offset + budget
+        return response
+
+    if isinstance(value, dict) and _size(value) > budget:
+        return {**response, **_outline(value, chemin)}
+
+    return {**response, "valeur": value}
+
+
+def _outline(value: Any, chemin: str) -> dict[str, Any]:
+    """Structure d'une valeur trop volumineuse, pour choisir un chemin plus précis."""
+    prefix = f"{chemin.strip('.')}." if chemin.strip(".") else ""
+    if isinstance(value, dict):
+        return {
+            "trop_volumineux": True,
+            "cles": {k: _size(v) for k, v in value.items()},
+            "note": f"Précise le chemin, ex. '{prefix}{next(iter(value), 'cle')}'.",
+        }
+    return {
+        "trop_volumineux": True,
+        "note": f"Précise le chemin ('{chemin.strip('.')}') avec offset pour lire la suite.",
+    }
@@ -0,0 +1,216 @@
+"""
+Exécution en arrière-plan des skills longs (assemble_pdf, generate_document,
+generate_dossier_candidature).
+
+Le skill retourne immédiatement un identifiant de job au LLM ; le handler tourne dans
+une tâche asyncio avec sa propre session BDD et publie son avancement via
+context["progress"](courant, total, message). La boucle agent relaie ces événements
+(skill_progress) sur le stream SSE de la conversation ; GET /api/chat/jobs/{id}
+permet à un client reconnecté de suivre le job.
+
+Les jobs vivent dans la mémoire du processus (SKILL_JOB_TTL après la fin) ; une fois
+terminé, le résultat compacté remplace le handle dans messages.tool_calls_json.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+
+from app.config import settings
+from app.core.database import async_session
+from app.models.message import Message
+from app.skills.results import compact_tool_result, persisted_tool_result
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_SKILLS = frozenset({"assemble_pdf", "generate_document", "generate_dossier_candidature"})
+
+
+@dataclass
+class SkillJob:
+    id: str
+    skill: str
+    conversation_id: str | None
+    owner: str | None = None
+    status: str = "running"  # running | done | error
+    current: int = 0
+    total: int | None = None
+    message: str = "Démarrage"
+    result: dict[str, Any] | None = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: float | None = None
+    # Message assistant + tool_call à mettre à jour avec le résultat final
+    message_ref: tuple[uuid.UUID, str] | None = None
+    _subscribers: list[asyncio.Queue] = field(default_factory=list, repr=False)
+    _task: asyncio.Task | None = field(default=None, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status != "running"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "skill": self.skill,
+            "status": self.status,
+            "progress": {"current": self.current, "total": self.total, "message": self.message},
+            "result": self.result,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+    def handle(self) -> dict[str, Any]:
+        """Résultat immédiat renvoyé au LLM à la place du résultat final."""
+        return {
+            "job_id": self.id,
+            "status": "running",
+            "message": (
+                "Génération lancée en arrière-plan. L'utilisateur voit l'avancement en direct "
+                "et recevra les liens de téléchargement dès la fin : annonce-le simplement."
+            ),
+        }
+
+    def _publish(self, event: dict[str, Any]) -> None:
+        for queue in self._subscribers:
+            queue.put_nowait(event)
+
+
+class SkillJobManager:
+    """Registre des jobs en cours et terminés du processus."""
+
+    def __init__(self) -> None:
+        self._jobs: dict[str, SkillJob] = {}
+        # Enregistrements de résultats en cours (référence forte jusqu'à la fin)
+        self._store_tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def is_background(skill_name: str) -> bool:
+        return settings.SKILL_BACKGROUND_JOBS and skill_name in BACKGROUND_SKILLS
+
+    def get(self, job_id: str) -> SkillJob | None:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def submit(self, registry, skill_name: str, params: dict, context: dict) -> SkillJob:
+        """Lance le skill en tâche de fond et retourne le job."""
+        self._purge()
+        job = SkillJob(
+            id=uuid.uuid4().hex,
+            skill=skill_name,
+            conversation_id=context.get("conversation_id"),
+            owner=str(context["entreprise_id"]) if context.get("entreprise_id") else None,
+        )
+        self._jobs[job.id] = job
+        job._task = asyncio.create_task(self._run(job, registry, params, context))
+        return job
+
+    async def _run(self, job: SkillJob, registry, params: dict, context: dict) -> None:
+        def progress(current: int, total: int | None, message: str) -> None:
+            job.current, job.total, job.message = current, total, message
+            job.updated_at = datetime.now(timezone.utc)
+            job._publish({
+                "type": "skill_progress",
+                "job_id": job.id,
+                "skill": job.skill,
+                "current": current,
+                "total": total,
+                "message": message,
+            })
+
+        try:
+            async with async_session() as session:
+                job_context = {**context, "db": session, "progress": progress}
+                result = await registry.execute_skill(job.skill, params, job_context)
+            job.status = "error" if isinstance(result, dict) and "error" in result else "done"
+        except Exception as e:
+            logger.exception("Erreur dans le job '%s' (%s)", job.skill, job.id)
+            result = {"error": f"Erreur d'exécution du skill: {e}"}
+            job.status = "error"
+
+        job.result = result
+        job.message = "Terminé" if job.status == "done" else "Échec"
+        job.updated_at = datetime.now(timezone.utc)
+        job.finished_at = time.monotonic()
+        job._publish({"type": "skill_result", "job_id": job.id, "skill": job.skill, "result": result})
+        if job.message_ref:
+            await self._store_result(job)
+
+    def link_message(self, job_id: str, message_id: uuid.UUID, tool_call_id: str) -> None:
+        """Rattache le job au message assistant sauvegardé (mis à jour à la fin du job)."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        job.message_ref = (message_id, tool_call_id)
+        if job.done:
+            task = asyncio.create_task(self._store_result(job))
+            self._store_tasks.add(task)
+            task.add_done_callback(self._store_tasks.discard)
+
+    async def _store_result(self, job: SkillJob) -> None:
+        message_id, tool_call_id = job.message_ref
+        try:
+            async with async_session() as db:
+                message = await db.get(Message, message_id)
+                if message is None or not isinstance(message.tool_calls_json, list):
+                    return
+                entries = []
+                for entry in message.tool_calls_json:
+                    if isinstance(entry, dict) and entry.get("id") == tool_call_id:
+                        compact = compact_tool_result(job.skill, job.result, job.owner)
+                        entry = {**entry, "result": persisted_tool_result(compact)}
+                    entries.append(entry)
+                message.tool_calls_json = entries
+                await db.commit()
+        except Exception:
+            logger.exception("Impossible d'enregistrer le résultat du job %s", job.id)
+
+    async def follow(
+        self, jobs: list[SkillJob], timeout: float
+    ) -> AsyncGenerator[dict[str, Any], None]:
+        """
+        Relaye les événements (skill_progress puis skill_result) des jobs jusqu'à leur fin
+        ou jusqu'au timeout ; les jobs continuent ensuite en arrière-plan.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        pending = {job.id for job in jobs if not job.done}
+        for job in jobs:
+            if job.done:
+                yield {"type": "skill_result", "job_id": job.id, "skill": job.skill, "result": job.result}
+            else:
+                job._subscribers.append(queue)
+        deadline = time.monotonic() + timeout
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if event["type"] == "skill_result":
+                    pending.discard(event["job_id"])
+                yield event
+        finally:
+            for job in jobs:
+                if queue in job._subscribers:
+                    job._subscribers.remove(queue)
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > settings.SKILL_JOB_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+skill_jobs = SkillJobManager()
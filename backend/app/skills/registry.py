@@ -1,20 +1,75 @@
 """
 Registre central des skills.
-Charge les skills depuis la BDD et les convertit en outils (format OpenAI tools).
+Charge les skills depuis le catalogue en mémoire (app/skills/catalogue.py)
+et les convertit en outils (format OpenAI tools).
 Dispatche l'exécution vers les handlers builtin ou le sandbox custom.
 """
 
 import logging
+from functools import lru_cache
 from typing import Any, Callable
 
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.skill import Skill
+from app.skills.catalogue import skill_catalogue
+from app.skills.sandbox import run_custom_skill
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=1)
+def _builtin_handlers() -> dict[str, Callable]:
+    """Enregistre tous les handlers builtin disponibles (une seule fois par processus)."""
+    from app.skills.handlers import (
+        analyze_document,
+        assemble_pdf,
+        calculate_carbon,
+        calculate_credit_score,
+        calculate_esg_score,
+        generate_document,
+        generate_dossier_candidature,
+        generate_reduction_plan,
+        get_intermediaires,
+        guide_candidature,
+        generate_report_section,
+        get_action_plans,
+        get_company_profile,
+        get_sector_benchmark,
+        get_skill_result,
+        list_referentiels,
+        manage_action_plan,
+        search_green_funds,
+        search_knowledge_base,
+        simulate_funding,
+        update_company_profile,
+    )
+
+    # Handlers implémentés
+    return {
+        "builtin.get_company_profile": get_company_profile,
+        "builtin.update_company_profile": update_company_profile,
+        "builtin.list_referentiels": list_referentiels,
+        "builtin.search_knowledge_base": search_knowledge_base,
+        "builtin.analyze_document": analyze_document,
+        "builtin.calculate_esg_score": calculate_esg_score,
+        "builtin.search_green_funds": search_green_funds,
+        "builtin.calculate_carbon": calculate_carbon,
+        "builtin.generate_reduction_plan": generate_reduction_plan,
+        "builtin.simulate_funding": simulate_funding,
+        "builtin.get_sector_benchmark": get_sector_benchmark,
+        "builtin.calculate_credit_score": calculate_credit_score,
+        "builtin.get_action_plans": get_action_plans,
+        "builtin.manage_action_plan": manage_action_plan,
+        "builtin.generate_report_section": generate_report_section,
+        "builtin.assemble_pdf": assemble_pdf,
+        "builtin.generate_document": generate_document,
+        "builtin.generate_dossier_candidature": generate_dossier_candidature,
+        "builtin.get_intermediaires": get_intermediaires,
+        "builtin.guide_candidature": guide_candidature,
+        "builtin.get_skill_result": get_skill_result,
+    }
+
+
 class SkillRegistry:
     """
     Pont entre la BDD (définition des skills) et le code Python (exécution).
@@ -25,81 +80,23 @@ class SkillRegistry:
 
     def __init__(self, db_session: AsyncSession):
         self.db = db_session
-        self.builtin_handlers: dict[str, Callable] = {}
-        self._register_builtins()
-
-    def _register_builtins(self):
-        """Enregistre tous les handlers builtin disponibles."""
-        from app.skills.handlers import (
-            analyze_document,
-            assemble_pdf,
-            calculate_carbon,
-            calculate_credit_score,
-            calculate_esg_score,
-            generate_document,
-            generate_dossier_candidature,
-            generate_reduction_plan,
-            get_intermediaires,
-            guide_candidature,
-            generate_report_section,
-            get_action_plans,
-            get_company_profile,
-            get_sector_benchmark,
-            list_referentiels,
-            manage_action_plan,
-            search_green_funds,
-            search_knowledge_base,
-            simulate_funding,
-            update_company_profile,
-        )
-
-        # Handlers implémentés
-        self.builtin_handlers = {
-            "builtin.get_company_profile": get_company_profile,
-            "builtin.update_company_profile": update_company_profile,
-            "builtin.list_referentiels": list_referentiels,
-            "builtin.search_knowledge_base": search_knowledge_base,
-            "builtin.analyze_document": analyze_document,
-            "builtin.calculate_esg_score": calculate_esg_score,
-            "builtin.search_green_funds": search_green_funds,
-            "builtin.calculate_carbon": calculate_carbon,
-            "builtin.generate_reduction_plan": generate_reduction_plan,
-            "builtin.simulate_funding": simulate_funding,
-            "builtin.get_sector_benchmark": get_sector_benchmark,
-            "builtin.calculate_credit_score": calculate_credit_score,
-            "builtin.get_action_plans": get_action_plans,
-            "builtin.manage_action_plan": manage_action_plan,
-            "builtin.generate_report_section": generate_report_section,
-            "builtin.assemble_pdf": assemble_pdf,
-            "builtin.generate_document": generate_document,
-            "builtin.generate_dossier_candidature": generate_dossier_candidature,
-            "builtin.get_intermediaires": get_intermediaires,
-            "builtin.guide_candidature": guide_candidature,
-        }
+        self.builtin_handlers: dict[str, Callable] = _builtin_handlers()
 
     async def get_active_tools(self) -> list[dict]:
         """
-        Charge les skills actifs depuis la BDD.
+        Retourne les skills actifs (catalogue en mémoire, rechargé si invalidé).
         Retourne une liste de dicts {name, description, input_schema}.
-        La conversion au format OpenAI tools se fait dans engine.py.
         """
-        result = await self.db.execute(
-            select(Skill)
-            .where(Skill.is_active.is_(True))
-            .order_by(Skill.category, Skill.nom)
-        )
-        skills = result.scalars().all()
-
-        tools = []
-        for skill in skills:
-            tools.append(
-                {
-                    "name": skill.nom,
-                    "description": skill.description,
-                    "input_schema": skill.input_schema,
-                }
-            )
-        return tools
+        return await skill_catalogue.active_tools(self.db)
+
+    def get_openai_tools(self, tools: list[dict]) -> list[dict]:
+        """Définitions au format OpenAI tools (précalculées par le catalogue)."""
+        return skill_catalogue.openai_tools(tools)
+
+    def is_read_only(self, skill_name: str) -> bool:
+        """True si le skill est déclaré sans effet de bord (résultat réutilisable)."""
+        entry = skill_catalogue.peek(skill_name)
+        return bool(entry and entry.is_read_only)
 
     async def execute_skill(
         self, skill_name: str, params: dict, context: dict
@@ -108,11 +105,12 @@ class SkillRegistry:
         Exécute un skill par son nom.
         - Si builtin → appelle la fonction Python enregistrée
         - Si custom  → exécute le handler_code dans un sandbox
+
+        La recherche du skill utilise context["db"] si fourni, afin que les
+        appels concurrents (une session par skill) ne partagent pas self.db.
         """
-        result = await self.db.execute(
-            select(Skill).where(Skill.nom == skill_name, Skill.is_active.is_(True))
-        )
-        skill = result.scalar_one_or_none()
+        db: AsyncSession = context.get("db") or self.db
+        skill = await skill_catalogue.get(db, skill_name)
 
         if not skill:
             return {"error": f"Skill '{skill_name}' introuvable ou inactif"}
@@ -142,57 +140,7 @@ class SkillRegistry:
         self, code: str, params: dict, context: dict
     ) -> dict[str, Any]:
         """
-        Exécute le code Python d'un skill custom dans un environnement restreint.
+        Exécute le code Python d'un skill custom dans le sandbox (app/skills/sandbox.py).
         Le code doit définir une fonction `async def execute(params, context)`.
         """
-        import json as json_mod
-        import datetime as datetime_mod
-        import math as math_mod
-
-        allowed_globals = {
-            "__builtins__": {
-                "len": len,
-                "str": str,
-                "int": int,
-                "float": float,
-                "bool": bool,
-                "list": list,
-                "dict": dict,
-                "set": set,
-                "tuple": tuple,
-                "range": range,
-                "enumerate": enumerate,
-                "zip": zip,
-                "map": map,
-                "filter": filter,
-                "sorted": sorted,
-                "min": min,
-                "max": max,
-                "sum": sum,
-                "abs": abs,
-                "round": round,
-                "isinstance": isinstance,
-                "print": print,
-                "None": None,
-                "True": True,
-                "False": False,
-            },
-            "params": params,
-            "context": context,
-            "json": json_mod,
-            "datetime": datetime_mod,
-            "math": math_mod,
-        }
-
-        local_vars: dict = {}
-        try:
-            exec(code, allowed_globals, local_vars)
-            if "execute" not in local_vars:
-                return {
-                    "error": "Le skill custom doit définir une fonction execute(params, context)"
-                }
-            result = await local_vars["execute"](params, context)
-            return result
-        except Exception as e:
-            logger.exception("Erreur d'exécution du skill custom")
-            return {"error": f"Erreur d'exécution du skill custom: {e}"}
+        return await run_custom_skill(code, params, context)
@@ -0,0 +1,198 @@
+"""
+Compaction des résultats de skills renvoyés au LLM.
+
+Les skills comme search_green_funds, get_action_plans ou calculate_esg_score
+retournent plusieurs kilo-octets de JSON, renvoyés au LLM à chaque tour suivant
+de la boucle agent. Au-delà de SKILL_RESULT_MAX_CHARS :
+- le résultat complet est conservé dans un store mémoire (LRU + TTL) ;
+- le LLM reçoit une version abrégée (règles de projection par skill, puis
+  troncature générique des listes et des textes) avec un `result_id` ;
+- le skill get_skill_result permet au LLM de relire tout ou partie du résultat.
+
+Le store est propre au processus : la trace sauvegardée dans messages.tool_calls_json
+(rejouée dans l'historique) garde la version abrégée sans son `result_id`, qui ne
+serait plus résolu après un redémarrage ou sur un autre worker.
+
+Le frontend reçoit toujours le résultat complet (événement SSE skill_result).
+"""
+
+import json
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any
+
+from app.config import settings
+
+_MAX_STRING_CHARS = 300
+
+
+class SkillResultStore:
+    """Résultats complets des skills, indexés par identifiant (LRU borné + TTL)."""
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[str, tuple[float, str | None, Any]]" = OrderedDict()
+
+    def put(self, result: Any, owner: str | None) -> str:
+        result_id = f"res_{uuid.uuid4().hex[:12]}"
+        self._entries[result_id] = (time.monotonic(), owner, result)
+        while len(self._entries) > settings.SKILL_RESULT_STORE_SIZE:
+            self._entries.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str, owner: str | None) -> Any | None:
+        """Retourne le résultat, ou None s'il a expiré ou appartient à une autre entreprise."""
+        entry = self._entries.get(result_id)
+        if entry is None:
+            return None
+        created_at, entry_owner, result = entry
+        if time.monotonic() - created_at > settings.SKILL_RESULT_STORE_TTL:
+            del self._entries[result_id]
+            return None
+        if entry_owner != owner:
+            return None
+        self._entries.move_to_end(result_id)
+        return result
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+skill_result_store = SkillResultStore()
+
+
+# ── Règles de projection par skill ─────────────────────────
+
+
+def _pick(d: dict, keys: tuple[str, ...]) -> dict:
+    return {k: d[k] for k in keys if k in d}
+
+
+def _project_green_funds(result: dict) -> dict:
+    keys = (
+        "fonds_id", "nom", "institution", "compatibilite", "montant_range", "devise",
+        "score_esg_minimum", "date_limite", "mode_acces", "nb_intermediaires",
+    )
+    return {
+        "nombre_fonds": result.get("nombre_fonds"),
+        "fonds": [_pick(f, keys) for f in result.get("fonds", [])],
+    }
+
+
+def _project_action_plans(result: dict) -> dict:
+    item_keys = ("id", "titre", "statut", "priorite", "pilier", "echeance")
+    plans = []
+    for plan in result.get("plans", []):
+        projected = _pick(
+            plan,
+            ("id", "titre", "type_plan", "horizon", "score_initial", "score_cible", "progression"),
+        )
+        projected["items"] = [_pick(i, item_keys) for i in plan.get("items", [])]
+        plans.append(projected)
+    return {"plans": plans}
+
+
+def _project_esg_score(result: dict) -> dict:
+    return {
+        "nombre_referentiels": result.get("nombre_referentiels"),
+        "scores": [
+            _pick(s, ("referentiel", "referentiel_code", "score_global", "niveau", "scores_piliers"))
+            for s in result.get("scores", [])
+        ],
+        "nombre_donnees_manquantes": len(result.get("donnees_manquantes", [])),
+        "questions_manquantes": result.get("questions_manquantes", []),
+    }
+
+
+_PROJECTIONS: dict[str, Callable[[dict], dict]] = {
+    "search_green_funds": _project_green_funds,
+    "get_action_plans": _project_action_plans,
+    "calculate_esg_score": _project_esg_score,
+}
+
+
+# ── Troncature générique ───────────────────────────────────
+
+
+def _shrink(value: Any, list_limit: int) -> Any:
+    """Tronque récursivement les listes et les textes longs."""
+    if isinstance(value, dict):
+        return {k: _shrink(v, list_limit) for k, v in value.items()}
+    if isinstance(value, list):
+        shrunk = [_shrink(v, list_limit) for v in value[:list_limit]]
+        if len(value) > list_limit:
+            shrunk.append(f"... {len(value) - list_limit} élément(s) de plus")
+        return shrunk
+    if isinstance(value, str) and len(value) > _MAX_STRING_CHARS:
+        return value[:_MAX_STRING_CHARS] + "…"
+    return value
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def compact_tool_result(skill_name: str, result: Any, owner: str | None = None) -> str:
+    """
+    Sérialise le résultat d'un skill pour le message `tool` du LLM.
+    Les résultats trop volumineux sont stockés et remplacés par une version abrégée.
+    """
+    content = _dumps(result)
+    max_chars = settings.SKILL_RESULT_MAX_CHARS
+    if len(content) <= max_chars or not isinstance(result, dict) or "error" in result:
+        return content
+    # get_skill_result borne déjà sa sortie : la recompacter masquerait le détail demandé
+    if skill_name == "get_skill_result":
+        return content
+
+    result_id = skill_result_store.put(result, owner)
+
+    projection = _PROJECTIONS.get(skill_name)
+    compact: Any = projection(result) if projection else result
+    list_limit = settings.SKILL_RESULT_LIST_LIMIT
+    while True:
+        shrunk = _shrink(compact, list_limit)
+        if len(_dumps(shrunk)) <= max_chars:
+            break
+        if list_limit <= 1:
+            # Même abrégé, trop volumineux : seules les clés sont exposées
+            shrunk = {"cles": list(result.keys())}
+            break
+        list_limit //= 2
+
+    payload = {
+        "result_id": result_id,
+        "abrege": True,
+        "note": (
+            "Résultat abrégé. Appelle get_skill_result avec ce result_id "
+            "(et éventuellement un chemin) pour consulter le détail."
+        ),
+        "resultat": shrunk,
+    }
+    return _dumps(payload)
+
+
+def persisted_tool_result(content: str) -> str:
+    """
+    Version d'un résultat compacté à sauvegarder dans l'historique : une version abrégée
+    perd son `result_id` (store en mémoire du processus) et invite à relancer le skill.
+    """
+    if not content.startswith('{"result_id"'):
+        return content
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return content
+    if not isinstance(payload, dict) or not payload.get("abrege"):
+        return content
+    return _dumps(
+        {
+            "abrege": True,
+            "note": (
+                "Résultat abrégé d'un échange précédent, détail non conservé : "
+                "relance le skill d'origine pour le consulter."
+            ),
+            "resultat": payload.get("resultat"),
+        }
+    )
@@ -0,0 +1,235 @@
+"""
+Sandbox d'exécution des skills custom (code Python saisi par l'admin).
+
+- Le code est compilé une seule fois par empreinte SHA-256 (cache LRU d'objets code).
+- Mode "inline" (défaut) : exécution sur la boucle asyncio, avec accès à context["db"].
+- Mode "process" : exécution dans un pool de processus séparés (spawn), avec limite
+  mémoire (RLIMIT_AS) et limite de temps ; le résultat revient en JSON. Un skill lent
+  ou gourmand en CPU ne bloque plus les streams SSE du worker. Pas d'accès BDD
+  dans ce mode (context["db"] vaut None).
+
+Un dépassement de temps devient une erreur de skill ({"error": ...}).
+
+En mode process, un skill bloqué au-delà de son SIGALRM (boucle en C) impose d'arrêter
+tout le pool, faute de savoir quel processus l'exécute : les autres skills en cours
+ou en file sur ce pool échouent alors en BrokenProcessPool et sont relancés une fois
+sur un nouveau pool (sans accès BDD ni effet de bord, la relance est sans risque).
+"""
+
+import asyncio
+import datetime as datetime_mod
+import hashlib
+import json as json_mod
+import logging
+import math as math_mod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import CodeType
+from typing import Any
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SAFE_BUILTINS = {
+    "len": len,
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "list": list,
+    "dict": dict,
+    "set": set,
+    "tuple": tuple,
+    "range": range,
+    "enumerate": enumerate,
+    "zip": zip,
+    "map": map,
+    "filter": filter,
+    "sorted": sorted,
+    "min": min,
+    "max": max,
+    "sum": sum,
+    "abs": abs,
+    "round": round,
+    "isinstance": isinstance,
+    "print": print,
+    "None": None,
+    "True": True,
+    "False": False,
+}
+
+_CODE_CACHE_SIZE = 256
+_code_cache: "OrderedDict[str, CodeType]" = OrderedDict()
+
+
+class SkillTimeoutError(Exception):
+    """Le skill custom a dépassé la limite de temps."""
+
+
+def code_digest(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def compile_skill_code(code: str) -> CodeType:
+    """Compile le code d'un skill, avec cache LRU par empreinte SHA-256."""
+    digest = code_digest(code)
+    compiled = _code_cache.get(digest)
+    if compiled is not None:
+        _code_cache.move_to_end(digest)
+        return compiled
+    compiled = compile(code, f"<skill:{digest[:12]}>", "exec")
+    _code_cache[digest] = compiled
+    if len(_code_cache) > _CODE_CACHE_SIZE:
+        _code_cache.popitem(last=False)
+    return compiled
+
+
+def _load_execute(code: str, params: dict, context: dict):
+    """Exécute le module du skill dans un espace restreint et retourne sa fonction execute."""
+    allowed_globals = {
+        "__builtins__": _SAFE_BUILTINS,
+        "params": params,
+        "context": context,
+        "json": json_mod,
+        "datetime": datetime_mod,
+        "math": math_mod,
+    }
+    local_vars: dict = {}
+    exec(compile_skill_code(code), allowed_globals, local_vars)
+    return local_vars.get("execute")
+
+
+async def execute_inline(code: str, params: dict, context: dict, timeout: float) -> Any:
+    """Exécute le skill sur la boucle courante (accès BDD possible)."""
+    execute = _load_execute(code, params, context)
+    if execute is None:
+        return {"error": "Le skill custom doit définir une fonction execute(params, context)"}
+    try:
+        return await asyncio.wait_for(execute(params, context), timeout=timeout)
+    except asyncio.TimeoutError:
+        raise SkillTimeoutError(f"Le skill custom a dépassé la limite de {timeout:g}s")
+
+
+# ── Mode process ─────────────────────────────────────────
+
+
+def _worker_init(memory_mb: int) -> None:
+    """Initialisation d'un processus du pool : limite mémoire."""
+    try:
+        import resource
+
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ImportError, ValueError, OSError):
+        logger.warning("Impossible d'appliquer la limite mémoire du sandbox")
+
+
+def _worker_run(code: str, params: dict, context: dict, timeout: float) -> str:
+    """Exécuté dans le processus du pool. Retourne le résultat sérialisé en JSON."""
+    import signal
+
+    def _on_alarm(_signum, _frame):
+        raise SkillTimeoutError(f"Le skill custom a dépassé la limite de {timeout:g}s")
+
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        execute = _load_execute(code, params, context)
+        if execute is None:
+            result: Any = {
+                "error": "Le skill custom doit définir une fonction execute(params, context)"
+            }
+        else:
+            result = asyncio.run(execute(params, context))
+    except SkillTimeoutError as e:
+        result = {"error": str(e)}
+    except MemoryError:
+        result = {"error": "Le skill custom a dépassé la limite mémoire"}
+    except Exception as e:
+        result = {"error": f"Erreur d'exécution du skill custom: {e}"}
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+    return json_mod.dumps(result, ensure_ascii=False, default=str)
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        import multiprocessing
+
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.SKILL_SANDBOX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_worker_init,
+            initargs=(settings.SKILL_SANDBOX_MEMORY_MB,),
+        )
+    return _pool
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Arrête brutalement le pool (processus bloqué hors de portée du SIGALRM), s'il est
+    encore le pool courant : un pool déjà remplacé n'est pas arrêté une seconde fois.
+    Les appels en attente échouent en BrokenProcessPool (pas d'annulation).
+    """
+    global _pool
+    if _pool is not pool:
+        return
+    _pool = None
+    for process in list((getattr(pool, "_processes", None) or {}).values()):
+        process.kill()
+    pool.shutdown(wait=False)
+
+
+def shutdown_sandbox_pool() -> None:
+    """Ferme le pool de processus (arrêt de l'application)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def execute_in_process(code: str, params: dict, context: dict, timeout: float) -> Any:
+    """Exécute le skill dans le pool de processus ; le résultat revient en JSON."""
+    # Seules les données sérialisables traversent la frontière de processus
+    entreprise_id = context.get("entreprise_id")
+    worker_context = {"db": None, "entreprise_id": str(entreprise_id) if entreprise_id else None}
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = _get_pool()
+        future = loop.run_in_executor(pool, _worker_run, code, params, worker_context, timeout)
+        try:
+            # Marge au-delà du SIGALRM du worker avant de considérer le processus bloqué
+            payload = await asyncio.wait_for(future, timeout=timeout + 2)
+        except asyncio.TimeoutError:
+            _kill_pool(pool)
+            raise SkillTimeoutError(f"Le skill custom a dépassé la limite de {timeout:g}s")
+        except BrokenProcessPool:
+            # Pool arrêté par le dépassement d'un autre skill, ou limite mémoire : une relance
+            _kill_pool(pool)
+            if attempt == 0:
+                logger.info("Pool du sandbox arrêté pendant l'exécution : skill custom relancé")
+                continue
+            return {"error": "Le processus du skill custom s'est arrêté (limite mémoire ?)"}
+        return json_mod.loads(payload)
+
+
+async def run_custom_skill(code: str, params: dict, context: dict) -> dict[str, Any]:
+    """Point d'entrée : exécute un skill custom selon SKILL_SANDBOX_MODE."""
+    timeout = settings.SKILL_SANDBOX_TIMEOUT
+    try:
+        if settings.SKILL_SANDBOX_MODE == "process":
+            return await execute_in_process(code, params, context, timeout)
+        return await execute_inline(code, params, context, timeout)
+    except SkillTimeoutError as e:
+        logger.warning("Skill custom interrompu : %s", e)
+        return {"error": str(e)}
+    except Exception as e:
+        logger.exception("Erreur d'exécution du skill custom")
+        return {"error": f"Erreur d'exécution du skill custom: {e}"}
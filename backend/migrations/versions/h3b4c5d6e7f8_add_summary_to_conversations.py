@@ -0,0 +1,27 @@
+"""add rolling summary to conversations
+
+Revision ID: h3b4c5d6e7f8
+Revises: g2a3b4c5d6e7
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'h3b4c5d6e7f8'
+down_revision: Union[str, None] = 'g2a3b4c5d6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summary_upto', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'summary_upto')
+    op.drop_column('conversations', 'summary')
@@ -0,0 +1,47 @@
+"""add is_read_only flag to skills
+
+Revision ID: i4c5d6e7f8a9
+Revises: h3b4c5d6e7f8
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'i4c5d6e7f8a9'
+down_revision: Union[str, None] = 'h3b4c5d6e7f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+READ_ONLY_SKILLS = (
+    'list_referentiels',
+    'search_green_funds',
+    'simulate_funding',
+    'get_sector_benchmark',
+    'search_knowledge_base',
+    'get_action_plans',
+    'get_skill_result',
+    'get_company_profile',
+    'get_intermediaires',
+    'guide_candidature',
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        'skills',
+        sa.Column('is_read_only', sa.Boolean(), server_default=sa.text('false'), nullable=False),
+    )
+    skills = sa.table('skills', sa.column('nom', sa.String), sa.column('is_read_only', sa.Boolean))
+    op.execute(
+        skills.update()
+        .where(skills.c.nom.in_(READ_ONLY_SKILLS))
+        .values(is_read_only=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('skills', 'is_read_only')
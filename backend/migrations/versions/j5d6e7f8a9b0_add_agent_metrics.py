@@ -0,0 +1,43 @@
+"""add agent_metrics table
+
+Revision ID: j5d6e7f8a9b0
+Revises: i4c5d6e7f8a9
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'j5d6e7f8a9b0'
+down_revision: Union[str, None] = 'i4c5d6e7f8a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'agent_metrics',
+        sa.Column('id', sa.Uuid(), nullable=False),
+        sa.Column('conversation_id', sa.Uuid(), nullable=True),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('name', sa.String(length=150), nullable=False),
+        sa.Column('turn', sa.Integer(), nullable=False),
+        sa.Column('duration_ms', sa.Float(), nullable=False),
+        sa.Column('ttft_ms', sa.Float(), nullable=True),
+        sa.Column('db_ms', sa.Float(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('cached_tokens', sa.Integer(), nullable=True),
+        sa.Column('is_error', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('idx_agent_metrics_kind_name', 'agent_metrics', ['kind', 'name', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_agent_metrics_kind_name', table_name='agent_metrics')
+    op.drop_table('agent_metrics')
@@ -0,0 +1,33 @@
+"""add embedding_cache table
+
+Revision ID: k6e7f8a9b0c1
+Revises: j5d6e7f8a9b0
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import pgvector.sqlalchemy  # noqa: F401
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'k6e7f8a9b0c1'
+down_revision: Union[str, None] = 'j5d6e7f8a9b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'embedding_cache',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=False),
+        sa.Column('embedding', pgvector.sqlalchemy.vector.VECTOR(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('content_hash'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('embedding_cache')
@@ -0,0 +1,40 @@
+"""add ingestion status to documents
+
+Revision ID: l7f8a9b0c1d2
+Revises: k6e7f8a9b0c1
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'l7f8a9b0c1d2'
+down_revision: Union[str, None] = 'k6e7f8a9b0c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Les documents existants ont été traités pendant l'upload : ready / 100 %
+    op.add_column(
+        'documents',
+        sa.Column('status', sa.String(length=20), server_default='ready', nullable=False),
+    )
+    op.add_column(
+        'documents',
+        sa.Column('progress', sa.Integer(), server_default=sa.text('100'), nullable=False),
+    )
+    op.add_column('documents', sa.Column('error', sa.Text(), nullable=True))
+    op.add_column('documents', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('idx_documents_status', 'documents', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_documents_status', table_name='documents')
+    op.drop_column('documents', 'updated_at')
+    op.drop_column('documents', 'error')
+    op.drop_column('documents', 'progress')
+    op.drop_column('documents', 'status')
@@ -15,7 +15,7 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.agent.engine import AgentEngine
-from app.agent.prompt_builder import build_system_prompt
+from app.agent.prompt_builder import build_static_prefix, build_system_message, build_system_prompt
 from app.config import settings
 from app.models.conversation import Conversation
 from app.models.entreprise import Entreprise
@@ -126,6 +126,30 @@ class TestPromptBuilder:
         prompt = build_system_prompt(None, [])
         assert "update_company_profile" in prompt
 
+    def test_system_message_cache_parts(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_PROMPT_CACHE", True)
+        skills = [{"name": "get_company_profile", "description": "Récupère le profil"}]
+        message = build_system_message({"nom": "TestCorp"}, skills)
+        parts = message["content"]
+        assert message["role"] == "system"
+        assert parts[0]["text"] == build_static_prefix()
+        assert parts[0]["cache_control"] == {"type": "ephemeral"}
+        assert "TestCorp" in parts[1]["text"]
+        assert "cache_control" not in parts[-1]
+        assert "".join(p["text"] for p in parts) == build_system_prompt({"nom": "TestCorp"}, skills)
+
+    def test_static_prefix_is_company_independent(self):
+        a = build_system_prompt({"nom": "A"}, [])
+        b = build_system_prompt({"nom": "B"}, [])
+        prefix = build_static_prefix()
+        assert a.startswith(prefix) and b.startswith(prefix)
+        assert "Entreprise actuelle" not in prefix
+
+    def test_system_message_without_cache(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_PROMPT_CACHE", False)
+        message = build_system_message(None, [])
+        assert message["content"] == build_system_prompt(None, [])
+
 
 # ---- Tests de l'AgentEngine (nécessitent LLM_API_KEY) ----
 
@@ -231,3 +255,1068 @@ class TestAgentEngineUnit:
         assert len(history) == 1
         assert history[0]["role"] == "user"
         assert history[0]["content"] == "Hello test"
+
+
+# ---- Tests de l'exécution parallèle des skills (sans BDD ni LLM) ----
+
+
+class _FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _SlowRegistry:
+    """Registry factice : chaque skill dort `delay` secondes puis renvoie son nom."""
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.sessions: list = []
+        self.read_only: set[str] = set()
+
+    def is_read_only(self, skill_name):
+        return skill_name in self.read_only
+
+    async def execute_skill(self, skill_name, params, context):
+        import asyncio
+
+        self.sessions.append(context["db"])
+        if skill_name == "boom":
+            raise RuntimeError("kaboom")
+        await asyncio.sleep(self.delay)
+        return {"skill": skill_name, "params": params}
+
+
+class TestParallelSkills:
+    @pytest.fixture(autouse=True)
+    def _patch_session(self, monkeypatch):
+        monkeypatch.setattr("app.agent.engine.async_session", _FakeSession)
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "AGENT_PARALLEL_SKILLS", True)
+        monkeypatch.setattr(settings, "AGENT_SKILL_CONCURRENCY", 4)
+
+    @pytest.mark.asyncio
+    async def test_results_keep_call_order_and_run_concurrently(self):
+        import time
+
+        registry = _SlowRegistry(delay=0.2)
+        registry.read_only = {"get_company_profile", "get_sector_benchmark", "search_green_funds"}
+        engine = AgentEngine(None, registry)
+        calls = [
+            ({"id": "1", "name": "get_company_profile"}, {}),
+            ({"id": "2", "name": "get_sector_benchmark"}, {"secteur": "agriculture"}),
+            ({"id": "3", "name": "search_green_funds"}, {}),
+        ]
+
+        start = time.perf_counter()
+        results = await engine._execute_tool_calls(calls, entreprise_id=None)
+        elapsed = time.perf_counter() - start
+
+        assert [r["skill"] for r in results] == [
+            "get_company_profile",
+            "get_sector_benchmark",
+            "search_green_funds",
+        ]
+        assert elapsed < 0.5
+        # Une session distincte par skill
+        assert len({id(s) for s in registry.sessions}) == 3
+
+    @pytest.mark.asyncio
+    async def test_exception_becomes_skill_error(self):
+        engine = AgentEngine(None, _SlowRegistry(delay=0))
+        calls = [
+            ({"id": "1", "name": "boom"}, {}),
+            ({"id": "2", "name": "list_referentiels"}, {}),
+        ]
+        results = await engine._execute_tool_calls(calls, entreprise_id=None)
+        assert "error" in results[0]
+        assert results[1]["skill"] == "list_referentiels"
+
+    @pytest.mark.asyncio
+    async def test_write_skill_is_a_barrier_within_the_turn(self):
+        import asyncio
+
+        class _ProfileRegistry(_SlowRegistry):
+            def __init__(self):
+                super().__init__()
+                self.read_only = {"get_company_profile", "list_referentiels"}
+                self.profile = {"effectifs": 10}
+                self.order: list[str] = []
+
+            async def execute_skill(self, skill_name, params, context):
+                self.order.append(f"start {skill_name}")
+                await asyncio.sleep(0.05)
+                if skill_name == "update_company_profile":
+                    self.profile = {**self.profile, **params["updates"]}
+                    result = {"status": "ok"}
+                else:
+                    result = dict(self.profile)
+                self.order.append(f"end {skill_name}")
+                return result
+
+        registry = _ProfileRegistry()
+        engine = AgentEngine(None, registry)
+        calls = [
+            ({"id": "1", "name": "list_referentiels"}, {}),
+            ({"id": "2", "name": "update_company_profile"}, {"updates": {"effectifs": 42}}),
+            ({"id": "3", "name": "get_company_profile"}, {}),
+        ]
+        # La lecture précédant l'écriture a été lancée pendant le stream
+        tasks = [engine._start_skill_task(*calls[0], None), None, None]
+        results = await engine._execute_tool_calls(calls, entreprise_id=None, tasks=tasks)
+
+        assert results[0]["effectifs"] == 10
+        assert results[1] == {"status": "ok"}
+        assert results[2]["effectifs"] == 42
+        assert registry.order == [
+            "start list_referentiels", "end list_referentiels",
+            "start update_company_profile", "end update_company_profile",
+            "start get_company_profile", "end get_company_profile",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_sequential_mode_uses_engine_session(self, monkeypatch):
+        monkeypatch.setattr(settings, "AGENT_PARALLEL_SKILLS", False)
+        registry = _SlowRegistry(delay=0)
+        sentinel = object()
+        engine = AgentEngine(sentinel, registry)
+        calls = [({"id": "1", "name": "a"}, {}), ({"id": "2", "name": "b"}, {})]
+        await engine._execute_tool_calls(calls, entreprise_id=None)
+        assert registry.sessions == [sentinel, sentinel]
+
+
+def _tool_chunk(index, id=None, name=None, arguments=None):
+    from types import SimpleNamespace
+
+    fn = SimpleNamespace(name=name, arguments=arguments)
+    tc = SimpleNamespace(index=index, id=id, function=fn)
+    delta = SimpleNamespace(content=None, tool_calls=[tc])
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+
+class _FakeStreamClient:
+    """Client LLM factice : rejoue une liste de chunks, en enregistrant l'ordre des événements."""
+
+    def __init__(self, chunks, log):
+        from types import SimpleNamespace
+
+        self._chunks = chunks
+        self._log = log
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        async def gen():
+            for chunk in self._chunks:
+                self._log.append("chunk")
+                yield chunk
+
+        return gen()
+
+
+class TestEarlyToolDispatch:
+    @pytest.fixture(autouse=True)
+    def _patch(self, monkeypatch):
+        monkeypatch.setattr("app.agent.engine.async_session", _FakeSession)
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "AGENT_PARALLEL_SKILLS", True)
+        monkeypatch.setattr(settings, "AGENT_EARLY_TOOL_DISPATCH", True)
+
+    @pytest.mark.asyncio
+    async def test_tool_call_emitted_before_stream_ends(self):
+        log: list[str] = []
+        chunks = [
+            _tool_chunk(0, id="c1", name="get_company_profile", arguments='{"a":'),
+            _tool_chunk(0, arguments=" 1}"),
+            _tool_chunk(1, id="c2", name="list_referentiels", arguments="{"),
+            _tool_chunk(1, arguments="}"),
+        ]
+        engine = AgentEngine(None, _SlowRegistry(delay=0))
+        engine.client = _FakeStreamClient(chunks, log)
+
+        async for event in engine._stream_llm(None, []):
+            if event["type"] == "tool_call":
+                log.append(event["tool_call"]["name"])
+
+        assert log == [
+            "chunk",
+            "chunk",
+            "get_company_profile",
+            "chunk",
+            "chunk",
+            "list_referentiels",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_new_index_flushes_previous_call(self):
+        # Arguments non JSON : l'appel est émis quand l'index suivant commence
+        chunks = [
+            _tool_chunk(0, id="c1", name="a", arguments="pas du json"),
+            _tool_chunk(1, id="c2", name="b", arguments="{}"),
+        ]
+        log: list[str] = []
+        engine = AgentEngine(None, _SlowRegistry(delay=0))
+        engine.client = _FakeStreamClient(chunks, log)
+
+        names = [
+            e["tool_call"]["name"]
+            async for e in engine._stream_llm(None, [])
+            if e["type"] == "tool_call"
+        ]
+        assert names == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_prestarted_tasks_are_awaited_in_call_order(self):
+        import asyncio
+
+        registry = _SlowRegistry(delay=0.05)
+        engine = AgentEngine(None, registry)
+        calls = [
+            ({"id": "1", "name": "first"}, {}),
+            ({"id": "2", "name": "second"}, {}),
+        ]
+        # Seul le premier skill a été lancé pendant le stream
+        tasks = [engine._start_skill_task(*calls[0], None), None]
+        await asyncio.sleep(0)
+        results = await engine._execute_tool_calls(calls, None, tasks)
+        assert [r["skill"] for r in results] == ["first", "second"]
+        assert len(registry.sessions) == 2
+
+
+class TestSkillMemo:
+    @pytest.fixture(autouse=True)
+    def _patch(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "AGENT_SKILL_MEMO", True)
+
+    @pytest.mark.asyncio
+    async def test_read_only_repeat_served_from_memo(self):
+        registry = _SlowRegistry(delay=0)
+        registry.read_only = {"get_company_profile"}
+        engine = AgentEngine(None, registry)
+
+        context = {"db": None, "entreprise_id": "e1"}
+        first = await engine._execute_skill("get_company_profile", {"a": 1, "b": 2}, context)
+        again = await engine._execute_skill("get_company_profile", {"b": 2, "a": 1}, context)
+        assert again is first
+        assert len(registry.sessions) == 1
+
+        # Arguments différents → nouvelle exécution
+        await engine._execute_skill("get_company_profile", {"a": 2}, context)
+        assert len(registry.sessions) == 2
+
+    @pytest.mark.asyncio
+    async def test_write_skill_invalidates_memo(self):
+        registry = _SlowRegistry(delay=0)
+        registry.read_only = {"get_company_profile"}
+        engine = AgentEngine(None, registry)
+
+        context = {"db": None, "entreprise_id": "e1"}
+        await engine._execute_skill("get_company_profile", {}, context)
+        await engine._execute_skill("update_company_profile", {"updates": {}}, context)
+        await engine._execute_skill("get_company_profile", {}, context)
+        assert len(registry.sessions) == 3
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_memoised(self):
+        registry = _SlowRegistry(delay=0)
+        registry.read_only = {"boom"}
+        engine = AgentEngine(None, registry)
+
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await engine._execute_skill("boom", {}, {"db": None})
+        assert len(registry.sessions) == 2
+
+
+class _ProgressRegistry(_SlowRegistry):
+    """Registry factice : le skill publie trois étapes d'avancement."""
+
+    async def execute_skill(self, skill_name, params, context):
+        import asyncio
+
+        self.sessions.append(context["db"])
+        for step in range(3):
+            await asyncio.sleep(self.delay)
+            context["progress"](step, 3, f"Étape {step}")
+        return {"status": "ok", "download_url": "/api/reports/download/x.pdf"}
+
+
+class TestBackgroundJobs:
+    @pytest.fixture(autouse=True)
+    def _patch(self, monkeypatch):
+        monkeypatch.setattr("app.skills.jobs.async_session", _FakeSession)
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "SKILL_BACKGROUND_JOBS", True)
+
+    @pytest.mark.asyncio
+    async def test_long_skill_returns_handle_then_streams_progress(self):
+        from app.skills.jobs import skill_jobs
+
+        engine = AgentEngine(None, _ProgressRegistry(delay=0.01))
+        engine._conversation_id = "c1"
+        handle = await engine._execute_skill(
+            "assemble_pdf", {}, {"db": None, "entreprise_id": "e1", "tool_call_id": "call_1"}
+        )
+        assert handle["status"] == "running"
+        job, tool_call_id = engine._jobs[0]
+        assert job.id == handle["job_id"] and tool_call_id == "call_1"
+
+        events = [e async for e in skill_jobs.follow([job], timeout=5)]
+        assert [e["type"] for e in events] == ["skill_progress"] * 3 + ["skill_result"]
+        assert events[1]["current"] == 1 and events[1]["total"] == 3
+        assert events[-1]["result"]["status"] == "ok"
+        assert skill_jobs.get(job.id).to_dict()["status"] == "done"
+
+    @pytest.mark.asyncio
+    async def test_follow_stops_at_timeout_and_replays_finished_jobs(self):
+        import asyncio
+
+        from app.skills.jobs import skill_jobs
+
+        registry = _ProgressRegistry(delay=0.2)
+        job = skill_jobs.submit(registry, "generate_document", {}, {"conversation_id": "c1"})
+        events = [e async for e in skill_jobs.follow([job], timeout=0.05)]
+        assert events == []
+        assert not job.done
+
+        await asyncio.wait_for(job._task, timeout=5)
+        events = [e async for e in skill_jobs.follow([job], timeout=0.05)]
+        assert [e["type"] for e in events] == ["skill_result"]
+
+    @pytest.mark.asyncio
+    async def test_link_after_finish_keeps_store_task_referenced(self, monkeypatch):
+        import asyncio
+
+        from app.skills.jobs import SkillJobManager
+
+        manager = SkillJobManager()
+        job = manager.submit(_ProgressRegistry(delay=0), "generate_document", {}, {})
+        await asyncio.wait_for(job._task, timeout=5)
+        stored = asyncio.Event()
+
+        async def store_result(job):
+            await asyncio.sleep(0)
+            stored.set()
+
+        monkeypatch.setattr(manager, "_store_result", store_result)
+        manager.link_message(job.id, "m1", "call_1")
+        assert len(manager._store_tasks) == 1
+        await asyncio.wait_for(stored.wait(), timeout=5)
+        await asyncio.sleep(0)
+        assert not manager._store_tasks
+
+    @pytest.mark.asyncio
+    async def test_disabled_runs_inline(self, monkeypatch):
+        monkeypatch.setattr(settings, "SKILL_BACKGROUND_JOBS", False)
+        monkeypatch.setattr(settings, "AGENT_SKILL_MEMO", False)
+        engine = AgentEngine(None, _SlowRegistry(delay=0))
+        result = await engine._execute_skill("assemble_pdf", {}, {"db": None})
+        assert result["skill"] == "assemble_pdf"
+        assert engine._jobs == []
+
+
+async def _scripted_events(count: int, delay: float = 0.0, fail: bool = False):
+    import asyncio
+
+    for i in range(count):
+        await asyncio.sleep(delay)
+        yield {"type": "text", "content": f"t{i}"}
+    if fail:
+        raise RuntimeError("LLM indisponible")
+    yield {"type": "done"}
+
+
+class TestResumableRuns:
+    @pytest.mark.asyncio
+    async def test_replay_after_last_event_id_then_follow_live(self):
+        from app.agent.runs import AgentRunManager
+
+        manager = AgentRunManager()
+        run = manager.start("c1", _scripted_events(4, delay=0.02))
+
+        # Premier lecteur : coupe après deux événements
+        first = []
+        async for seq, event in run.follow():
+            first.append(seq)
+            if len(first) == 2:
+                break
+
+        # Reconnexion : reprise après le dernier id reçu, jusqu'à la fin du run
+        resumed = [(seq, e) async for seq, e in run.follow(first[-1])]
+        assert [seq for seq, _ in resumed] == [3, 4, 5]
+        assert resumed[-1][1]["type"] == "done"
+        assert manager.get("c1") is run and run.done
+
+        # Rejeu complet d'un run terminé
+        assert len([e async for e in run.follow()]) == 5
+
+    @pytest.mark.asyncio
+    async def test_bounded_buffer_and_errors(self, monkeypatch):
+        from app.agent.runs import AgentRunManager
+
+        monkeypatch.setattr(settings, "AGENT_STREAM_BUFFER_SIZE", 3)
+        run = AgentRunManager().start("c1", _scripted_events(5, fail=True))
+        await run.task
+
+        assert run.last_seq == 6
+        assert run.events[-1][1] == {"type": "error", "content": "LLM indisponible"}
+        assert run.can_replay_from(3) and run.can_replay_from(6)
+        assert not run.can_replay_from(2)
+        assert not run.can_replay_from(7)
+
+    @pytest.mark.asyncio
+    async def test_new_message_cancels_active_run_first(self):
+        import asyncio
+
+        from app.agent.runs import AgentRunManager
+
+        order: list[str] = []
+
+        async def first_events():
+            try:
+                yield {"type": "text", "content": "début"}
+                await asyncio.sleep(10)
+            finally:
+                await asyncio.sleep(0.01)  # sauvegarde de la réponse partielle
+                order.append("first saved")
+
+        async def second_events():
+            order.append("second started")
+            yield {"type": "done"}
+
+        manager = AgentRunManager()
+        first = manager.start("c1", first_events())
+        await asyncio.sleep(0.01)
+        second = manager.start("c1", second_events())
+        await asyncio.wait_for(second.task, timeout=5)
+
+        assert first.task.cancelled()
+        assert first.events[-1][1]["content"] == "Réponse interrompue"
+        assert order == ["first saved", "second started"]
+        assert manager.get("c1") is second
+
+    @pytest.mark.asyncio
+    async def test_disconnect_cancels_run_and_saves_partial_answer(self, monkeypatch):
+        import asyncio
+        from types import SimpleNamespace
+
+        from app.agent.engine import PARTIAL_MARKER
+        from app.agent.runs import AgentRunManager
+
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "AGENT_DISCONNECT_GRACE", 0.0)
+
+        class _SlowStream:
+            closed = False
+
+            def __aiter__(self):
+                return self._gen()
+
+            async def _gen(self):
+                for word in ["Votre ", "score ", "ESG ", "est ", "de ", "62."]:
+                    await asyncio.sleep(0.02)
+                    delta = SimpleNamespace(content=word, tool_calls=None)
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+            async def close(self):
+                _SlowStream.closed = True
+
+        async def create(**kwargs):
+            return _SlowStream()
+
+        class _Registry(_SlowRegistry):
+            async def get_active_tools(self):
+                return []
+
+            def get_openai_tools(self, tools):
+                return []
+
+        class _FakeDB:
+            async def rollback(self):
+                pass
+
+        saved: list[tuple[str, str]] = []
+
+        async def save_message(conversation_id, role, content, tool_calls_json=None):
+            saved.append((role, content))
+            return SimpleNamespace(id="m1")
+
+        async def load_history(conversation_id):
+            return []
+
+        engine = AgentEngine(_FakeDB(), _Registry())
+        engine.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(engine, "_save_message", save_message)
+        monkeypatch.setattr(engine, "_load_history", load_history)
+
+        run = AgentRunManager().start("c1", engine.run("c1", "Mon score ?"))
+        async for _, event in run.follow():
+            if event["type"] == "text":
+                break  # le client ferme l'onglet après le premier fragment
+
+        with pytest.raises(asyncio.CancelledError):
+            await run.task
+        assert _SlowStream.closed
+        assert saved[0] == ("user", "Mon score ?")
+        role, content = saved[-1]
+        assert role == "assistant" and content.endswith(PARTIAL_MARKER)
+        assert content.startswith("Votre ")
+        assert run.events[-1][1]["type"] == "error"
+
+    @pytest.mark.asyncio
+    async def test_cancel_while_following_jobs_keeps_single_answer(self, monkeypatch):
+        import asyncio
+        from types import SimpleNamespace
+
+        monkeypatch.setattr("app.agent.engine.async_session", _FakeSession)
+        monkeypatch.setattr("app.skills.jobs.async_session", _FakeSession)
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "SKILL_BACKGROUND_JOBS", True)
+
+        text_delta = SimpleNamespace(content="Rapport en cours.", tool_calls=None)
+        turns = [
+            [_tool_chunk(0, id="c1", name="assemble_pdf", arguments="{}")],
+            [SimpleNamespace(choices=[SimpleNamespace(delta=text_delta)], usage=None)],
+        ]
+
+        async def create(**kwargs):
+            chunks = turns.pop(0)
+
+            async def gen():
+                for chunk in chunks:
+                    yield chunk
+
+            return gen()
+
+        class _Registry(_ProgressRegistry):
+            async def get_active_tools(self):
+                return []
+
+            def get_openai_tools(self, tools):
+                return []
+
+        class _FakeDB:
+            async def rollback(self):
+                pass
+
+        saved: list[tuple[str, str]] = []
+
+        async def save_message(conversation_id, role, content, tool_calls_json=None):
+            saved.append((role, content))
+            return SimpleNamespace(id=f"m{len(saved)}")
+
+        async def load_history(conversation_id):
+            return []
+
+        # Job long : le run reste dans le suivi des jobs (étape 8)
+        engine = AgentEngine(_FakeDB(), _Registry(delay=1.0))
+        engine.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(engine, "_save_message", save_message)
+        monkeypatch.setattr(engine, "_load_history", load_history)
+
+        async def consume():
+            async for _ in engine.run("c1", "Génère le rapport PDF"):
+                pass
+
+        task = asyncio.create_task(consume())
+        for _ in range(100):
+            if ("assistant", "Rapport en cours.") in saved:
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        for job, _ in engine._jobs:
+            job._task.cancel()
+
+        assert [role for role, _ in saved] == ["user", "assistant"]
+        assert saved[-1] == ("assistant", "Rapport en cours.")
+
+    def test_parse_last_event_id(self):
+        from app.agent.runs import parse_last_event_id
+
+        assert parse_last_event_id("ab12:42") == ("ab12", 42)
+        assert parse_last_event_id("ab12:x") is None
+        assert parse_last_event_id(None) is None
+
+
+class TestAgentMetrics:
+    def test_measure_db_counts_queries_in_context(self):
+        from sqlalchemy import create_engine, text
+
+        from app.agent.metrics import install_db_timer, measure_db
+
+        sync_engine = create_engine("sqlite://")
+        install_db_timer(sync_engine)
+        install_db_timer(sync_engine)  # idempotent
+
+        with sync_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))  # hors mesure
+            with measure_db() as timer:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+        assert timer.queries == 2
+        assert timer.ms >= 0
+
+    @pytest.mark.asyncio
+    async def test_skill_timings_recorded(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "AGENT_SKILL_MEMO", False)
+        engine = AgentEngine(None, _SlowRegistry(delay=0.05))
+        engine._turn = 2
+
+        await engine._execute_skill("get_company_profile", {}, {"db": None})
+        with pytest.raises(RuntimeError):
+            await engine._execute_skill("boom", {}, {"db": None})
+        engine._record_turn_stats("c1", 2, {"ttft_ms": 120.0, "stream_ms": 900.0, "prompt_tokens": 10})
+
+        skills = [r for r in engine.metrics.rows if r["kind"] == "skill"]
+        assert [(r["name"], r["turn"], r["is_error"]) for r in skills] == [
+            ("get_company_profile", 2, False),
+            ("boom", 2, True),
+        ]
+        assert skills[0]["duration_ms"] >= 40
+        llm = [r for r in engine.metrics.rows if r["kind"] == "llm_turn"]
+        assert llm[0]["ttft_ms"] == 120.0 and llm[0]["duration_ms"] == 900.0
+
+    @pytest.mark.asyncio
+    async def test_flush_disabled_keeps_no_task(self, monkeypatch):
+        from app.agent import metrics
+
+        monkeypatch.setattr(settings, "AGENT_METRICS_ENABLED", False)
+        run = metrics.RunMetrics("c1", "model")
+        run.skill("x", 0, 1.0, None, False)
+        run.flush()
+        assert not metrics._persist_tasks
+
+
+# ---- Tests de la fenêtre d'historique (sans BDD) ----
+
+
+class TestHistoryWindow:
+    @staticmethod
+    def _msgs(*contents):
+        from types import SimpleNamespace
+
+        return [SimpleNamespace(role="user", content=c) for c in contents]
+
+    def test_keeps_newest_within_budget(self):
+        from app.agent.history import estimate_tokens, select_window
+
+        newest_first = self._msgs("a" * 400, "b" * 400, "c" * 4000)
+        budget = estimate_tokens("a" * 400) * 2
+        window = select_window(newest_first, budget)
+        assert [m.content[0] for m in window] == ["a", "b"]
+
+    def test_always_keeps_latest_message(self):
+        from app.agent.history import select_window
+
+        window = select_window(self._msgs("x" * 10_000, "y"), budget=10)
+        assert len(window) == 1
+        assert window[0].content.startswith("x")
+
+    def test_stops_at_first_overflow(self):
+        from app.agent.history import select_window
+
+        # Le message trop gros coupe la fenêtre même si des plus anciens tiendraient
+        window = select_window(self._msgs("a", "b" * 4000, "c"), budget=50)
+        assert [m.content[0] for m in window] == ["a"]
+
+    def test_tool_trace_replayed_in_openai_format(self):
+        from types import SimpleNamespace
+
+        from app.agent.history import to_chat_messages
+
+        msg = SimpleNamespace(
+            role="assistant",
+            content="Voici votre profil.",
+            tool_calls_json=[
+                {"name": "get_company_profile", "input": {"entreprise_id": "e1"},
+                 "id": "call_1", "turn": 0, "result": '{"nom": "Acme"}'},
+                {"name": "search_green_funds", "input": {}, "id": "call_2", "turn": 1,
+                 "result": '{"nombre_fonds": 0}'},
+            ],
+        )
+        chat = to_chat_messages(msg)
+        assert [m["role"] for m in chat] == ["assistant", "tool", "assistant", "tool", "assistant"]
+        assert chat[0]["tool_calls"][0]["id"] == "call_1"
+        assert chat[0]["tool_calls"][0]["function"]["arguments"] == '{"entreprise_id": "e1"}'
+        assert chat[1] == {"role": "tool", "tool_call_id": "call_1", "content": '{"nom": "Acme"}'}
+        assert chat[-1] == {"role": "assistant", "content": "Voici votre profil."}
+
+    def test_legacy_tool_log_not_replayed(self):
+        from types import SimpleNamespace
+
+        from app.agent.history import message_tokens, to_chat_messages
+
+        msg = SimpleNamespace(
+            role="assistant",
+            content="ok",
+            tool_calls_json=[{"name": "get_company_profile", "input": {}}],
+        )
+        assert to_chat_messages(msg) == [{"role": "assistant", "content": "ok"}]
+        assert message_tokens(msg) == message_tokens(SimpleNamespace(role="user", content="ok", tool_calls_json=None))
+
+    def test_window_counts_tool_results(self):
+        from types import SimpleNamespace
+
+        from app.agent.history import select_window
+
+        heavy = SimpleNamespace(
+            role="assistant",
+            content="a",
+            tool_calls_json=[{"name": "x", "input": {}, "id": "c", "turn": 0, "result": "r" * 4000}],
+        )
+        light = SimpleNamespace(role="user", content="b", tool_calls_json=None)
+        window = select_window([light, heavy], budget=100)
+        assert window == [light]
+
+    @pytest.mark.asyncio
+    async def test_load_keeps_overflow_not_yet_summarized(self, monkeypatch):
+        from datetime import datetime, timedelta, timezone
+        from types import SimpleNamespace
+
+        from app.agent import history
+
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        # m0..m5 du plus ancien au plus récent ; m0-m1 déjà résumés
+        chronological = [
+            SimpleNamespace(
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"m{i} " + "x" * 400,
+                tool_calls_json=None,
+                created_at=start + timedelta(minutes=i),
+            )
+            for i in range(6)
+        ]
+        conv = SimpleNamespace(summary="Résumé m0-m1", summary_upto=chronological[1].created_at)
+
+        class _DB:
+            async def get(self, model, key):
+                return conv
+
+        async def fetch_recent(db, conversation_id):
+            return list(reversed(chronological))
+
+        monkeypatch.setattr(history, "_fetch_recent", fetch_recent)
+        monkeypatch.setattr(settings, "AGENT_SUMMARY_MIN_MESSAGES", 6)
+        budget = history.estimate_tokens(conv.summary) + history.message_tokens(chronological[0]) * 2
+        monkeypatch.setattr(settings, "AGENT_HISTORY_TOKEN_BUDGET", budget)
+
+        messages = await history.HistoryManager(_DB()).load("00000000-0000-0000-0000-000000000001")
+
+        assert messages[0]["role"] == "system" and "Résumé m0-m1" in messages[0]["content"]
+        # m2-m3 : hors fenêtre, trop peu nombreux pour être résumés, mais conservés
+        assert [m["content"][:2] for m in messages[1:]] == ["m2", "m3", "m4", "m5"]
+
+    @pytest.mark.asyncio
+    async def test_pending_overflow_is_capped_when_summary_fails(self, monkeypatch):
+        from datetime import datetime, timedelta, timezone
+        from types import SimpleNamespace
+
+        from app.agent import history
+
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        chronological = [
+            SimpleNamespace(
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"m{i} " + "x" * 400,
+                tool_calls_json=None,
+                created_at=start + timedelta(minutes=i),
+            )
+            for i in range(200)
+        ]
+        conv = SimpleNamespace(summary=None, summary_upto=None)
+
+        class _DB:
+            async def get(self, model, key):
+                return conv
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+        async def fetch_recent(db, conversation_id):
+            return list(reversed(chronological))
+
+        async def failing_summarize(previous, messages):
+            raise RuntimeError("LLM indisponible")
+
+        monkeypatch.setattr(history, "_fetch_recent", fetch_recent)
+        monkeypatch.setattr(history, "_summarize", failing_summarize)
+        monkeypatch.setattr(history, "async_session", _DB)
+        monkeypatch.setattr(settings, "AGENT_HISTORY_TOKEN_BUDGET", 2000)
+        monkeypatch.setattr(settings, "AGENT_HISTORY_PENDING_TOKEN_BUDGET", 1000)
+
+        conversation_id = "00000000-0000-0000-0000-000000000001"
+        await history._refresh_summary_task(conversation_id)  # échec journalisé
+        assert conv.summary is None
+
+        messages = await history.HistoryManager(_DB()).load(conversation_id)
+
+        total = sum(history.estimate_tokens(m["content"]) for m in messages)
+        assert total <= 2000 + 1000
+        assert len(messages) < 200
+        # Les plus anciens messages en attente sont abandonnés, les plus récents conservés
+        assert messages[-1]["content"].startswith("m199")
+        numbers = [int(m["content"].split()[0][1:]) for m in messages]
+        assert numbers == list(range(200 - len(messages), 200))
+
+
+def _tool(name, category, description=""):
+    return {"name": name, "description": description, "input_schema": {}, "category": category}
+
+
+ROUTING_TOOLS = [
+    _tool("get_company_profile", "utils", "Profil de l'entreprise"),
+    _tool("calculate_carbon", "carbon", "Calcule l'empreinte carbone"),
+    _tool("calculate_esg_score", "esg", "Score ESG"),
+    _tool("search_green_funds", "finance", "Recherche de fonds verts"),
+    _tool("generate_pdf_report", "reporting", "Génère un rapport PDF"),
+    _tool("get_sector_benchmark", "utils", "Moyennes sectorielles et comparaison avec les pairs"),
+]
+
+
+class TestToolRouting:
+    def test_small_talk_keeps_only_core(self):
+        from app.agent.tool_router import select_tools
+
+        names = [t["name"] for t in select_tools(ROUTING_TOOLS, "Bonjour !")]
+        assert names == ["get_company_profile"]
+
+    def test_category_keyword_selects_category(self):
+        from app.agent.tool_router import select_tools
+
+        names = [t["name"] for t in select_tools(ROUTING_TOOLS, "Quelles émissions de CO2 pour mon diesel ?")]
+        assert "calculate_carbon" in names
+        assert "search_green_funds" not in names
+
+    def test_description_overlap_selects_tool(self):
+        from app.agent.tool_router import select_tools
+
+        names = [t["name"] for t in select_tools(ROUTING_TOOLS, "Donne les moyennes sectorielles des pairs")]
+        assert "get_sector_benchmark" in names
+
+    def test_recent_history_keeps_used_tools_and_context(self):
+        from app.agent.tool_router import select_tools
+
+        history = [
+            {"role": "user", "content": "Quels fonds pour moi ?"},
+            {"role": "assistant", "content": None, "tool_calls": [
+                {"id": "c1", "type": "function",
+                 "function": {"name": "calculate_esg_score", "arguments": "{}"}},
+            ]},
+            {"role": "tool", "tool_call_id": "c1", "content": "{}"},
+            {"role": "assistant", "content": "Voulez-vous un rapport PDF ?"},
+        ]
+        names = [t["name"] for t in select_tools(ROUTING_TOOLS, "Oui, vas-y", history)]
+        assert "calculate_esg_score" in names
+        assert "generate_pdf_report" in names
+
+    def test_disabled_routing_returns_all_tools(self, monkeypatch):
+        from app.agent.tool_router import select_tools
+
+        monkeypatch.setattr(settings, "AGENT_TOOL_ROUTING", False)
+        assert select_tools(ROUTING_TOOLS, "Bonjour") == ROUTING_TOOLS
+
+    def test_tool_list_only_grows_within_conversation(self):
+        from app.agent.tool_router import select_tools
+
+        conversation_id = str(uuid.uuid4())
+
+        def turn(message):
+            return select_tools(ROUTING_TOOLS, message, conversation_id=conversation_id)
+
+        first = turn("Quelles émissions de CO2 pour mon diesel ?")
+        # Tour sans rapport : la liste (préfixe du cache provider) reste identique
+        assert turn("Merci beaucoup") == first
+        names = [t["name"] for t in turn("Donne les moyennes sectorielles des pairs")]
+        assert {t["name"] for t in first} < set(names)
+        assert names == [t["name"] for t in ROUTING_TOOLS if t["name"] in names]
+        # Autre conversation : sélection propre au message
+        other = select_tools(ROUTING_TOOLS, "Merci beaucoup", conversation_id=str(uuid.uuid4()))
+        assert len(other) < len(first)
+
+    def test_unstable_mode_recomputes_each_turn(self, monkeypatch):
+        from app.agent.tool_router import select_tools
+
+        monkeypatch.setattr(settings, "AGENT_TOOL_STABLE", False)
+        conversation_id = str(uuid.uuid4())
+
+        def turn(message):
+            return select_tools(ROUTING_TOOLS, message, conversation_id=conversation_id)
+
+        first = turn("Quelles émissions de CO2 pour mon diesel ?")
+        assert len(turn("Merci beaucoup")) < len(first)
+
+async def _word_embedding(text):
+    """Embedding factice : sac de mots sur un petit vocabulaire."""
+    vocab = ["taxonomie", "bceao", "verte", "gcf", "postuler", "comment"]
+    words = text.split()
+    return [float(words.count(w)) for w in vocab] + [0.1]
+
+
+class TestResponseCache:
+    @pytest.fixture(autouse=True)
+    def _settings(self, monkeypatch):
+        monkeypatch.setattr(settings, "AGENT_RESPONSE_CACHE", True)
+        monkeypatch.setattr(settings, "AGENT_RESPONSE_CACHE_THRESHOLD", 0.9)
+        monkeypatch.setattr(settings, "AGENT_RESPONSE_CACHE_SIZE", 2)
+
+    @pytest.mark.asyncio
+    async def test_similar_question_hits(self):
+        from app.agent.response_cache import ResponseCache
+
+        cache = ResponseCache(embed=_word_embedding)
+        miss = await cache.lookup("Qu'est-ce que la taxonomie verte BCEAO ?")
+        assert miss.entry is None
+        cache.store(miss, "La taxonomie verte de la BCEAO…")
+
+        exact = await cache.lookup("qu'est ce que la TAXONOMIE verte bceao")
+        assert exact.entry is not None and exact.similarity == 1.0
+        similar = await cache.lookup("C'est quoi la taxonomie verte BCEAO ?")
+        assert similar.entry is not None and similar.entry.answer.startswith("La taxonomie")
+        other = await cache.lookup("Comment postuler au GCF ?")
+        assert other.entry is None
+        assert cache.stats()["hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_and_ttl(self, monkeypatch):
+        from app.agent.response_cache import ResponseCache
+
+        cache = ResponseCache(embed=_word_embedding)
+        for question in ["taxonomie bceao verte", "comment postuler gcf", "quoi gcf verte bceao"]:
+            cache.store(await cache.lookup(question), question)
+        assert cache.stats()["size"] == 2
+        assert (await cache.lookup("taxonomie bceao verte")).entry is None
+
+        monkeypatch.setattr(settings, "AGENT_RESPONSE_CACHE_TTL", -1.0)
+        assert (await cache.lookup("comment postuler gcf")).entry is None
+        assert cache.stats()["size"] == 0
+
+    def test_eligibility_rules(self):
+        from app.agent.response_cache import ResponseCache
+
+        assert ResponseCache.eligible("Comment postuler au fonds GCF ?")
+        assert not ResponseCache.eligible("Quels fonds pour mon entreprise ?")
+        assert not ResponseCache.eligible("Merci")
+
+        generic = [{"name": "search_knowledge_base", "input": {"query": "taxonomie", "source": "fonds"}}]
+        specific = [{"name": "search_knowledge_base", "input": {"entreprise_id": "e1"}}]
+        # source par défaut ("all") : documents privés de l'entreprise du contexte
+        own_documents = [{"name": "search_knowledge_base", "input": {"query": "taxonomie"}}]
+        assert ResponseCache.cacheable_run(generic, "La taxonomie…", {"nom": "Acme"})
+        assert not ResponseCache.cacheable_run(specific, "La taxonomie…", {"nom": "Acme"})
+        assert not ResponseCache.cacheable_run(own_documents, "La taxonomie…", {"nom": "Acme"})
+        assert not ResponseCache.cacheable_run([{"name": "calculate_carbon", "input": {}}], "x", None)
+        assert not ResponseCache.cacheable_run([], "Chez Acme, la taxonomie…", {"nom": "Acme"})
+
+    @pytest.mark.asyncio
+    async def test_engine_serves_cached_answer_without_llm(self, monkeypatch):
+        from types import SimpleNamespace
+
+        from app.agent.response_cache import ResponseCache
+
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "AGENT_METRICS_ENABLED", False)
+        cache = ResponseCache(embed=_word_embedding)
+        monkeypatch.setattr("app.agent.engine.response_cache", cache)
+        llm_calls = []
+
+        async def create(**kwargs):
+            llm_calls.append(kwargs)
+
+            async def gen():
+                delta = SimpleNamespace(content="La taxonomie verte classe les activités.", tool_calls=None)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+            return gen()
+
+        class _Registry(_SlowRegistry):
+            async def get_active_tools(self):
+                return []
+
+            def get_openai_tools(self, tools):
+                return []
+
+        saved: list[tuple[str, str]] = []
+
+        async def save_message(conversation_id, role, content, tool_calls_json=None):
+            saved.append((role, content))
+            return SimpleNamespace(id="m1")
+
+        async def load_history(conversation_id):
+            return []
+
+        async def run(message):
+            engine = AgentEngine(None, _Registry())
+            engine.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+            monkeypatch.setattr(engine, "_save_message", save_message)
+            monkeypatch.setattr(engine, "_load_history", load_history)
+            monkeypatch.setattr(engine.history, "schedule_refresh", lambda conversation_id: None)
+            return [e async for e in engine.run("c1", message, {"id": "e1", "nom": "Acme"})]
+
+        await run("Qu'est-ce que la taxonomie verte BCEAO ?")
+        events = await run("C'est quoi la taxonomie verte BCEAO ?")
+
+        assert len(llm_calls) == 1
+        assert [e["type"] for e in events] == ["text", "done"]
+        assert events[0]["content"] == "La taxonomie verte classe les activités."
+        assert saved[-2:] == [
+            ("user", "C'est quoi la taxonomie verte BCEAO ?"),
+            ("assistant", "La taxonomie verte classe les activités."),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_engine_skips_cache_for_follow_ups(self, monkeypatch):
+        from types import SimpleNamespace
+
+        from app.agent.response_cache import ResponseCache
+
+        monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+        monkeypatch.setattr(settings, "AGENT_METRICS_ENABLED", False)
+        cache = ResponseCache(embed=_word_embedding)
+        cache.store(await cache.lookup("Et pour le deuxième fonds ?"), "Réponse d'une autre conversation")
+        monkeypatch.setattr("app.agent.engine.response_cache", cache)
+        llm_calls = []
+
+        async def create(**kwargs):
+            llm_calls.append(kwargs)
+
+            async def gen():
+                delta = SimpleNamespace(content="Le deuxième fonds est le FEM.", tool_calls=None)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+            return gen()
+
+        class _Registry(_SlowRegistry):
+            async def get_active_tools(self):
+                return []
+
+            def get_openai_tools(self, tools):
+                return []
+
+        async def save_message(conversation_id, role, content, tool_calls_json=None):
+            return SimpleNamespace(id="m1")
+
+        async def load_history(conversation_id):
+            return [
+                {"role": "user", "content": "Quels fonds financent le solaire ?"},
+                {"role": "assistant", "content": "Le GCF et le FEM."},
+            ]
+
+        engine = AgentEngine(None, _Registry())
+        engine.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(engine, "_save_message", save_message)
+        monkeypatch.setattr(engine, "_load_history", load_history)
+        monkeypatch.setattr(engine.history, "schedule_refresh", lambda conversation_id: None)
+        events = [e async for e in engine.run("c2", "Et pour le deuxième fonds ?", {"id": "e1"})]
+
+        assert len(llm_calls) == 1
+        assert events[0]["content"] == "Le deuxième fonds est le FEM."
+        assert cache.stats()["hits"] == 0 and cache.stats()["stores"] == 1
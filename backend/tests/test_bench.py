@@ -0,0 +1,226 @@
+"""
+Tests des outils de benchmark (app/bench) : harnais d'enregistrement / rejeu,
+pré-routage des skills, providers d'embeddings.
+Sans BDD : les accès BDD du rejeu sont simulés.
+"""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.bench import replay
+from app.bench.replay import build_exchanges, build_report, script_for_exchange
+from app.config import settings
+from app.core import llm
+
+
+def _msg(role, content, seconds, tool_calls_json=None):
+    at = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=seconds)
+    return SimpleNamespace(role=role, content=content, created_at=at, tool_calls_json=tool_calls_json)
+
+
+def skill(name, turn, ms):
+    return {"kind": "skill", "name": name, "turn": turn, "duration_ms": ms, "db_ms": 1.0, "is_error": False}
+
+
+class TestReplay:
+    def test_build_exchanges_pairs_user_and_assistant(self):
+        messages = [
+            _msg("user", "Mon profil ?", 0),
+            _msg("assistant", "Voici.", 2.5, [
+                {"name": "get_company_profile", "input": {"entreprise_id": "old"}, "id": "c1",
+                 "turn": 0, "result": "{}"},
+            ]),
+            _msg("user", "Merci", 10),
+            _msg("assistant", "De rien.", 11),
+            _msg("user", "Sans réponse", 20),
+        ]
+        exchanges = build_exchanges(messages)
+        assert len(exchanges) == 2
+        assert exchanges[0]["recorded_ms"] == 2500.0
+        assert exchanges[0]["tool_calls"] == [
+            {"name": "get_company_profile", "input": {"entreprise_id": "old"}, "turn": 0}
+        ]
+        assert exchanges[1]["tool_calls"] == []
+
+    def test_script_groups_turns_and_remaps_entreprise(self):
+        exchange = {
+            "user": "x",
+            "assistant": "Réponse finale",
+            "tool_calls": [
+                {"name": "get_company_profile", "input": {"entreprise_id": "old"}, "turn": 0},
+                {"name": "list_referentiels", "input": {}, "turn": 0},
+                {"name": "calculate_esg_score", "input": {"entreprise_id": "old", "data": {}}, "turn": 1},
+            ],
+        }
+        script = script_for_exchange(exchange, "old", "new")
+        turns = script["turns"]
+        assert [len(t.get("tool_calls", [])) for t in turns] == [2, 1, 0]
+        assert turns[0]["tool_calls"][0]["arguments"] == {"entreprise_id": "new"}
+        assert turns[1]["tool_calls"][0]["arguments"]["entreprise_id"] == "new"
+        assert turns[-1] == {"text": "Réponse finale"}
+
+    def test_report_aggregates_per_skill_and_turn(self):
+        exchanges = [
+            {"replay_ms": 100.0, "recorded_ms": 3000.0, "db_queries": 10, "errors": [],
+             "skills": [skill("a", 0, 20.0), skill("b", 1, 40.0)],
+             "turns": [{"turn": 0, "stream_ms": 10.0, "turn_ms": 35.0},
+                       {"turn": 1, "stream_ms": 12.0, "turn_ms": 55.0},
+                       {"turn": 2, "stream_ms": 8.0, "turn_ms": 8.0}]},
+            {"replay_ms": 200.0, "recorded_ms": 5000.0, "db_queries": 20, "errors": ["x"],
+             "skills": [skill("a", 0, 30.0)],
+             "turns": [{"turn": 0, "stream_ms": 20.0, "turn_ms": 55.0},
+                       {"turn": 1, "stream_ms": 9.0, "turn_ms": 9.0}]},
+        ]
+        report = build_report(exchanges)
+        assert report["exchanges"] == 2 and report["errors"] == 1
+        assert report["db_queries_per_exchange"] == 15.0
+        assert [s["skill"] for s in report["skills"]] == ["a", "b"]
+        assert report["skills"][0]["count"] == 2
+        turns = report["turns"]
+        assert [(t["turn"], t["count"], t["skills"]) for t in turns] == [(0, 2, 2), (1, 2, 1), (2, 1, 0)]
+        # Durée du tour (LLM + skills), distincte de la durée des skills
+        assert turns[0]["p95_ms"] == 55.0 and turns[2]["p50_ms"] == 8.0
+
+
+class _ReplaySession:
+    """Session factice : attribue un id aux objets ajoutés, sans BDD."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def add(self, obj):
+        obj.id = getattr(obj, "id", None) or uuid.uuid4()
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class _ReplayRegistry:
+    calls: list[tuple[str, dict]] = []
+
+    def __init__(self, db):
+        pass
+
+    async def get_active_tools(self):
+        return []
+
+    def get_openai_tools(self, tools):
+        return [{
+            "type": "function",
+            "function": {"name": "get_company_profile", "parameters": {"type": "object"}},
+        }]
+
+    def is_read_only(self, skill_name):
+        return True
+
+    async def execute_skill(self, skill_name, params, context):
+        self.calls.append((skill_name, params))
+        return {"nom": "Acme"}
+
+
+class TestReplayConversation:
+    @pytest.mark.asyncio
+    async def test_replays_exchange_without_api_key(self, monkeypatch):
+        from app.agent.engine import AgentEngine
+        from app.agent.history import HistoryManager
+
+        monkeypatch.setattr(settings, "LLM_API_KEY", "")
+        monkeypatch.setattr(settings, "LLM_FAKE", False)
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        monkeypatch.setattr(settings, "AGENT_METRICS_ENABLED", False)
+        monkeypatch.setattr(settings, "AGENT_RESPONSE_CACHE", False)
+        await llm.close_llm_client()
+
+        new_id = str(uuid.uuid4())
+        dropped = []
+
+        async def create_entreprise(snapshot):
+            return uuid.uuid4(), {"id": new_id, **snapshot}
+
+        async def drop_user(user_id, conversation_ids):
+            dropped.append(conversation_ids)
+
+        async def save_message(self, conversation_id, role, content, tool_calls_json=None):
+            return SimpleNamespace(id=uuid.uuid4())
+
+        async def load_history(self, conversation_id):
+            return []
+
+        monkeypatch.setattr(replay, "_create_replay_entreprise", create_entreprise)
+        monkeypatch.setattr(replay, "_drop_replay_user", drop_user)
+        monkeypatch.setattr(replay, "async_session", _ReplaySession)
+        monkeypatch.setattr(replay, "SkillRegistry", _ReplayRegistry)
+        monkeypatch.setattr(AgentEngine, "_save_message", save_message)
+        monkeypatch.setattr(AgentEngine, "_load_history", load_history)
+        monkeypatch.setattr(HistoryManager, "schedule_refresh", staticmethod(lambda conversation_id: None))
+        _ReplayRegistry.calls = []
+
+        trace = {
+            "conversation_id": "c-old",
+            "entreprise_id": "old",
+            "entreprise": {"nom": "Acme"},
+            "exchanges": [{
+                "user": "Mon profil ?",
+                "assistant": "Voici votre profil.",
+                "recorded_ms": 2500.0,
+                "tool_calls": [
+                    {"name": "get_company_profile", "input": {"entreprise_id": "old"}, "turn": 0}
+                ],
+            }],
+        }
+        results = await replay._replay_conversation(trace, ttft_ms=0.0, tokens_per_s=0.0)
+
+        assert len(results) == 1 and results[0]["errors"] == []
+        assert _ReplayRegistry.calls == [("get_company_profile", {"entreprise_id": new_id})]
+        assert [r["name"] for r in results[0]["skills"]] == ["get_company_profile"]
+        # Deux tours LLM (appel du skill, puis réponse), chacun avec sa durée totale
+        turns = results[0]["turns"]
+        assert [t["turn"] for t in turns] == [0, 1]
+        assert all(t["turn_ms"] >= t["stream_ms"] for t in turns)
+        assert len(dropped) == 1
+        # Le client LLM partagé (clé API) n'a jamais été construit
+        assert llm.get_llm_pool_stats()["initialized"] is False
+
+
+class TestToolRoutingBench:
+    def test_routing_reduces_tool_tokens(self):
+        from app.bench.tool_routing import measure_tool_routing
+
+        report = measure_tool_routing(["Bonjour", "Calcule mon empreinte carbone"])
+        assert report["tokens_routed_avg"] < report["tokens_full"]
+        assert report["reduction_pct"] > 0
+        assert report["turns"][0]["tools"] < report["turns"][1]["tools"] <= report["tools_total"]
+
+    def test_stable_tool_list_changes_prefix_less_often(self):
+        from app.bench.tool_routing import measure_tool_routing
+
+        report = measure_tool_routing(["Calcule mon empreinte carbone", "Merci", "Et en diesel ?", "Merci"])
+        assert report["prefix_changes_routed"] > report["prefix_changes_stable"] == 0
+        assert report["tokens_routed_avg"] <= report["tokens_stable_avg"] < report["tokens_full"]
+
+
+class TestEmbeddingBench:
+    @pytest.mark.asyncio
+    async def test_compares_providers_and_reports_unavailable(self, monkeypatch):
+        from app.bench.embeddings import run_embedding_benchmark
+        from app.config import settings
+
+        monkeypatch.setattr(settings, "EMBEDDING_DIM", 64)
+        monkeypatch.setattr(settings, "VOYAGE_API_KEY", "")
+        provider = settings.EMBEDDING_PROVIDER
+
+        results = await run_embedding_benchmark(["hashing", "voyage"], chunks=10, queries=5)
+        hashing, voyage = results
+        assert hashing["dim"] == 64 and hashing["ingest_chunks"] == 10
+        assert hashing["queries_per_s"] > 0
+        assert "VOYAGE_API_KEY" in voyage["error"]
+        assert settings.EMBEDDING_PROVIDER == provider
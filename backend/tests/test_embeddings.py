@@ -0,0 +1,316 @@
+"""
+Tests du client d'embeddings (app/rag/embeddings.py) : découpage en sous-batches,
+parallélisme, retries, cache adressé par contenu et regroupement des appels
+unitaires. L'API Voyage est simulée par un httpx.MockTransport, la table
+embedding_cache par un dictionnaire.
+"""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.rag import embeddings, providers
+from app.rag.coalescer import EmbeddingCoalescer
+from app.rag.embedding_cache import EmbeddingCache, embedding_cache
+
+
+@pytest.fixture(autouse=True)
+def _voyage(monkeypatch):
+    monkeypatch.setattr(settings, "VOYAGE_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "voyage")
+    monkeypatch.setattr(settings, "EMBEDDING_DIM", 1024)
+    monkeypatch.setattr(settings, "EMBEDDING_RETRY_BASE_DELAY", 0.0)
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_DB", False)
+    embedding_cache.clear()
+    yield
+    providers._providers.clear()
+    embedding_cache.clear()
+
+
+def _mock_api(monkeypatch, handler):
+    monkeypatch.setattr(
+        providers.get_provider("voyage"),
+        "_client",
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+
+
+def _ok(texts: list[str]) -> httpx.Response:
+    # Réponse dans le désordre : le client doit trier par index
+    data = [{"index": i, "embedding": [float(len(t))]} for i, t in enumerate(texts)]
+    return httpx.Response(200, json={"data": list(reversed(data))})
+
+
+class TestPlanBatches:
+    def test_batches_bounded_by_count_and_tokens(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_BATCH_TOKENS", 100)
+        texts = ["x" * 150] * 3 + ["y"] * 300
+        batches = providers.plan_batches(texts)
+        assert batches[0] == (0, 1)  # 51 tokens : un seul texte long par sous-batch
+        assert all(end - start <= providers.MAX_BATCH_SIZE for start, end in batches)
+        assert batches[-1][1] == len(texts)
+        assert all(a[1] == b[0] for a, b in zip(batches, batches[1:]))
+
+    def test_oversized_text_gets_its_own_batch(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_BATCH_TOKENS", 10)
+        assert providers.plan_batches(["a" * 300, "b"]) == [(0, 1), (1, 2)]
+
+
+class TestEmbeddingsBatch:
+    @pytest.mark.asyncio
+    async def test_sub_batches_run_concurrently_and_keep_order(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_CONCURRENCY", 3)
+        in_flight = 0
+        max_in_flight = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return _ok(json.loads(request.content)["input"])
+
+        _mock_api(monkeypatch, handler)
+        texts = [f"texte {i}" for i in range(600)]
+        result = await embeddings.get_embeddings_batch(texts)
+        assert result == [[float(len(t))] for t in texts]
+        assert max_in_flight == 3
+
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors_with_retry_after(self, monkeypatch):
+        calls = []
+        sleeps = []
+        real_sleep = asyncio.sleep
+
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+            await real_sleep(0)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(429, headers={"Retry-After": "2"}, text="rate limited")
+            if len(calls) == 2:
+                return httpx.Response(503, text="indisponible")
+            return _ok(json.loads(request.content)["input"])
+
+        monkeypatch.setattr(providers.asyncio, "sleep", fake_sleep)
+        _mock_api(monkeypatch, handler)
+        assert await embeddings.get_embedding("bonjour") == [7.0]
+        assert len(calls) == 3
+        assert sleeps[0] == 2.0
+
+    @pytest.mark.asyncio
+    async def test_client_error_is_not_retried(self, monkeypatch):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(400, text="requête invalide")
+
+        _mock_api(monkeypatch, handler)
+        with pytest.raises(RuntimeError, match="400"):
+            await embeddings.get_embeddings_batch(["a"])
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_MAX_RETRIES", 2)
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            raise httpx.ConnectError("connexion refusée")
+
+        _mock_api(monkeypatch, handler)
+        with pytest.raises(RuntimeError, match="réseau"):
+            await embeddings.get_embeddings_batch(["a"])
+        assert len(calls) == 3
+
+
+class TestEmbeddingCache:
+    @pytest.mark.asyncio
+    async def test_only_unknown_texts_are_sent(self, monkeypatch):
+        sent: list[list[str]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            texts = json.loads(request.content)["input"]
+            sent.append(texts)
+            return _ok(texts)
+
+        _mock_api(monkeypatch, handler)
+        first = await embeddings.get_embeddings_batch(["alpha", "beta", "alpha"])
+        assert sent == [["alpha", "beta"]]  # doublon du batch calculé une fois
+        assert first == [[5.0], [4.0], [5.0]]
+
+        second = await embeddings.get_embeddings_batch(["beta  ", "gamma", "alpha"])
+        assert sent[1] == ["gamma"]  # espaces normalisés : « beta  » est déjà connu
+        assert second == [[4.0], [5.0], [5.0]]
+        assert embedding_cache.stats()["memory_hits"] == 2
+
+    @pytest.mark.asyncio
+    async def test_table_is_second_level(self, monkeypatch):
+        table: dict[str, list[float]] = {}
+
+        async def load(hashes):
+            return {h: table[h] for h in hashes if h in table}
+
+        async def store(model, vectors):
+            table.update(vectors)
+
+        monkeypatch.setattr(settings, "EMBEDDING_CACHE_DB", True)
+        monkeypatch.setattr(EmbeddingCache, "_load", staticmethod(load))
+        monkeypatch.setattr(EmbeddingCache, "_store", staticmethod(store))
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return _ok(json.loads(request.content)["input"])
+
+        _mock_api(monkeypatch, handler)
+        await embeddings.get_embeddings_batch(["chunk réglementaire"])
+        assert len(table) == 1
+
+        embedding_cache.clear()  # autre worker : LRU vide, table partagée
+        assert await embeddings.get_embeddings_batch(["chunk réglementaire"]) == [[19.0]]
+        assert len(calls) == 1
+        assert embedding_cache.stats()["db_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_table_errors_do_not_break_ingestion(self, monkeypatch):
+        async def broken(*args):
+            raise ConnectionError("base indisponible")
+
+        monkeypatch.setattr(settings, "EMBEDDING_CACHE_DB", True)
+        monkeypatch.setattr(EmbeddingCache, "_load", staticmethod(broken))
+        monkeypatch.setattr(EmbeddingCache, "_store", staticmethod(broken))
+        _mock_api(monkeypatch, lambda request: _ok(json.loads(request.content)["input"]))
+        assert await embeddings.get_embeddings_batch(["abc"]) == [[3.0]]
+
+    def test_lru_bound(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_CACHE_SIZE", 2)
+        cache = EmbeddingCache()
+        for key in ["a", "b", "c"]:
+            cache._remember(key, [1.0])
+        assert list(cache._lru) == ["b", "c"]
+
+
+class TestCoalescer:
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_request(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_COALESCE_MAX_BATCH", 4)
+        sent: list[list[str]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            texts = json.loads(request.content)["input"]
+            sent.append(texts)
+            return _ok(texts)
+
+        _mock_api(monkeypatch, handler)
+        coalescer = EmbeddingCoalescer(embeddings.get_embeddings_batch)
+        queries = [f"question {'x' * i}" for i in range(10)]
+        vectors = await asyncio.gather(*(coalescer.embed(q) for q in queries))
+
+        assert vectors == [[float(len(q))] for q in queries]
+        assert [len(batch) for batch in sent] == [4, 4, 2]
+        stats = coalescer.stats()
+        assert stats["batches_total"] == 3
+        assert stats["fill_ratio"] == round(10 / 3 / 4, 3)
+
+    @pytest.mark.asyncio
+    async def test_waits_at_most_max_wait(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_COALESCE_MAX_WAIT_MS", 20.0)
+        batches: list[list[str]] = []
+
+        async def batch_fn(texts):
+            batches.append(texts)
+            return [[1.0] for _ in texts]
+
+        coalescer = EmbeddingCoalescer(batch_fn)
+        first = asyncio.create_task(coalescer.embed("a"))
+        await asyncio.sleep(0.005)
+        second = asyncio.create_task(coalescer.embed("b"))
+        assert await asyncio.wait_for(asyncio.gather(first, second), 1) == [[1.0], [1.0]]
+        assert batches == [["a", "b"]]
+
+    @pytest.mark.asyncio
+    async def test_errors_and_cancellation(self):
+        async def failing(texts):
+            raise RuntimeError("API indisponible")
+
+        coalescer = EmbeddingCoalescer(failing)
+        results = await asyncio.gather(
+            coalescer.embed("a"), coalescer.embed("b"), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+        seen: list[list[str]] = []
+
+        async def batch_fn(texts):
+            seen.append(texts)
+            return [[0.0] for _ in texts]
+
+        coalescer = EmbeddingCoalescer(batch_fn)
+        cancelled = asyncio.create_task(coalescer.embed("annulé"))
+        kept = asyncio.create_task(coalescer.embed("gardé"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        assert await kept == [0.0]
+        assert seen == [["gardé"]]
+
+
+class TestProviders:
+    @pytest.mark.asyncio
+    async def test_hashing_provider_is_deterministic_and_normalized(self, monkeypatch):
+        import math
+
+        monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "hashing")
+        monkeypatch.setattr(settings, "EMBEDDING_DIM", 256)
+        a, b, c = await embeddings.get_embeddings_batch([
+            "Taxonomie verte de la BCEAO",
+            "la taxonomie verte BCEAO",
+            "Bilan carbone du transport routier",
+        ])
+        assert len(a) == 256
+        assert math.isclose(sum(v * v for v in a), 1.0)
+        assert a == providers.HashingProvider().vectorize("Taxonomie verte de la BCEAO")
+
+        def cos(x, y):
+            return sum(p * q for p, q in zip(x, y))
+
+        assert cos(a, b) > 0.6 > cos(a, c)
+        assert embedding_cache.stats()["memory_size"] == 0  # pas de cache pour le hachage
+
+    @pytest.mark.asyncio
+    async def test_voyage_requests_configured_dimension(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_DIM", 512)
+        payloads = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            payloads.append(json.loads(request.content))
+            return _ok(payloads[-1]["input"])
+
+        _mock_api(monkeypatch, handler)
+        await embeddings.get_embeddings_batch(["a"])
+        assert payloads[0]["output_dimension"] == 512
+        assert providers.get_provider().model_id == "voyage-3-large@512"
+
+    def test_unknown_provider(self, monkeypatch):
+        monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "inconnu")
+        with pytest.raises(ValueError, match="EMBEDDING_PROVIDER"):
+            providers.get_provider()
+
+    @pytest.mark.asyncio
+    async def test_local_provider_requires_optional_dependency(self, monkeypatch):
+        import importlib.util
+
+        if importlib.util.find_spec("sentence_transformers") is not None:
+            pytest.skip("sentence-transformers installé")
+        monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "local")
+        monkeypatch.setattr(settings, "EMBEDDING_DIM", 384)
+        with pytest.raises(RuntimeError, match="sentence-transformers"):
+            await embeddings.get_embeddings_batch(["a"])
@@ -0,0 +1,203 @@
+"""
+Tests de l'ingestion des documents en arrière-plan (app/rag/ingestion.py) :
+étapes et avancement, échec puis reprise sans ré-extraction ni recalcul des chunks
+déjà insérés, pool de workers borné. La table documents / doc_chunks est simulée
+par un dictionnaire, l'extraction et les embeddings par des fonctions de test.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.config import settings
+from app.rag import ingestion
+from app.rag.ingestion import ClaimedDocument, DocumentIngestion
+
+# ~10 chunks de 800 caractères
+TEXTE = "\n\n".join(f"Paragraphe {i}. " + "Contenu du rapport ESG. " * 30 for i in range(12))
+
+
+class FakeStore:
+    """Documents et chunks en mémoire, branchés sur les accès BDD d'un DocumentIngestion."""
+
+    def __init__(self, pipeline: DocumentIngestion):
+        self.docs: dict[uuid.UUID, dict] = {}
+        self.chunks: dict[uuid.UUID, list[dict]] = {}
+        self.progress: list[int] = []
+        pipeline._claim = self.claim
+        pipeline._save = self.save
+        pipeline._chunk_count = self.chunk_count
+        pipeline._insert_chunks = self.insert_chunks
+
+    def add(self, texte: str | None = None, status: str = ingestion.PENDING) -> uuid.UUID:
+        document_id = uuid.uuid4()
+        self.docs[document_id] = {
+            "status": status,
+            "progress": 0,
+            "error": None,
+            "texte_extrait": texte,
+        }
+        self.chunks[document_id] = []
+        return document_id
+
+    async def claim(self, document_id):
+        doc = self.docs.get(document_id)
+        if doc is None or doc["status"] != ingestion.PENDING:
+            return None
+        doc["status"] = ingestion.EXTRACTING if doc["texte_extrait"] is None else ingestion.EMBEDDING
+        doc["error"] = None
+        return ClaimedDocument(document_id, "/tmp/doc.pdf", "application/pdf", doc["texte_extrait"])
+
+    async def save(self, document_id, **values):
+        self.docs[document_id].update(values)
+
+    async def chunk_count(self, document_id):
+        return len(self.chunks[document_id])
+
+    async def insert_chunks(self, document_id, chunks, embeddings, progress):
+        self.chunks[document_id].extend(chunks)
+        self.docs[document_id]["progress"] = progress
+        self.progress.append(progress)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    monkeypatch.setattr(settings, "DOCUMENT_INGESTION_BATCH", 4)
+    return DocumentIngestion()
+
+
+@pytest.fixture
+def store(pipeline):
+    return FakeStore(pipeline)
+
+
+def _fake_extract(monkeypatch, calls: list, texte: str = TEXTE, error: Exception | None = None):
+    async def extract(path, mime):
+        calls.append(path)
+        if error is not None:
+            raise error
+        return texte
+
+    monkeypatch.setattr(ingestion, "extract_text_from_file", extract)
+
+
+def _fake_embed(monkeypatch, calls: list, fail_on_call: int | None = None):
+    async def embed(texts):
+        calls.append(len(texts))
+        if fail_on_call is not None and len(calls) == fail_on_call:
+            raise RuntimeError("Erreur API Voyage AI (503)")
+        return [[0.1] for _ in texts]
+
+    monkeypatch.setattr(ingestion, "get_embeddings_batch", embed)
+
+
+class TestDocumentIngestion:
+    @pytest.mark.asyncio
+    async def test_pipeline_reaches_ready_with_progress(self, monkeypatch, pipeline, store):
+        extract_calls, embed_calls = [], []
+        _fake_extract(monkeypatch, extract_calls)
+        _fake_embed(monkeypatch, embed_calls)
+        document_id = store.add()
+
+        await pipeline.process(document_id)
+
+        doc = store.docs[document_id]
+        assert doc["status"] == ingestion.READY
+        assert doc["progress"] == 100
+        assert doc["texte_extrait"] == TEXTE
+        assert len(extract_calls) == 1
+        # Chunks vectorisés par étapes de DOCUMENT_INGESTION_BATCH
+        assert len(store.chunks[document_id]) == sum(embed_calls) > 4
+        assert max(embed_calls) <= 4
+        assert store.progress == sorted(store.progress)
+        assert store.progress[0] > ingestion.EXTRACTION_SHARE and store.progress[-1] < 100
+        assert pipeline.processed_total == 1
+
+    @pytest.mark.asyncio
+    async def test_empty_extraction_is_ready_without_chunks(self, monkeypatch, pipeline, store):
+        embed_calls = []
+        _fake_extract(monkeypatch, [], texte="")
+        _fake_embed(monkeypatch, embed_calls)
+        document_id = store.add()
+
+        await pipeline.process(document_id)
+
+        assert store.docs[document_id]["status"] == ingestion.READY
+        assert store.chunks[document_id] == [] and embed_calls == []
+
+    @pytest.mark.asyncio
+    async def test_extraction_failure_is_recorded(self, monkeypatch, pipeline, store):
+        _fake_extract(monkeypatch, [], error=ValueError("PDF illisible"))
+        _fake_embed(monkeypatch, [])
+        document_id = store.add()
+
+        await pipeline.process(document_id)
+
+        doc = store.docs[document_id]
+        assert doc["status"] == ingestion.FAILED
+        assert doc["error"].startswith("extracting") and "PDF illisible" in doc["error"]
+        assert pipeline.failed_total == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_resumes_embedding_stage(self, monkeypatch, pipeline, store):
+        extract_calls, embed_calls = [], []
+        _fake_extract(monkeypatch, extract_calls)
+        _fake_embed(monkeypatch, embed_calls, fail_on_call=2)
+        document_id = store.add()
+
+        await pipeline.process(document_id)
+        doc = store.docs[document_id]
+        assert doc["status"] == ingestion.FAILED and doc["error"].startswith("embedding")
+        assert len(store.chunks[document_id]) == 4  # premier batch conservé
+
+        # Relance (POST /retry) : texte extrait et chunks déjà insérés réutilisés
+        doc["status"] = ingestion.PENDING
+        await pipeline.process(document_id)
+
+        assert doc["status"] == ingestion.READY and doc["error"] is None
+        assert len(extract_calls) == 1
+        indexes = [c["index"] for c in store.chunks[document_id]]
+        assert indexes == list(range(len(indexes)))
+
+    @pytest.mark.asyncio
+    async def test_only_pending_documents_are_processed(self, monkeypatch, pipeline, store):
+        extract_calls = []
+        _fake_extract(monkeypatch, extract_calls)
+        _fake_embed(monkeypatch, [])
+        ready = store.add(texte=TEXTE, status=ingestion.READY)
+
+        await pipeline.process(ready)
+        await pipeline.process(uuid.uuid4())  # supprimé entre-temps
+
+        assert store.docs[ready]["status"] == ingestion.READY
+        assert extract_calls == []
+
+    @pytest.mark.asyncio
+    async def test_worker_pool_is_bounded(self, monkeypatch, pipeline, store):
+        monkeypatch.setattr(settings, "DOCUMENT_INGESTION_WORKERS", 2)
+        active, peak = 0, 0
+
+        async def extract(path, mime):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return "Texte court."
+
+        monkeypatch.setattr(ingestion, "extract_text_from_file", extract)
+        _fake_embed(monkeypatch, [])
+        document_ids = [store.add() for _ in range(5)]
+
+        for document_id in document_ids:
+            pipeline.submit(document_id)
+        pipeline.submit(document_ids[0])  # déjà en file : ignoré
+        assert pipeline.stats()["queued"] == 5
+        await pipeline.join()
+
+        assert peak == 2
+        assert all(store.docs[d]["status"] == ingestion.READY for d in document_ids)
+        assert pipeline.stats()["processed_total"] == 5
+        await pipeline.stop()
+        assert pipeline.stats()["workers"] == 0
@@ -0,0 +1,337 @@
+"""
+Tests du client LLM partagé (app/core/llm.py), du LLM local simulé (app/core/fake_llm.py),
+du contrôle d'admission et du routage des modèles.
+Aucun appel réseau : on vérifie le cycle de vie, les métriques du pool et le rejeu des scripts.
+"""
+
+import pytest
+
+from app.config import settings
+from app.core import llm
+
+
+@pytest.fixture(autouse=True)
+def _api_key(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_API_KEY", settings.LLM_API_KEY or "test-key")
+
+
+class TestSharedLLMClient:
+    @pytest.mark.asyncio
+    async def test_get_returns_singleton(self):
+        await llm.close_llm_client()
+        first = llm.get_llm_client()
+        assert llm.get_llm_client() is first
+        assert llm.init_llm_client() is first
+        await llm.close_llm_client()
+        assert llm.get_llm_client() is not first
+        await llm.close_llm_client()
+
+    @pytest.mark.asyncio
+    async def test_pool_stats(self):
+        await llm.close_llm_client()
+        assert llm.get_llm_pool_stats()["initialized"] is False
+
+        llm.init_llm_client()
+        stats = llm.get_llm_pool_stats()
+        assert stats["initialized"] is True
+        assert stats["limits"]["max_connections"] == settings.LLM_MAX_CONNECTIONS
+        assert stats["requests_total"] == 0
+        assert stats["in_flight"] == 0
+        assert stats["connections"] == {"open": 0, "idle": 0, "active": 0}
+        await llm.close_llm_client()
+
+
+_SCRIPT = {
+    "turns": [
+        {
+            "text": "Je regarde votre profil.",
+            "tool_calls": [
+                {"name": "get_company_profile", "arguments": {"entreprise_id": "e1"}},
+                {"name": "list_referentiels", "arguments": {}},
+            ],
+        },
+        {"text": "Voici la synthèse."},
+    ]
+}
+
+_TOOLS = [{"type": "function", "function": {"name": "get_company_profile", "parameters": {}}}]
+
+
+def _fake_client():
+    import httpx
+    from openai import AsyncOpenAI
+
+    from app.core.fake_llm import FakeLLMTransport
+
+    transport = FakeLLMTransport(_SCRIPT, ttft_ms=0, tokens_per_s=0)
+    return AsyncOpenAI(
+        base_url="http://fake/v1",
+        api_key="test-key",
+        http_client=httpx.AsyncClient(transport=transport),
+    )
+
+
+    @pytest.mark.asyncio
+    async def test_app_starts_without_api_key(self, monkeypatch):
+        """Sans LLM_API_KEY, le démarrage réussit ; seuls les appels LLM échouent."""
+        from unittest.mock import AsyncMock, MagicMock
+
+        from app import main
+
+        class _Conn:
+            async def __aenter__(self):
+                return AsyncMock()
+
+            async def __aexit__(self, *exc):
+                return False
+
+        engine = MagicMock(begin=_Conn, dispose=AsyncMock())
+        monkeypatch.setattr(main, "engine", engine)
+        monkeypatch.setattr(main, "install_db_timer", lambda engine: None)
+        monkeypatch.setattr(main.document_ingestion, "start", AsyncMock())
+        monkeypatch.setattr(main.document_ingestion, "stop", AsyncMock())
+        monkeypatch.setattr(settings, "LLM_API_KEY", "")
+        monkeypatch.setattr(settings, "LLM_FAKE", False)
+        monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+        await llm.close_llm_client()
+
+        async with main.lifespan(main.app):
+            assert llm.get_llm_pool_stats()["initialized"] is False
+            with pytest.raises(Exception):
+                llm.get_llm_client()
+
+
+class TestFakeLLM:
+    def test_select_turn_follows_tool_rounds(self):
+        from app.core.fake_llm import select_turn
+
+        user = {"role": "user", "content": "Bonjour"}
+        call = {"role": "assistant", "content": None, "tool_calls": [{"id": "c"}]}
+        tool = {"role": "tool", "tool_call_id": "c", "content": "{}"}
+
+        assert select_turn(_SCRIPT, {"messages": [user], "tools": _TOOLS}) is _SCRIPT["turns"][0]
+        second = select_turn(_SCRIPT, {"messages": [user, call, tool], "tools": _TOOLS})
+        assert second is _SCRIPT["turns"][1]
+        # Au-delà du script, le dernier tour est répété ; sans tools, texte seul
+        assert select_turn(_SCRIPT, {"messages": [user, call, tool, call, tool], "tools": _TOOLS})["text"]
+        assert "tool_calls" not in select_turn(_SCRIPT, {"messages": [user]})
+
+    @pytest.mark.asyncio
+    async def test_engine_streams_text_tool_calls_and_usage(self):
+        from app.agent.engine import AgentEngine
+
+        engine = AgentEngine(None, None)
+        engine.client = _fake_client()
+        events = [e async for e in engine._stream_llm(_TOOLS, [{"role": "user", "content": "x"}])]
+
+        text = "".join(e["text"] for e in events if e["type"] == "text_delta")
+        calls = [e["tool_call"] for e in events if e["type"] == "tool_call"]
+        stats = [e["stats"] for e in events if e["type"] == "stats"][0]
+        assert text == "Je regarde votre profil."
+        assert [c["name"] for c in calls] == ["get_company_profile", "list_referentiels"]
+        assert calls[0]["arguments"] == '{"entreprise_id": "e1"}'
+        assert stats["prompt_tokens"] > 0 and stats["completion_tokens"] > 0
+
+    @pytest.mark.asyncio
+    async def test_non_stream_completion(self):
+        client = _fake_client()
+        response = await client.chat.completions.create(
+            model="fake", messages=[{"role": "user", "content": "Résume"}]
+        )
+        assert response.choices[0].message.content == "Je regarde votre profil."
+
+    @pytest.mark.asyncio
+    async def test_shared_client_uses_fake_when_enabled(self, monkeypatch):
+        monkeypatch.setattr(settings, "LLM_FAKE", True)
+        monkeypatch.setattr(settings, "LLM_FAKE_TTFT_MS", 0.0)
+        await llm.close_llm_client()
+        try:
+            client = llm.get_llm_client()
+            response = await client.chat.completions.create(
+                model="fake", messages=[{"role": "user", "content": "Bonjour"}]
+            )
+            assert "simulée" in response.choices[0].message.content
+            assert llm.get_llm_pool_stats()["fake"] is True
+        finally:
+            await llm.close_llm_client()
+
+
+class TestLLMScheduler:
+    @pytest.mark.asyncio
+    async def test_priority_then_round_robin_between_users(self, monkeypatch):
+        import asyncio
+
+        from app.core.llm_scheduler import LLMScheduler, Priority
+
+        monkeypatch.setattr(settings, "LLM_SHED_QUEUE_DEPTH", 0)
+        scheduler = LLMScheduler(max_concurrency=1)
+        order: list[str] = []
+        release = asyncio.Event()
+
+        async def call(name, priority, user):
+            async with scheduler.admit(priority, user):
+                order.append(name)
+                if name == "first":
+                    await release.wait()
+
+        first = asyncio.create_task(call("first", Priority.INTERACTIVE, "u0"))
+        await asyncio.sleep(0)
+        waiting = [
+            ("batch", Priority.BATCH, "u1"),
+            ("a1", Priority.INTERACTIVE, "a"),
+            ("a2", Priority.INTERACTIVE, "a"),
+            ("b1", Priority.INTERACTIVE, "b"),
+        ]
+        tasks = [asyncio.create_task(call(*args)) for args in waiting]
+        await asyncio.sleep(0)
+        assert scheduler.active == 1 and scheduler.waiting == 4
+
+        release.set()
+        await asyncio.gather(first, *tasks)
+        assert order == ["first", "a1", "b1", "a2", "batch"]
+        assert scheduler.active == 0 and scheduler.waiting == 0
+
+    @pytest.mark.asyncio
+    async def test_load_shedding_caps_tokens_and_switches_model(self, monkeypatch):
+        import asyncio
+
+        from app.core.llm_scheduler import LLMScheduler, Priority
+
+        monkeypatch.setattr(settings, "LLM_SHED_QUEUE_DEPTH", 1)
+        monkeypatch.setattr(settings, "LLM_SHED_MAX_TOKENS", 256)
+        monkeypatch.setattr(settings, "LLM_SHED_MODEL", "petit-modele")
+        scheduler = LLMScheduler(max_concurrency=1)
+        applied: list[dict] = []
+        release = asyncio.Event()
+
+        async def call():
+            async with scheduler.admit(Priority.BATCH, "u") as admission:
+                applied.append(admission.apply({"model": "m", "max_tokens": 2000}))
+                await release.wait()
+
+        tasks = [asyncio.create_task(call()) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(*tasks)
+
+        # Le 3e appel arrive avec un appel déjà en attente → dégradé
+        assert applied[0] == {"model": "m", "max_tokens": 2000}
+        assert applied[2] == {"model": "petit-modele", "max_tokens": 256}
+        assert scheduler.degraded_total == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout_and_cancellation_release_nothing(self, monkeypatch):
+        import asyncio
+
+        from app.core.llm_scheduler import LLMBusyError, LLMScheduler
+
+        monkeypatch.setattr(settings, "LLM_QUEUE_TIMEOUT", 0.05)
+        scheduler = LLMScheduler(max_concurrency=1)
+        async with scheduler.admit():
+            with pytest.raises(LLMBusyError):
+                async with scheduler.admit():
+                    pass
+            waiter = asyncio.create_task(scheduler.admit().__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+            assert scheduler.waiting == 0
+        assert scheduler.active == 0
+        assert scheduler.timeouts_total == 1
+
+
+class TestLLMRouting:
+    def test_routes_by_task_class(self, monkeypatch):
+        from app.core.llm_routing import Task, resolve
+        from app.core.llm_scheduler import Priority
+
+        monkeypatch.setattr(settings, "LLM_MODEL", "fort")
+        monkeypatch.setattr(settings, "LLM_FAST_MODEL", "rapide")
+        monkeypatch.setattr(settings, "LLM_FALLBACK_MODELS", "secours")
+        monkeypatch.setattr(settings, "LLM_ROUTES", {})
+
+        chat = resolve(Task.CHAT)
+        assert chat.models == ("fort", "secours")
+        assert chat.priority == Priority.INTERACTIVE
+        suggest = resolve(Task.FIELD_SUGGEST)
+        assert suggest.models == ("rapide", "secours", "fort")
+        assert suggest.max_tokens == 500
+        assert resolve(Task.SUMMARY, max_tokens=300).max_tokens == 300
+
+    def test_route_overrides(self, monkeypatch):
+        from app.core.llm_routing import Task, resolve
+
+        monkeypatch.setattr(settings, "LLM_MODEL", "fort")
+        monkeypatch.setattr(settings, "LLM_FAST_MODEL", "")
+        monkeypatch.setattr(settings, "LLM_FALLBACK_MODELS", "secours")
+        monkeypatch.setattr(
+            settings, "LLM_ROUTES", {"document": {"model": "redacteur", "max_tokens": 3000, "fallbacks": []}}
+        )
+
+        document = resolve(Task.DOCUMENT, max_tokens=2000)
+        assert document.models == ("redacteur", "fort")
+        assert document.max_tokens == 3000
+        assert resolve(Task.SUMMARY).models == ("fort", "secours")
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_next_model(self, monkeypatch):
+        import json
+
+        import httpx
+        from openai import AsyncOpenAI
+
+        from app.core.llm_routing import Task, complete, fallbacks_total
+
+        monkeypatch.setattr(settings, "LLM_MODEL", "fort")
+        monkeypatch.setattr(settings, "LLM_FAST_MODEL", "rapide")
+        monkeypatch.setattr(settings, "LLM_FALLBACK_MODELS", "")
+        monkeypatch.setattr(settings, "LLM_ROUTES", {})
+        requested: list[tuple[str, int]] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            requested.append((body["model"], body["max_tokens"]))
+            if body["model"] == "rapide":
+                return httpx.Response(503, json={"error": {"message": "indisponible"}})
+            return httpx.Response(200, json={
+                "id": "c", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "ok"}}],
+            })
+
+        client = AsyncOpenAI(
+            base_url="http://fake/v1",
+            api_key="test-key",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+        before = fallbacks_total[("field_suggest", "fort")]
+        response = await complete(client, Task.FIELD_SUGGEST, messages=[{"role": "user", "content": "x"}])
+        assert response.choices[0].message.content == "ok"
+        assert requested == [("rapide", 500), ("fort", 500)]
+        assert fallbacks_total[("field_suggest", "fort")] == before + 1
+
+    @pytest.mark.asyncio
+    async def test_client_errors_do_not_fall_back(self, monkeypatch):
+        import httpx
+        from openai import AsyncOpenAI, BadRequestError
+
+        from app.core.llm_routing import Task, complete
+
+        monkeypatch.setattr(settings, "LLM_FAST_MODEL", "rapide")
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(request)
+            return httpx.Response(400, json={"error": {"message": "requête invalide"}})
+
+        client = AsyncOpenAI(
+            base_url="http://fake/v1",
+            api_key="test-key",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+        with pytest.raises(BadRequestError):
+            await complete(client, Task.SUMMARY, messages=[{"role": "user", "content": "x"}])
+        assert len(calls) == 1
@@ -276,3 +276,303 @@ async def execute(params, context):
         valid, msg = validate_skill_code(code)
         assert valid is False
         assert "DELETE" in msg
+
+
+# ---- Catalogue en mémoire (sans BDD) ----
+
+
+class _CountingSession:
+    """Session factice qui compte les requêtes et renvoie une liste de skills."""
+
+    def __init__(self, skills):
+        self.skills = skills
+        self.queries = 0
+
+    async def execute(self, _query):
+        from types import SimpleNamespace
+
+        self.queries += 1
+        rows = list(self.skills)
+        return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+
+def _fake_skill(nom, category="utils", handler_key=None):
+    from types import SimpleNamespace
+
+    return SimpleNamespace(
+        nom=nom,
+        description=f"Description de {nom}",
+        category=category,
+        input_schema={"type": "object", "properties": {}},
+        handler_key=handler_key or f"builtin.{nom}",
+        handler_code=None,
+        version=1,
+        is_read_only=False,
+    )
+
+
+class TestSkillCatalogue:
+    @pytest.mark.asyncio
+    async def test_steady_state_issues_no_queries(self):
+        from app.skills.catalogue import SkillCatalogue
+
+        catalogue = SkillCatalogue()
+        db = _CountingSession([_fake_skill("get_company_profile"), _fake_skill("list_referentiels")])
+
+        tools = await catalogue.active_tools(db)
+        assert [t["name"] for t in tools] == ["get_company_profile", "list_referentiels"]
+        for _ in range(5):
+            await catalogue.active_tools(db)
+            assert await catalogue.get(db, "list_referentiels") is not None
+        assert db.queries == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidate_reloads(self):
+        from app.skills.catalogue import SkillCatalogue
+
+        catalogue = SkillCatalogue()
+        db = _CountingSession([_fake_skill("get_company_profile")])
+        await catalogue.active_tools(db)
+
+        db.skills.append(_fake_skill("search_green_funds", category="finance"))
+        assert await catalogue.get(db, "search_green_funds") is None
+        catalogue.invalidate()
+        assert await catalogue.get(db, "search_green_funds") is not None
+        assert db.queries == 2
+
+    @pytest.mark.asyncio
+    async def test_openai_tools_precomputed(self):
+        from app.skills.catalogue import SkillCatalogue
+
+        catalogue = SkillCatalogue()
+        db = _CountingSession([_fake_skill("get_company_profile")])
+        tools = await catalogue.active_tools(db)
+        first = catalogue.openai_tools(tools)
+        assert first[0]["function"]["name"] == "get_company_profile"
+        assert first[0]["function"]["parameters"] == {"type": "object", "properties": {}}
+        assert catalogue.openai_tools(tools)[0] is first[0]
+
+
+# ---- Sandbox des skills custom ----
+
+
+_CUSTOM_OK = '''
+async def execute(params, context):
+    return {"total": sum(params["valeurs"]), "entreprise_id": context["entreprise_id"]}
+'''
+
+_CUSTOM_LOOP = '''
+async def execute(params, context):
+    n = 0
+    while True:
+        n += 1
+'''
+
+
+class TestSkillSandbox:
+    def test_compile_cache_by_hash(self):
+        from app.skills.sandbox import compile_skill_code
+
+        first = compile_skill_code(_CUSTOM_OK)
+        assert compile_skill_code(str(_CUSTOM_OK)) is first
+        assert compile_skill_code(_CUSTOM_LOOP) is not first
+
+    @pytest.mark.asyncio
+    async def test_inline_execution(self, monkeypatch):
+        from app.skills.sandbox import run_custom_skill
+
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_MODE", "inline")
+        result = await run_custom_skill(_CUSTOM_OK, {"valeurs": [1, 2, 3]}, {"entreprise_id": "e1"})
+        assert result == {"total": 6, "entreprise_id": "e1"}
+
+    @pytest.mark.asyncio
+    async def test_inline_timeout_is_skill_error(self, monkeypatch):
+        from app.skills.sandbox import run_custom_skill
+
+        code = '''
+async def execute(params, context):
+    await context["sleep"](5)
+    return {}
+'''
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_MODE", "inline")
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_TIMEOUT", 0.1)
+        result = await run_custom_skill(code, {}, {"sleep": asyncio.sleep})
+        assert "limite" in result["error"]
+
+    @pytest.mark.asyncio
+    async def test_process_mode_json_result_and_timeout(self, monkeypatch):
+        from app.skills.sandbox import run_custom_skill, shutdown_sandbox_pool
+
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_MODE", "process")
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_TIMEOUT", 1.0)
+        try:
+            result = await run_custom_skill(
+                _CUSTOM_OK, {"valeurs": [4, 5]}, {"entreprise_id": uuid.UUID(int=1), "db": object()}
+            )
+            assert result == {"total": 9, "entreprise_id": str(uuid.UUID(int=1))}
+
+            result = await run_custom_skill(_CUSTOM_LOOP, {}, {})
+            assert "limite" in result["error"]
+        finally:
+            shutdown_sandbox_pool()
+
+    @pytest.mark.asyncio
+    async def test_hung_skill_does_not_fail_other_skills(self, monkeypatch):
+        from app.skills.sandbox import run_custom_skill, shutdown_sandbox_pool
+
+        # Boucle en C : le SIGALRM du worker ne l'interrompt pas, le pool est arrêté
+        hung = """
+async def execute(params, context):
+    return {"n": sum(range(10 ** 12))}
+"""
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_MODE", "process")
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_TIMEOUT", 1.0)
+        monkeypatch.setattr(settings, "SKILL_SANDBOX_WORKERS", 1)
+        shutdown_sandbox_pool()
+
+        async def other_conversation():
+            await asyncio.sleep(1.0)  # en file derrière le skill bloqué
+            return await run_custom_skill(_CUSTOM_OK, {"valeurs": [1, 2]}, {"entreprise_id": "e2"})
+
+        try:
+            stuck, other = await asyncio.gather(
+                run_custom_skill(hung, {}, {}), other_conversation()
+            )
+            assert "limite" in stuck["error"]
+            assert other == {"total": 3, "entreprise_id": "e2"}
+        finally:
+            shutdown_sandbox_pool()
+
+
+# ---- Tests de la compaction des résultats (sans BDD) ----
+
+
+def _big_funds_result(n: int = 30) -> dict:
+    return {
+        "nombre_fonds": n,
+        "fonds": [
+            {
+                "fonds_id": f"f{i}",
+                "nom": f"Fonds {i}",
+                "compatibilite": 100 - i,
+                "description": "x" * 500,
+                "criteres_extraits": {"secteurs": ["agriculture"] * 20},
+            }
+            for i in range(n)
+        ],
+    }
+
+
+class TestSkillResultCompaction:
+    @pytest.fixture(autouse=True)
+    def _limits(self, monkeypatch):
+        from app.skills.results import skill_result_store
+
+        monkeypatch.setattr(settings, "SKILL_RESULT_MAX_CHARS", 2000)
+        monkeypatch.setattr(settings, "SKILL_RESULT_LIST_LIMIT", 5)
+        skill_result_store.clear()
+
+    def test_small_result_unchanged(self):
+        import json
+
+        from app.skills.results import compact_tool_result
+
+        result = {"nombre_fonds": 1, "fonds": [{"nom": "A"}]}
+        assert json.loads(compact_tool_result("search_green_funds", result)) == result
+
+    def test_large_result_is_projected_and_capped(self):
+        import json
+
+        from app.skills.results import compact_tool_result
+
+        content = compact_tool_result("search_green_funds", _big_funds_result(), "e1")
+        payload = json.loads(content)
+        assert len(content) <= 2000 + 300
+        assert payload["abrege"] is True
+        assert payload["result_id"].startswith("res_")
+        fonds = payload["resultat"]["fonds"]
+        # Projection : les champs volumineux sont retirés, la liste est tronquée
+        assert "description" not in fonds[0]
+        assert fonds[0]["fonds_id"] == "f0"
+        assert len(fonds) <= 6
+
+    @pytest.mark.asyncio
+    async def test_persisted_trace_drops_handle_and_expired_handle_asks_rerun(self):
+        import json
+
+        from app.skills.handlers.get_skill_result import get_skill_result
+        from app.skills.results import compact_tool_result, persisted_tool_result, skill_result_store
+
+        small = compact_tool_result("search_green_funds", {"nombre_fonds": 0, "fonds": []})
+        assert persisted_tool_result(small) == small
+
+        content = compact_tool_result("search_green_funds", _big_funds_result(), "e1")
+        result_id = json.loads(content)["result_id"]
+        persisted = json.loads(persisted_tool_result(content))
+        # Historique sauvegardé : version abrégée conservée, sans handle du store
+        assert "result_id" not in persisted and result_id not in json.dumps(persisted)
+        assert persisted["resultat"] == json.loads(content)["resultat"]
+        assert "relance" in persisted["note"]
+
+        # Redémarrage / autre worker : le handle ne se résout plus
+        skill_result_store.clear()
+        expired = await get_skill_result({"result_id": result_id}, {"entreprise_id": "e1"})
+        assert "expiré" in expired["error"] and "relance" in expired["error"]
+
+    @pytest.mark.asyncio
+    async def test_get_skill_result_expands_path_and_checks_owner(self):
+        import json
+
+        from app.skills.handlers.get_skill_result import get_skill_result
+        from app.skills.results import compact_tool_result
+
+        content = compact_tool_result("search_green_funds", _big_funds_result(), "e1")
+        result_id = json.loads(content)["result_id"]
+
+        detail = await get_skill_result(
+            {"result_id": result_id, "chemin": "fonds.3"}, {"entreprise_id": "e1"}
+        )
+        assert detail["valeur"]["description"] == "x" * 500
+
+        page = await get_skill_result(
+            {"result_id": result_id, "chemin": "fonds", "offset": 10, "limit": 2},
+            {"entreprise_id": "e1"},
+        )
+        assert page["total"] == 30
+        assert [f["fonds_id"] for f in page["elements"]] == ["f10", "f11"]
+
+        other = await get_skill_result({"result_id": result_id}, {"entreprise_id": "e2"})
+        assert "error" in other
+
+    @pytest.mark.asyncio
+    async def test_get_skill_result_output_is_bounded_not_recompacted(self, monkeypatch):
+        import json
+
+        from app.skills.handlers.get_skill_result import get_skill_result
+        from app.skills.results import compact_tool_result
+
+        content = compact_tool_result("search_green_funds", _big_funds_result(), "e1")
+        result_id = json.loads(content)["result_id"]
+        context = {"entreprise_id": "e1"}
+
+        # Page demandée trop grosse : réduite, avec l'offset de la suite
+        page = await get_skill_result({"result_id": result_id, "chemin": "fonds", "limit": 10}, context)
+        assert 1 <= len(page["elements"]) < 10
+        assert page["suivant"] == len(page["elements"])
+        relayed = compact_tool_result("get_skill_result", page, "e1")
+        assert len(relayed) <= 2000
+        assert json.loads(relayed) == page  # pas de nouveau result_id
+
+        # Résultat entier trop gros : clés et tailles, pour préciser le chemin
+        whole = await get_skill_result({"result_id": result_id}, context)
+        assert whole["trop_volumineux"] is True
+        assert set(whole["cles"]) == {"nombre_fonds", "fonds"}
+        assert "valeur" not in whole
+
+        # Texte long : découpé en caractères
+        monkeypatch.setattr(settings, "SKILL_RESULT_MAX_CHARS", 450)
+        text = await get_skill_result(
+            {"result_id": result_id, "chemin": "fonds.0.description", "offset": 100}, context
+        )
+        assert text["valeur"] == "x" * 300 and text["total_caracteres"] == 500
+        assert text["suivant"] == 400
@@ -70,4 +70,60 @@ describe('useChat', () => {
     expect(messages.value[1].role).toBe('assistant')
     expect(messages.value[1].isStreaming).toBe(false) // done event sets it to false
   })
+
+  it('resumes a dropped stream with Last-Event-ID', async () => {
+    vi.useFakeTimers()
+    const encoder = new TextEncoder()
+    // Flux qui livre ses événements puis tombe (erreur réseau sur la lecture suivante)
+    const droppingStream = (payload: string) => {
+      let sent = false
+      return new ReadableStream({
+        pull(controller) {
+          if (sent) {
+            controller.error(new Error('network'))
+            return
+          }
+          sent = true
+          controller.enqueue(encoder.encode(payload))
+        },
+      })
+    }
+    const dropped = droppingStream(
+      'event: text\nid: run1:1\ndata: {"type":"text","content":"Bon"}\n\n',
+    )
+    const droppedAgain = droppingStream(
+      'event: text\nid: run1:2\ndata: {"type":"text","content":"jour"}\n\n',
+    )
+    const resumed = new ReadableStream({
+      start(controller) {
+        controller.enqueue(
+          encoder.encode(
+            'event: text\nid: run1:3\ndata: {"type":"text","content":" !"}\n\n' +
+              'event: done\nid: run1:4\ndata: {"type":"done"}\n\n',
+          ),
+        )
+        controller.close()
+      },
+    })
+
+    const fetchMock = vi
+      .fn()
+      .mockResolvedValueOnce({ ok: true, body: dropped })
+      .mockResolvedValueOnce({ ok: true, body: droppedAgain })
+      .mockResolvedValueOnce({ ok: true, body: resumed })
+    global.fetch = fetchMock
+
+    const { messages, sendMessage } = useChat(() => 'conv-1')
+    const pending = sendMessage('Salut')
+    await vi.runAllTimersAsync()
+    await pending
+    vi.useRealTimers()
+
+    expect(fetchMock).toHaveBeenCalledTimes(3)
+    expect(fetchMock.mock.calls[1][0]).toBe('/api/chat/conversations/conv-1/stream')
+    expect(fetchMock.mock.calls[1][1].headers['Last-Event-ID']).toBe('run1:1')
+    expect(fetchMock.mock.calls[2][1].headers['Last-Event-ID']).toBe('run1:2')
+    expect(messages.value[1].content).toBe('Bonjour !')
+    expect(messages.value[1].isStreaming).toBe(false)
+  })
 })
@@ -5,6 +5,42 @@ export interface SkillEvent {
   status: 'running' | 'done'
   params?: Record<string, unknown>
   result?: Record<string, unknown>
+  jobId?: string
+  progress?: SkillProgress
+}
+
+export interface SkillProgress {
+  current: number
+  total: number | null
+  message: string
+}
+
+/** Résultat d'un skill ; un handle de job (status running) garde le skill en cours. */
+function applySkillResult(skills: SkillEvent[], data: Record<string, unknown>) {
+  const jobId = data.job_id as string | undefined
+  const skill = jobId
+    ? skills.find((s) => s.jobId === jobId)
+    : skills.find((s) => s.name === (data.skill as string) && s.status === 'running' && !s.jobId)
+  if (!skill) return
+  const result = data.result as Record<string, unknown> | undefined
+  if (!jobId && result?.status === 'running' && typeof result.job_id === 'string') {
+    skill.jobId = result.job_id
+    return
+  }
+  skill.status = 'done'
+  skill.result = result
+}
+
+/** Avancement d'un job d'arrière-plan (génération de documents). */
+function applySkillProgress(skills: SkillEvent[], data: Record<string, unknown>) {
+  const skill = skills.find((s) => s.jobId === (data.job_id as string))
+  if (skill) {
+    skill.progress = {
+      current: data.current as number,
+      total: (data.total as number | null) ?? null,
+      message: data.message as string,
+    }
+  }
 }
 
 export interface ChatMessage {
@@ -15,6 +51,101 @@ export interface ChatMessage {
   isStreaming?: boolean
 }
 
+const MAX_RESUME_ATTEMPTS = 3
+const RESUME_DELAY_MS = 1000
+
+/** Id du dernier événement reçu, partagé entre les tentatives de connexion. */
+interface StreamCursor {
+  lastEventId: string | null
+}
+
+/**
+ * Lit un flux SSE (fetch) et appelle onEvent pour chaque événement.
+ * Met à jour cursor.lastEventId à chaque id reçu (pour reprendre le flux via
+ * Last-Event-ID), y compris si la lecture échoue ensuite.
+ */
+async function readEvents(
+  response: Response,
+  cursor: StreamCursor,
+  onEvent: (eventType: string, data: Record<string, unknown>) => void,
+): Promise<void> {
+  const reader = response.body!.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+
+    buffer += decoder.decode(value, { stream: true })
+    const lines = buffer.split('\n')
+    buffer = lines.pop() || ''
+
+    let currentEventType = ''
+
+    for (const line of lines) {
+      if (line.startsWith('event: ')) {
+        currentEventType = line.slice(7).trim()
+        continue
+      }
+
+      if (line.startsWith('id: ')) {
+        cursor.lastEventId = line.slice(4).trim()
+        continue
+      }
+
+      if (line.startsWith('data: ')) {
+        const raw = line.slice(6)
+        if (!raw) continue
+
+        let data: Record<string, unknown>
+        try {
+          data = JSON.parse(raw)
+        } catch {
+          continue
+        }
+
+        onEvent((data.type as string) || currentEventType, data)
+      }
+    }
+  }
+}
+
+/**
+ * Consomme la réponse SSE d'un run agent. Si la connexion tombe avant `done`/`error`
+ * (fin de flux ou erreur réseau), se reconnecte au run en cours (Last-Event-ID) :
+ * les événements manqués sont rejoués par le serveur, sans relancer le LLM ni les skills.
+ */
+async function followRun(
+  convId: string,
+  response: Response,
+  isFinished: () => boolean,
+  onEvent: (eventType: string, data: Record<string, unknown>) => void,
+) {
+  const cursor: StreamCursor = { lastEventId: null }
+  let attempts = 0
+
+  while (true) {
+    try {
+      await readEvents(response, cursor, onEvent)
+    } catch (err) {
+      if (!cursor.lastEventId || attempts >= MAX_RESUME_ATTEMPTS) throw err
+    }
+    if (isFinished() || !cursor.lastEventId || attempts >= MAX_RESUME_ATTEMPTS) return
+
+    attempts += 1
+    await new Promise((resolve) => setTimeout(resolve, RESUME_DELAY_MS))
+    const token = localStorage.getItem('token')
+    response = await fetch(`/api/chat/conversations/${convId}/stream`, {
+      headers: {
+        'Last-Event-ID': cursor.lastEventId,
+        ...(token ? { Authorization: `Bearer ${token}` } : {}),
+      },
+    })
+    if (!response.ok) return
+  }
+}
+
 export function useChat(conversationId: () => string | undefined) {
   const messages = ref<ChatMessage[]>([])
   const isLoading = ref(false)
@@ -63,78 +194,41 @@ export function useChat(conversationId: () => string | undefined) {
         throw new Error(`Erreur ${response.status}`)
       }
 
-      const reader = response.body!.getReader()
-      const decoder = new TextDecoder()
-      let buffer = ''
-
-      while (true) {
-        const { done, value } = await reader.read()
-        if (done) break
-
-        buffer += decoder.decode(value, { stream: true })
-        const lines = buffer.split('\n')
-        buffer = lines.pop() || ''
-
-        let currentEventType = ''
-
-        for (const line of lines) {
-          if (line.startsWith('event: ')) {
-            currentEventType = line.slice(7).trim()
-            continue
-          }
-
-          if (line.startsWith('data: ')) {
-            const raw = line.slice(6)
-            if (!raw) continue
-
-            let data: Record<string, unknown>
-            try {
-              data = JSON.parse(raw)
-            } catch {
-              continue
-            }
-
-            const eventType = (data.type as string) || currentEventType
-
-            switch (eventType) {
-              case 'text':
-                assistantMsg.content += data.content as string
-                break
-
-              case 'skill_start':
-                assistantMsg.skills!.push({
-                  name: data.skill as string,
-                  status: 'running',
-                  params: data.params as Record<string, unknown> | undefined,
-                })
-                break
-
-              case 'skill_result': {
-                const skill = assistantMsg.skills!.find(
-                  (s) => s.name === (data.skill as string) && s.status === 'running',
-                )
-                if (skill) {
-                  skill.status = 'done'
-                  skill.result = data.result as Record<string, unknown> | undefined
-                }
-                break
-              }
-
-              case 'done':
-                assistantMsg.isStreaming = false
-                isLoading.value = false
-                break
-
-              case 'error':
-                assistantMsg.content += '\n\nUne erreur est survenue.'
-                assistantMsg.isStreaming = false
-                isLoading.value = false
-                error.value = (data.content as string) || 'Erreur inconnue'
-                break
-            }
-          }
+      await followRun(convId, response, () => !assistantMsg.isStreaming, (eventType, data) => {
+        switch (eventType) {
+          case 'text':
+            assistantMsg.content += data.content as string
+            break
+
+          case 'skill_start':
+            assistantMsg.skills!.push({
+              name: data.skill as string,
+              status: 'running',
+              params: data.params as Record<string, unknown> | undefined,
+            })
+            break
+
+          case 'skill_result':
+            applySkillResult(assistantMsg.skills!, data)
+            break
+
+          case 'skill_progress':
+            applySkillProgress(assistantMsg.skills!, data)
+            break
+
+          case 'done':
+            assistantMsg.isStreaming = false
+            isLoading.value = false
+            break
+
+          case 'error':
+            assistantMsg.content += '\n\nUne erreur est survenue.'
+            assistantMsg.isStreaming = false
+            isLoading.value = false
+            error.value = (data.content as string) || 'Erreur inconnue'
+            break
         }
-      }
+      })
 
       // Safety: ensure streaming ends
       if (assistantMsg.isStreaming) {
@@ -186,87 +280,50 @@ export function useChat(conversationId: () => string | undefined) {
         throw new Error(`Erreur ${response.status}`)
       }
 
-      const reader = response.body!.getReader()
-      const decoder = new TextDecoder()
-      let buffer = ''
-
-      while (true) {
-        const { done, value } = await reader.read()
-        if (done) break
-
-        buffer += decoder.decode(value, { stream: true })
-        const lines = buffer.split('\n')
-        buffer = lines.pop() || ''
-
-        let currentEventType = ''
-
-        for (const line of lines) {
-          if (line.startsWith('event: ')) {
-            currentEventType = line.slice(7).trim()
-            continue
-          }
-
-          if (line.startsWith('data: ')) {
-            const raw = line.slice(6)
-            if (!raw) continue
-
-            let data: Record<string, unknown>
-            try {
-              data = JSON.parse(raw)
-            } catch {
-              continue
-            }
-
-            const eventType = (data.type as string) || currentEventType
-
-            switch (eventType) {
-              case 'transcript':
-                // Ajouter le message utilisateur avec la transcription
-                messages.value.splice(messages.value.length - 1, 0, {
-                  id: crypto.randomUUID(),
-                  role: 'user',
-                  content: `🎤 ${data.text as string}`,
-                })
-                break
-
-              case 'text':
-                assistantMsg.content += data.content as string
-                break
-
-              case 'skill_start':
-                assistantMsg.skills!.push({
-                  name: data.skill as string,
-                  status: 'running',
-                  params: data.params as Record<string, unknown> | undefined,
-                })
-                break
-
-              case 'skill_result': {
-                const skill = assistantMsg.skills!.find(
-                  (s) => s.name === (data.skill as string) && s.status === 'running',
-                )
-                if (skill) {
-                  skill.status = 'done'
-                  skill.result = data.result as Record<string, unknown> | undefined
-                }
-                break
-              }
-
-              case 'done':
-                assistantMsg.isStreaming = false
-                isLoading.value = false
-                break
-
-              case 'error':
-                assistantMsg.content += '\n\nUne erreur est survenue.'
-                assistantMsg.isStreaming = false
-                isLoading.value = false
-                error.value = (data.content as string) || 'Erreur inconnue'
-                break
-            }
-          }
+      await followRun(convId, response, () => !assistantMsg.isStreaming, (eventType, data) => {
+        switch (eventType) {
+          case 'transcript':
+            // Ajouter le message utilisateur avec la transcription
+            messages.value.splice(messages.value.length - 1, 0, {
+              id: crypto.randomUUID(),
+              role: 'user',
+              content: `🎤 ${data.text as string}`,
+            })
+            break
+
+          case 'text':
+            assistantMsg.content += data.content as string
+            break
+
+          case 'skill_start':
+            assistantMsg.skills!.push({
+              name: data.skill as string,
+              status: 'running',
+              params: data.params as Record<string, unknown> | undefined,
+            })
+            break
+
+          case 'skill_result':
+            applySkillResult(assistantMsg.skills!, data)
+            break
+
+          case 'skill_progress':
+            applySkillProgress(assistantMsg.skills!, data)
+            break
+
+          case 'done':
+            assistantMsg.isStreaming = false
+            isLoading.value = false
+            break
+
+          case 'error':
+            assistantMsg.content += '\n\nUne erreur est survenue.'
+            assistantMsg.isStreaming = false
+            isLoading.value = false
+            error.value = (data.content as string) || 'Erreur inconnue'
+            break
         }
-      }
+      })
 
       // Safety: ensure streaming ends
       if (assistantMsg.isStreaming) {
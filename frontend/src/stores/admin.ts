@@ -13,6 +13,7 @@ export interface Skill {
   handler_key: string
   handler_code: string | null
   is_active: boolean
+  is_read_only: boolean
   version: number
   created_by: string | null
   created_at: string
@@ -198,6 +199,7 @@ export const useAdminStore = defineStore('admin', () => {
     input_schema: Record<string, unknown>
     handler_key: string
     handler_code?: string | null
+    is_read_only?: boolean
   }): Promise<Skill> {
     const skill = await api.post<Skill>('/api/admin/skills/', data)
     await loadSkills()
@@ -212,6 +214,7 @@ export const useAdminStore = defineStore('admin', () => {
       input_schema?: Record<string, unknown>
       handler_code?: string
       is_active?: boolean
+      is_read_only?: boolean
     },
   ): Promise<Skill> {
     const skill = await api.put<Skill>(`/api/admin/skills/${id}`, data)